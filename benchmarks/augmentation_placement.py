@@ -0,0 +1,92 @@
+"""
+This script compares the training step time on CPU with the data
+augmentation layers inside the model, the default, against running them as
+a parallel stage of the input pipeline (`data.pipeline.augment: true`).
+
+Random images and weights are used, decoding is left out so only the
+augmentation placement changes.
+
+Usage:
+    $ python benchmarks/augmentation_placement.py --steps 20
+"""
+import argparse
+import time
+
+import numpy as np
+import tensorflow as tf
+
+from models import resnet_50
+from utils.data_aug import augment_dataset
+
+DATA_AUG_LAYER = {
+    "random_flip": {"mode": "horizontal"},
+    "random_rotation": {"factor": 0.1},
+    "random_zoom": {"height_factor": 0.2, "width_factor": 0.2},
+}
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Benchmark data augmentation placement."
+    )
+    parser.add_argument("--steps", type=int, default=20)
+    parser.add_argument("--image-size", type=int, default=224)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--classes", type=int, default=196)
+
+    args = parser.parse_args()
+
+    return args
+
+
+def step_time(model, dataset, steps):
+    # Mean seconds per training step, after a warm up epoch
+    model.compile(optimizer="adam", loss="sparse_categorical_crossentropy")
+    model.fit(dataset, steps_per_epoch=2, verbose=0)
+    start = time.perf_counter()
+    model.fit(dataset, steps_per_epoch=steps, verbose=0)
+
+    return (time.perf_counter() - start) / steps
+
+
+def main(steps, image_size, batch_size, classes):
+    """
+    Parameters
+    ----------
+    steps : int
+        Number of training steps timed.
+
+    image_size : int
+        Height and width of the images.
+
+    batch_size : int
+        Size of the batches of data.
+
+    classes : int
+        Model output classes.
+    """
+    x = np.random.uniform(0, 255, (batch_size * 4, image_size, image_size, 3))
+    y = np.random.randint(classes, size=len(x))
+    dataset = tf.data.Dataset.from_tensor_slices((x.astype(np.float32), y))
+    dataset = dataset.batch(batch_size).repeat().prefetch(tf.data.AUTOTUNE)
+    kwargs = dict(
+        weights=None,
+        input_shape=(image_size, image_size, 3),
+        dropout_rate=0.2,
+        classes=classes,
+    )
+
+    in_model = resnet_50.create_model(data_aug_layer=DATA_AUG_LAYER, **kwargs)
+    model_step = step_time(in_model, dataset, steps)
+    print(f"augmentation in model: {model_step * 1000:.0f} ms/step")
+
+    in_pipeline = resnet_50.create_model(**kwargs)
+    augmented = augment_dataset(dataset, DATA_AUG_LAYER)
+    pipeline_step = step_time(in_pipeline, augmented, steps)
+    print(f"augmentation in pipeline: {pipeline_step * 1000:.0f} ms/step")
+    print(f"speedup: {model_step / pipeline_step:.2f}x")
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    main(args.steps, args.image_size, args.batch_size, args.classes)
@@ -0,0 +1,86 @@
+"""
+This script compares the throughput (images/sec) of running the vehicle
+detector one image at a time with `utils.detection.get_vehicle_coordinates()`
+against the batched `utils.detection.get_vehicle_coordinates_batch()`.
+
+Usage:
+    $ python benchmarks/detection_batch.py tests/test_data/ --batch-sizes 1 4 8
+"""
+import argparse
+import time
+
+import cv2
+
+from utils import detection
+from utils.utils import walkdir
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Benchmark batched vehicle detection."
+    )
+    parser.add_argument(
+        "data_folder",
+        type=str,
+        help="Full path to a directory having some images to detect.",
+    )
+    parser.add_argument(
+        "--batch-sizes",
+        type=int,
+        nargs="+",
+        default=[2, 4, 8],
+        help="Batch sizes to try with the batched API.",
+    )
+    parser.add_argument(
+        "--repeat",
+        type=int,
+        default=4,
+        help="Times the image list is repeated to get a bigger sample.",
+    )
+
+    args = parser.parse_args()
+
+    return args
+
+
+def main(data_folder, batch_sizes, repeat):
+    """
+    Parameters
+    ----------
+    data_folder : str
+        Full path to images folder.
+
+    batch_sizes : list
+        Batch sizes to benchmark.
+
+    repeat : int
+        Times the images found are repeated.
+    """
+    images = []
+    for dirpath, filename in walkdir(data_folder):
+        img = cv2.imread(f"{dirpath}/{filename}")
+        if img is not None:
+            images.append(img)
+    images = images * repeat
+
+    # Warm up, first forward pass is always slower
+    detection.get_vehicle_coordinates(images[0])
+
+    start = time.perf_counter()
+    for img in images:
+        detection.get_vehicle_coordinates(img)
+    elapsed = time.perf_counter() - start
+    print(f"single image: {len(images) / elapsed:.2f} images/sec")
+
+    for batch_size in batch_sizes:
+        start = time.perf_counter()
+        detection.get_vehicle_coordinates_batch(images, batch_size=batch_size)
+        elapsed = time.perf_counter() - start
+        print(
+            f"batch_size={batch_size}: {len(images) / elapsed:.2f} images/sec"
+        )
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    main(args.data_folder, args.batch_sizes, args.repeat)
@@ -0,0 +1,87 @@
+"""
+This script measures the vehicle detection time over a folder of images
+with an empty detection cache (cold run, the detector runs on every image)
+and then with the cache loaded back from disk (warm run, no inference).
+
+Usage:
+    $ python benchmarks/detection_cache.py data/car_ims_v1/test/
+"""
+import argparse
+import tempfile
+import time
+
+from tensorflow import keras
+
+from utils import detection
+from utils.detection_cache import DetectionCache, file_digest
+from utils.utils import walkdir
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Benchmark cold and warm detection cache runs."
+    )
+    parser.add_argument(
+        "data_folder",
+        type=str,
+        help="Full path to a directory having some images to detect.",
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=8,
+        help="Number of images sent to the detector in one forward pass.",
+    )
+
+    args = parser.parse_args()
+
+    return args
+
+
+def run(images, keys, cache_dir, batch_size):
+    cache = DetectionCache(cache_dir)
+    start = time.perf_counter()
+    boxes = detection.get_vehicle_coordinates_batch(
+        images, batch_size=batch_size, cache=cache, keys=keys
+    )
+    cache.flush()
+    elapsed = time.perf_counter() - start
+    print(
+        f"{len(images) / elapsed:.2f} images/sec "
+        f"({cache.hits} hits, {cache.misses} misses)"
+    )
+    return boxes
+
+
+def main(data_folder, batch_size):
+    """
+    Parameters
+    ----------
+    data_folder : str
+        Full path to images folder.
+
+    batch_size : int
+        Number of images sent to the detector in one forward pass.
+    """
+    images = []
+    keys = []
+    for dirpath, filename in walkdir(data_folder):
+        fname = f"{dirpath}/{filename}"
+        images.append(keras.utils.img_to_array(keras.utils.load_img(fname)))
+        keys.append(file_digest(fname))
+
+    # Load the detector upfront, we don't want to time it
+    detection.get_detector()
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        print("cold run: ", end="")
+        cold_boxes = run(images, keys, cache_dir, batch_size)
+        print("warm run: ", end="")
+        warm_boxes = run(images, keys, cache_dir, batch_size)
+
+    assert cold_boxes == warm_boxes
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    main(args.data_folder, args.batch_size)
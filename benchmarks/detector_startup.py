@@ -0,0 +1,76 @@
+"""
+This script measures the startup cost of the vehicle detector. Importing
+`utils.detection` used to load the Faster R-CNN weights at import time, now
+the model is only built on the first `utils.detection.get_detector()` call.
+
+We report:
+    - import: time to import `utils.detection` in a fresh process.
+    - first detector: time of the first `get_detector()` call, i.e. what
+      every process importing the module used to pay upfront.
+    - cached detector: time of any later `get_detector()` call.
+
+Usage:
+    $ python benchmarks/detector_startup.py --device cpu
+"""
+import argparse
+import subprocess
+import sys
+import time
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Benchmark vehicle detector startup time."
+    )
+    parser.add_argument(
+        "--device",
+        type=str,
+        default=None,
+        help="Device used to load the detector, e.g. `cpu` or `cuda`.",
+    )
+    parser.add_argument(
+        "--repeat",
+        type=int,
+        default=5,
+        help="Number of fresh processes used to time the module import.",
+    )
+
+    args = parser.parse_args()
+
+    return args
+
+
+def main(device, repeat):
+    """
+    Parameters
+    ----------
+    device : str
+        Device used to load the detector.
+
+    repeat : int
+        Number of fresh processes used to time the module import.
+    """
+    import_times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run(
+            [sys.executable, "-c", "import utils.detection"], check=True
+        )
+        import_times.append(time.perf_counter() - start)
+    # Interpreter startup is included, take the best run
+    print(f"import: {min(import_times):.3f} sec")
+
+    from utils import detection
+
+    start = time.perf_counter()
+    detection.get_detector(device=device)
+    print(f"first detector: {time.perf_counter() - start:.3f} sec")
+
+    start = time.perf_counter()
+    detection.get_detector(device=device)
+    print(f"cached detector: {time.perf_counter() - start:.6f} sec")
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    main(args.device, args.repeat)
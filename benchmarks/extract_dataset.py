@@ -0,0 +1,137 @@
+"""
+This script compares extracting the dataset archive with
+`scripts/extract_dataset.py`, in one streaming pass, against the two steps
+flow: extracting the whole archive into `car_ims` and then running
+`scripts/prepare_train_test_dataset.py`.
+
+It reports the wall time and the peak disk usage of each flow, not
+counting the archive. Disk usage counts the blocks of each inode once, so
+hard links made by the two steps flow don't count twice, and the number
+of directory entries created.
+
+Usage:
+    $ python benchmarks/extract_dataset.py --images 5000
+    $ python benchmarks/extract_dataset.py --tmp-dir /mnt/nfs/tmp/
+"""
+import argparse
+import io
+import os
+import shutil
+import tarfile
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+from PIL import Image
+
+from scripts import extract_dataset, prepare_train_test_dataset
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Benchmark the dataset archive extraction."
+    )
+    parser.add_argument("--images", type=int, default=2000)
+    parser.add_argument("--classes", type=int, default=196)
+    parser.add_argument(
+        "--tmp-dir",
+        type=str,
+        help="Folder where the synthetic dataset is written.",
+    )
+
+    args = parser.parse_args()
+
+    return args
+
+
+def make_archive(folder, images, classes):
+    # Archive of small random JPEGs, like `car_ims.tgz`, and its labels CSV
+    rng = np.random.RandomState(0)
+    archive = os.path.join(folder, "car_ims.tgz")
+    with tarfile.open(archive, "w:gz") as tar:
+        for i in range(images):
+            pixels = rng.randint(0, 256, (96, 128, 3), dtype=np.uint8)
+            buffer = io.BytesIO()
+            Image.fromarray(pixels).save(buffer, format="JPEG")
+            member = tarfile.TarInfo(f"car_ims/{i:06d}.jpg")
+            member.size = buffer.tell()
+            buffer.seek(0)
+            tar.addfile(member, buffer)
+    labels = os.path.join(folder, "car_dataset_labels.csv")
+    pd.DataFrame(
+        {
+            "img_name": [f"{i:06d}.jpg" for i in range(images)],
+            "class": [f"Class {k}" for k in rng.randint(classes, size=images)],
+            "subset": rng.choice(["train", "test"], size=images),
+        }
+    ).to_csv(labels, index=False)
+
+    return archive, labels
+
+
+def disk_usage(folder):
+    # Allocated bytes of the unique inodes under `folder` and entries count
+    inodes = {}
+    entries = 0
+    for dirpath, dirnames, filenames in os.walk(folder):
+        for name in dirnames + filenames:
+            stat = os.lstat(os.path.join(dirpath, name))
+            inodes[(stat.st_dev, stat.st_ino)] = stat.st_blocks * 512
+            entries += 1
+
+    return sum(inodes.values()), entries
+
+
+def two_steps(archive, labels, folder):
+    with tarfile.open(archive, "r:gz") as tar:
+        tar.extractall(folder)
+    prepare_train_test_dataset.main(
+        os.path.join(folder, "car_ims"),
+        labels,
+        os.path.join(folder, "car_ims_v1"),
+    )
+
+
+def streaming(archive, labels, folder):
+    extract_dataset.main(archive, labels, os.path.join(folder, "car_ims_v1"))
+
+
+def main(images, classes, tmp_dir=None):
+    """
+    Parameters
+    ----------
+    images : int
+        Number of images in the synthetic archive.
+
+    classes : int
+        Number of classes in the synthetic dataset.
+
+    tmp_dir : str
+        Folder where the synthetic dataset is written.
+    """
+    folder = tempfile.mkdtemp(dir=tmp_dir)
+    try:
+        archive, labels = make_archive(folder, images, classes)
+        print(f"archive: {os.path.getsize(archive) / 1024**2:.1f} MB")
+        for name, extract in (
+            ("two steps", two_steps),
+            ("streaming", streaming),
+        ):
+            output = os.path.join(folder, name.replace(" ", "_"))
+            start = time.perf_counter()
+            extract(archive, labels, output)
+            elapsed = time.perf_counter() - start
+            # Nothing is deleted by either flow, so usage is at its peak
+            size, entries = disk_usage(output)
+            print(
+                f"{name}: {elapsed:.2f}s, {images / elapsed:.0f} images/sec, "
+                f"peak disk {size / 1024**2:.1f} MB, {entries} entries"
+            )
+    finally:
+        shutil.rmtree(folder)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    main(args.images, args.classes, args.tmp_dir)
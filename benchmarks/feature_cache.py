@@ -0,0 +1,130 @@
+"""
+This script compares the time of one head-only training epoch running the
+frozen ResNet50 backbone on every step, as `scripts/train.py` does by
+default, against training the head on features cached once, see
+`data.feature_cache`. With `--views`, features of that many augmented views
+of each image are cached and the head is trained sampling one per epoch.
+
+Random images and weights are used, timings are the same as with imagenet
+weights and real data.
+
+Usage:
+    $ python benchmarks/feature_cache.py --images 256 --image-size 224
+    $ python benchmarks/feature_cache.py --images 256 --views 4
+"""
+import argparse
+import tempfile
+import time
+
+import numpy as np
+import tensorflow as tf
+
+from models import resnet_50
+from utils.data_aug import create_data_aug_layer
+from utils.feature_cache import AugmentedFeatureSequence, FeatureCache
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Benchmark head training on cached features."
+    )
+    parser.add_argument("--images", type=int, default=256)
+    parser.add_argument("--image-size", type=int, default=224)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--classes", type=int, default=196)
+    parser.add_argument(
+        "--views",
+        type=int,
+        default=1,
+        help="Augmented views of each image, run the full model with the "
+        "same augmentations.",
+    )
+
+    args = parser.parse_args()
+
+    return args
+
+
+def main(images, image_size, batch_size, classes, views):
+    """
+    Parameters
+    ----------
+    images : int
+        Number of images in the dataset.
+
+    image_size : int
+        Height and width of the images.
+
+    batch_size : int
+        Size of the batches of data.
+
+    classes : int
+        Model output classes.
+
+    views : int
+        Augmented views of each image.
+    """
+    data_aug_layer = None
+    if views > 1:
+        data_aug_layer = {
+            "random_flip": {"mode": "horizontal"},
+            "random_rotation": {"factor": 0.1},
+            "random_zoom": {"height_factor": 0.2},
+        }
+    x = np.random.uniform(0, 255, (images, image_size, image_size, 3))
+    y = np.random.randint(classes, size=images)
+    dataset = tf.data.Dataset.from_tensor_slices((x.astype(np.float32), y))
+    dataset = dataset.batch(batch_size)
+
+    model = resnet_50.create_model(
+        weights=None,
+        input_shape=(image_size, image_size, 3),
+        dropout_rate=0.2,
+        data_aug_layer=data_aug_layer,
+        classes=classes,
+    )
+    model.compile(optimizer="adam", loss="sparse_categorical_crossentropy")
+    model.fit(dataset.take(1), verbose=0)
+    start = time.perf_counter()
+    model.fit(dataset, verbose=0)
+    full_epoch = time.perf_counter() - start
+    print(f"full model: {full_epoch:.2f}s/epoch")
+
+    backbone, head = resnet_50.split_model(model)
+    head.compile(optimizer="adam", loss="sparse_categorical_crossentropy")
+    if data_aug_layer:
+        data_augmentation = create_data_aug_layer(data_aug_layer)
+
+        def augment(images):
+            return data_augmentation(images, training=True)
+
+    else:
+        augment = None
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        cache = FeatureCache(cache_dir, {})
+        start = time.perf_counter()
+        features, labels = cache.compute(
+            "training", backbone, dataset, views=views, augment=augment
+        )
+        print(f"features cached in {time.perf_counter() - start:.2f}s")
+
+        sequence = AugmentedFeatureSequence(features, labels, batch_size)
+        head.fit(sequence, verbose=0)
+        start = time.perf_counter()
+        head.fit(sequence, verbose=0)
+        head_epoch = time.perf_counter() - start
+        print(f"cached features: {head_epoch:.4f}s/epoch")
+
+    print(f"speedup: {full_epoch / head_epoch:.0f}x per epoch")
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    main(
+        args.images,
+        args.image_size,
+        args.batch_size,
+        args.classes,
+        args.views,
+    )
@@ -0,0 +1,152 @@
+"""
+This script compares the throughput (images/sec) of classifying cropped
+vehicles in two separate steps, as `utils.serving.ClassificationService`
+used to, against the fused `utils.pipeline.DetectClassifyPipeline`, and
+prints the time spent in each stage of the fused pipeline.
+
+The two steps version decodes each image, runs the detector on the whole
+list, crops and resizes each image and stacks them as float32 before
+running the classifier, one stage after the other.
+
+Usage:
+    $ python benchmarks/fused_pipeline.py tests/test_data/ \\
+        experiments/exp_001/config.yml \\
+        experiments/exp_001/model.06-2.0449.h5 --batch-size 8
+"""
+import argparse
+import time
+
+import numpy as np
+
+from utils import detection, utils
+from utils.pipeline import DetectClassifyPipeline, decode_image_uint8
+from utils.runtime import load_runtime
+from utils.serving import resize_image
+from utils.utils import walkdir
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Benchmark the fused detection and classification."
+    )
+    parser.add_argument(
+        "data_folder",
+        type=str,
+        help="Full path to a directory having some images to classify.",
+    )
+    parser.add_argument(
+        "config_file",
+        type=str,
+        help="Full path to experiment configuration file.",
+    )
+    parser.add_argument(
+        "weights",
+        type=str,
+        help="Full path to the trained model weights or exported model.",
+    )
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument(
+        "--repeat",
+        type=int,
+        default=4,
+        help="Times the image list is repeated to get a bigger sample.",
+    )
+    parser.add_argument(
+        "--no-crop",
+        action="store_true",
+        help="Skip the detector, only decode and classify.",
+    )
+
+    args = parser.parse_args()
+
+    return args
+
+
+def two_steps(images, model, input_size, batch_size, crop):
+    # One stage after the other, each one over all the images
+    decoded = [decode_image_uint8(image_bytes) for image_bytes in images]
+    if crop:
+        boxes = detection.get_vehicle_coordinates_batch(
+            decoded, batch_size=batch_size
+        )
+        decoded = [
+            img[y1:y2, x1:x2] if x2 > x1 and y2 > y1 else img
+            for img, (x1, y1, x2, y2) in zip(decoded, boxes)
+        ]
+    resized = [resize_image(img, input_size) for img in decoded]
+    for start in range(0, len(resized), batch_size):
+        batch = np.array(resized[start : start + batch_size], np.float32)
+        model.predict_on_batch(batch)
+
+
+def main(data_folder, config_file, weights, batch_size, repeat, crop=True):
+    """
+    Parameters
+    ----------
+    data_folder : str
+        Full path to images folder.
+
+    config_file : str
+        Full path to experiment configuration file.
+
+    weights : str
+        Full path to the trained model weights or exported model.
+
+    batch_size : int
+        Number of images per batch, for both models.
+
+    repeat : int
+        Times the images found are repeated.
+
+    crop : bool
+        Crop the vehicle with the detector before classifying.
+    """
+    images = []
+    for dirpath, filename in walkdir(data_folder):
+        with open(f"{dirpath}/{filename}", "rb") as f:
+            image_bytes = f.read()
+        try:
+            decode_image_uint8(image_bytes)
+        except OSError:
+            continue
+        images.append(image_bytes)
+    images = images * repeat
+
+    config = utils.load_config(config_file)
+    input_size = config["data"]["image_size"]
+    model = load_runtime(weights)
+    pipeline = DetectClassifyPipeline(
+        model,
+        utils.get_class_names(config),
+        input_size,
+        batch_size,
+        crop=crop,
+    )
+    # Warm up, first forward passes are always slower
+    pipeline.predict(images[: batch_size * 2])
+    pipeline.reset_timings()
+
+    start = time.perf_counter()
+    two_steps(images, model, input_size, batch_size, crop)
+    elapsed = time.perf_counter() - start
+    print(f"two steps: {len(images) / elapsed:.2f} images/sec")
+
+    start = time.perf_counter()
+    pipeline.predict(images)
+    elapsed = time.perf_counter() - start
+    pipeline.close()
+    print(f"fused: {len(images) / elapsed:.2f} images/sec")
+    for stage, seconds in pipeline.timings.items():
+        print(f"    {stage}: {seconds / len(images) * 1000:.1f} ms/image")
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    main(
+        args.data_folder,
+        args.config_file,
+        args.weights,
+        args.batch_size,
+        args.repeat,
+        not args.no_crop,
+    )
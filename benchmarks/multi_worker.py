@@ -0,0 +1,140 @@
+"""
+This script measures how training scales with the number of local worker
+processes, from 1 to `--max-workers`, using `scripts/launch_workers.py`
+with the `multi_worker_mirrored` strategy.
+
+`data.batch_size` is the batch of each worker, so the global batch grows
+with the workers and each epoch has fewer steps. For each number of
+workers it reports the wall time of the whole run, process startup
+included, the training images per second and the speedup over a single
+worker. Every run gets the same CPU cores, split evenly between its
+workers.
+
+A synthetic dataset of random JPEGs and random weights are used.
+
+Usage:
+    $ python benchmarks/multi_worker.py --images 512 --image-size 64 \\
+        --max-workers 4
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+import yaml
+from PIL import Image
+
+from scripts import launch_workers
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Benchmark multi-worker training scaling."
+    )
+    parser.add_argument("--images", type=int, default=512)
+    parser.add_argument("--classes", type=int, default=4)
+    parser.add_argument("--image-size", type=int, default=64)
+    parser.add_argument("--batch-size", type=int, default=16)
+    parser.add_argument("--epochs", type=int, default=2)
+    parser.add_argument("--max-workers", type=int, default=4)
+
+    args = parser.parse_args()
+
+    return args
+
+
+def make_dataset(folder, images, classes):
+    # Folder of random JPEGs per class, like `data/car_ims_v1/train`
+    rng = np.random.RandomState(0)
+    for i in range(images):
+        class_folder = os.path.join(folder, f"Class {i % classes}")
+        os.makedirs(class_folder, exist_ok=True)
+        pixels = rng.randint(0, 256, (240, 320, 3), dtype=np.uint8)
+        Image.fromarray(pixels).save(os.path.join(class_folder, f"{i}.jpg"))
+
+
+def main(images, classes, image_size, batch_size, epochs, max_workers):
+    """
+    Parameters
+    ----------
+    images : int
+        Number of synthetic images, 20% of them used for validation.
+
+    classes : int
+        Number of classes.
+
+    image_size : int
+        Model input height and width.
+
+    batch_size : int
+        Batch size of each worker.
+
+    epochs : int
+        Epochs trained by each run.
+
+    max_workers : int
+        Largest number of workers tried.
+    """
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        data = os.path.join(tmp_dir, "data")
+        make_dataset(data, images, classes)
+        config = {
+            "seed": 123,
+            "data": {
+                "directory": data,
+                "label_mode": "categorical",
+                "validation_split": 0.2,
+                "image_size": [image_size, image_size],
+                "batch_size": batch_size,
+            },
+            "model": {
+                "weights": None,
+                "input_shape": [image_size, image_size, 3],
+                "classes": classes,
+            },
+            "compile": {
+                "optimizer": {"sgd": {"learning_rate": 0.01}},
+                "loss": "categorical_crossentropy",
+                "metrics": ["accuracy"],
+            },
+            "fit": {"epochs": epochs, "verbose": 0},
+            "distribute": {"strategy": "multi_worker_mirrored"},
+        }
+        config_file = os.path.join(tmp_dir, "config.yml")
+        with open(config_file, "w") as f:
+            yaml.safe_dump(config, f)
+
+        train_images = (images - int(images * 0.2)) * epochs
+        times = {}
+        for workers in range(1, max_workers + 1):
+            start = time.perf_counter()
+            launch_workers.main(
+                config_file,
+                workers,
+                log_dir=os.path.join(tmp_dir, f"logs_{workers}"),
+            )
+            times[workers] = time.perf_counter() - start
+
+    print(
+        f"\n{os.cpu_count()} CPU cores, {train_images} training images, "
+        f"batch size {batch_size} per worker"
+    )
+    for workers, elapsed in times.items():
+        print(
+            f"{workers} workers: {elapsed:6.1f}s, "
+            f"{train_images / elapsed:6.1f} images/s, "
+            f"speedup {times[1] / elapsed:.2f}x"
+        )
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    main(
+        args.images,
+        args.classes,
+        args.image_size,
+        args.batch_size,
+        args.epochs,
+        args.max_workers,
+    )
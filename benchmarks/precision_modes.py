@@ -0,0 +1,163 @@
+"""
+This script compares the CPU training and inference step time of the
+classifier with each dtype policy and XLA setting:
+    - float32: the default.
+    - mixed_bfloat16: `model.dtype_policy`, fast on CPUs with AVX512-BF16 or
+      AMX instructions.
+    - +xla: `compile.jit_compile` for training and
+      `utils.runtime.KerasRuntime(jit_compile=True)` for inference.
+
+All the modes share the same weights, so it also reports how often their
+predictions agree with float32 and, given a test folder, the accuracy
+delta. Without weights, random weights and images are used.
+
+Usage:
+    $ python benchmarks/precision_modes.py --steps 10
+    $ python benchmarks/precision_modes.py \\
+        --config experiments/exp_001/config.yml \\
+        --weights experiments/exp_001/model.06-2.0449.h5 \\
+        --test-folder data/car_ims_v2/test/
+"""
+import argparse
+import time
+
+import numpy as np
+from tensorflow import keras
+
+from models import resnet_50
+from utils import utils
+from utils.runtime import KerasRuntime
+
+MODES = (
+    ("float32", False),
+    ("float32", True),
+    ("mixed_bfloat16", False),
+    ("mixed_bfloat16", True),
+)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Benchmark dtype policies and XLA compilation."
+    )
+    parser.add_argument("--config", type=str, help="Experiment config.")
+    parser.add_argument("--weights", type=str, help="Trained model.")
+    parser.add_argument("--test-folder", type=str, help="Test images.")
+    parser.add_argument("--steps", type=int, default=10)
+    parser.add_argument("--batch-size", type=int, default=32)
+
+    args = parser.parse_args()
+
+    return args
+
+
+def load_images(config, test_folder, batch_size):
+    # Batches of (images, labels) from the test folder, at most 50
+    class_indices = {
+        name: i for i, name in enumerate(utils.get_class_names(config))
+    }
+    file_paths, label_names = utils.list_images(test_folder)
+    labels = [class_indices.get(name, -1) for name in label_names]
+    batches = []
+    image_batches = utils.image_batches(
+        file_paths, config["data"]["image_size"], batch_size
+    )
+    for i, images in enumerate(image_batches.take(50)):
+        start = i * batch_size
+        batch_labels = np.array(labels[start : start + len(images)])
+        batches.append((images.numpy(), batch_labels))
+
+    return batches
+
+
+def time_per_step(fn, batches, steps):
+    # Mean seconds per call of `fn`, after a warm up call
+    fn(*batches[0])
+    start = time.perf_counter()
+    for i in range(steps):
+        fn(*batches[i % len(batches)])
+
+    return (time.perf_counter() - start) / steps
+
+
+def main(config_file, weights, test_folder, steps, batch_size):
+    """
+    Parameters
+    ----------
+    config_file : str
+        Full path to experiment configuration file.
+
+    weights : str
+        Full path to the trained model weights.
+
+    test_folder : str
+        Full path to the test images folder, to measure accuracy.
+
+    steps : int
+        Number of steps timed for each mode.
+
+    batch_size : int
+        Size of the batches of data.
+    """
+    if weights:
+        config = utils.load_config(config_file)
+        model_config = config["model"]
+        reference = resnet_50.create_model(weights=weights)
+        batches = load_images(config, test_folder, batch_size)
+    else:
+        model_config = {"input_shape": (224, 224, 3), "classes": 196}
+        reference = None
+        images = np.random.uniform(0, 255, (batch_size, 224, 224, 3))
+        labels = np.random.randint(196, size=batch_size)
+        batches = [(images.astype(np.float32), labels)]
+
+    reference_preds = None
+    reference_acc = None
+    for dtype_policy, jit_compile in MODES:
+        model = resnet_50.create_model(
+            weights=None,
+            input_shape=model_config["input_shape"],
+            dropout_rate=model_config.get("dropout_rate", 0.0),
+            classes=model_config["classes"],
+            dtype_policy=dtype_policy,
+        )
+        if reference is None:
+            reference = model
+        model.set_weights(reference.get_weights())
+
+        runtime = KerasRuntime(model, jit_compile=jit_compile)
+        probs = [runtime.predict_on_batch(x) for x, _ in batches]
+        preds = np.concatenate([p.argmax(axis=1) for p in probs])
+        labels = np.concatenate([y for _, y in batches])
+        accuracy = float(np.mean(preds == labels))
+        if reference_preds is None:
+            reference_preds, reference_acc = preds, accuracy
+        predict_step = time_per_step(
+            lambda x, y: runtime.predict_on_batch(x), batches, steps
+        )
+
+        model.compile(
+            optimizer=keras.optimizers.SGD(0.0),
+            loss="sparse_categorical_crossentropy",
+            jit_compile=jit_compile,
+        )
+        train_step = time_per_step(model.train_on_batch, batches, steps)
+
+        name = dtype_policy + ("+xla" if jit_compile else "")
+        print(
+            f"{name}: train {train_step * 1000:.0f} ms/step, "
+            f"predict {predict_step * 1000:.0f} ms/step, "
+            f"agreement {np.mean(preds == reference_preds):.3f}, "
+            f"accuracy delta {accuracy - reference_acc:+.4f}"
+        )
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    main(
+        args.config,
+        args.weights,
+        args.test_folder,
+        args.steps,
+        args.batch_size,
+    )
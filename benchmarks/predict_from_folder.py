@@ -0,0 +1,113 @@
+"""
+This script compares the evaluation throughput (images/sec) of the previous
+`utils.predict_from_folder()` implementation, running `model.predict()` once
+per image, against the current batched tf.data pipeline.
+
+Usage:
+    $ python benchmarks/predict_from_folder.py \\
+        experiments/exp_001/config.yml \\
+        experiments/exp_001/model.06-2.0449.h5 \\
+        data/car_ims_v2/test/
+"""
+import argparse
+import os
+import time
+
+import numpy as np
+from tensorflow import keras
+
+from models import resnet_50
+from utils import utils
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Benchmark predictions over a folder."
+    )
+    parser.add_argument(
+        "config_file",
+        type=str,
+        help="Full path to experiment configuration file.",
+    )
+    parser.add_argument(
+        "weights",
+        type=str,
+        help="Full path to the trained model weights.",
+    )
+    parser.add_argument(
+        "test_folder",
+        type=str,
+        help="Full path to the test images folder.",
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=32,
+        help="Number of images sent to the model at once.",
+    )
+
+    args = parser.parse_args()
+
+    return args
+
+
+def predict_one_by_one(folder, model, input_size, class_names):
+    """
+    Previous implementation of `utils.predict_from_folder()`, kept here as
+    baseline.
+    """
+    predictions = []
+    labels = []
+    for dirpath, _, files in os.walk(folder):
+        for filename in files:
+            fname = os.path.join(dirpath, filename)
+            img = keras.utils.load_img(fname, target_size=input_size)
+            img_array = keras.utils.img_to_array(img)[np.newaxis]
+            pred = np.argmax(model.predict(img_array))
+            predictions.append(class_names[pred])
+            labels.append(dirpath.split("/")[-1])
+
+    return predictions, labels
+
+
+def main(config_file, weights, test_folder, batch_size):
+    """
+    Parameters
+    ----------
+    config_file : str
+        Full path to experiment configuration file.
+
+    weights : str
+        Full path to the trained model weights.
+
+    test_folder : str
+        Full path to the test images folder.
+
+    batch_size : int
+        Number of images sent to the model at once.
+    """
+    config = utils.load_config(config_file)
+    class_names = utils.get_class_names(config)
+    input_size = config["data"]["image_size"]
+    model = resnet_50.create_model(weights=weights)
+
+    start = time.perf_counter()
+    expected = predict_one_by_one(test_folder, model, input_size, class_names)
+    elapsed = time.perf_counter() - start
+    print(f"one by one: {len(expected[0]) / elapsed:.2f} images/sec")
+
+    start = time.perf_counter()
+    results = utils.predict_from_folder(
+        test_folder, model, input_size, class_names, batch_size
+    )
+    elapsed = time.perf_counter() - start
+    print(f"batched: {len(results[0]) / elapsed:.2f} images/sec")
+
+    same = sum(a == b for a, b in zip(expected[0], results[0]))
+    print(f"same predictions: {same}/{len(expected[0])}")
+    assert expected[1] == results[1]
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    main(args.config_file, args.weights, args.test_folder, args.batch_size)
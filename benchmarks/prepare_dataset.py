@@ -0,0 +1,131 @@
+"""
+This script compares the throughput (files/sec) of the previous
+`scripts/prepare_train_test_dataset.py` implementation, checking and
+linking one row at a time, against the current vectorized and threaded
+one, on a synthetic dataset.
+
+Both run twice on the same output folder: the first run links every
+image, the second one only finds they are already there.
+
+Usage:
+    $ python benchmarks/prepare_dataset.py --rows 100000 --workers 16
+    $ python benchmarks/prepare_dataset.py --tmp-dir /mnt/nfs/tmp/
+"""
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from scripts import prepare_train_test_dataset
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Benchmark the train/test split preparation."
+    )
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--classes", type=int, default=196)
+    parser.add_argument("--workers", type=int, default=16)
+    parser.add_argument(
+        "--tmp-dir",
+        type=str,
+        help="Folder where the synthetic dataset is written, e.g. on a "
+        "network filesystem.",
+    )
+
+    args = parser.parse_args()
+
+    return args
+
+
+def prepare_row_by_row(data_folder, labels, output_data_folder):
+    """
+    Previous implementation of `prepare_train_test_dataset.main()`, kept
+    here as baseline.
+    """
+    cars_df = pd.read_csv(labels, header=0)
+    for subset in cars_df["subset"].unique():
+        for clase in cars_df["class"].unique():
+            subfolder_path = (
+                output_data_folder + "/" + subset + "/" + clase + "/"
+            )
+            os.makedirs(subfolder_path, exist_ok=True)
+    for car in cars_df.index:
+        dst = (
+            output_data_folder
+            + "/"
+            + cars_df["subset"][car]
+            + "/"
+            + cars_df["class"][car]
+            + "/"
+            + cars_df["img_name"][car]
+        )
+        if os.path.exists(dst):
+            continue
+        os.link(data_folder + "/" + cars_df["img_name"][car], dst)
+
+
+def make_dataset(folder, rows, classes):
+    # Tiny image files and their labels CSV
+    data_folder = os.path.join(folder, "car_ims")
+    os.makedirs(data_folder)
+    rng = np.random.RandomState(0)
+    cars_df = pd.DataFrame(
+        {
+            "img_name": [f"{i:06d}.jpg" for i in range(rows)],
+            "class": [f"Class {k}" for k in rng.randint(classes, size=rows)],
+            "subset": rng.choice(["train", "test"], size=rows),
+        }
+    )
+    for img_name in cars_df["img_name"]:
+        with open(os.path.join(data_folder, img_name), "wb") as f:
+            f.write(b"\xff\xd8")
+    labels = os.path.join(folder, "car_dataset_labels.csv")
+    cars_df.to_csv(labels, index=False)
+
+    return data_folder, labels
+
+
+def main(rows, classes, workers, tmp_dir=None):
+    """
+    Parameters
+    ----------
+    rows : int
+        Number of images in the synthetic dataset.
+
+    classes : int
+        Number of classes in the synthetic dataset.
+
+    workers : int
+        Number of threads used by the current implementation.
+
+    tmp_dir : str
+        Folder where the synthetic dataset is written.
+    """
+    folder = tempfile.mkdtemp(dir=tmp_dir)
+    try:
+        data_folder, labels = make_dataset(folder, rows, classes)
+        implementations = {
+            "row by row": prepare_row_by_row,
+            "vectorized": lambda *args: prepare_train_test_dataset.main(
+                *args, workers=workers
+            ),
+        }
+        for name, prepare in implementations.items():
+            output_data_folder = os.path.join(folder, name.replace(" ", "_"))
+            for run in ("first run", "second run"):
+                start = time.perf_counter()
+                prepare(data_folder, labels, output_data_folder)
+                elapsed = time.perf_counter() - start
+                print(f"{name}, {run}: {rows / elapsed:.0f} files/sec")
+    finally:
+        shutil.rmtree(folder)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    main(args.rows, args.classes, args.workers, args.tmp_dir)
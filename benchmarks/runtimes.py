@@ -0,0 +1,119 @@
+"""
+This script compares the CPU latency and throughput of the same classifier
+run by each runtime of `utils.runtime`: the training checkpoint in Keras,
+and the SavedModel, TFLite and ONNX models written by
+`scripts/export_model.py`.
+
+For each model it reports the batch of one latency, median and 99th
+percentile, the throughput with full batches and how often its predictions
+agree with the first model. Random images are used, so no dataset is
+needed. Without models, a randomly initialized classifier is exported to a
+temporary folder first.
+
+Usage:
+    $ python benchmarks/runtimes.py
+    $ python benchmarks/runtimes.py experiments/exp_001/model.06-2.0449.h5 \\
+        experiments/exp_001/export/saved_model \\
+        experiments/exp_001/export/model.tflite --num-threads 4
+"""
+import argparse
+import os
+import tempfile
+
+import numpy as np
+
+from models import resnet_50
+from scripts import export_model
+from utils.runtime import load_runtime, measure_latency
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Benchmark inference runtimes on CPU."
+    )
+    parser.add_argument(
+        "models",
+        type=str,
+        nargs="*",
+        help="Checkpoint or exported models, by default a random model.",
+    )
+    parser.add_argument("--steps", type=int, default=20)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument(
+        "--image-size",
+        type=int,
+        nargs=2,
+        default=[224, 224],
+        help="Model input size as height width.",
+    )
+    parser.add_argument(
+        "--num-threads",
+        type=int,
+        help="Threads used by the TFLite and ONNX runtimes.",
+    )
+
+    args = parser.parse_args()
+
+    return args
+
+
+def main(models, steps, batch_size, image_size=(224, 224), num_threads=None):
+    """
+    Parameters
+    ----------
+    models : list
+        Full paths to the checkpoint or exported models.
+
+    steps : int
+        Number of calls timed for each model and batch size.
+
+    batch_size : int
+        Size of the batches used to measure throughput.
+
+    image_size : tuple
+        Model input size as (height, width).
+
+    num_threads : int
+        Threads used by the TFLite and ONNX runtimes.
+    """
+    if not models:
+        folder = tempfile.mkdtemp()
+        checkpoint = os.path.join(folder, "model.h5")
+        model = resnet_50.create_model(
+            weights=None, input_shape=(*image_size, 3), classes=196
+        )
+        model.save(checkpoint)
+        models = [checkpoint] + export_model.main(
+            checkpoint, os.path.join(folder, "export")
+        )
+
+    images = np.random.RandomState(0).uniform(
+        0, 255, size=(batch_size, *image_size, 3)
+    )
+    images = images.astype(np.float32)
+    reference_preds = None
+    for path in models:
+        runtime = load_runtime(path, num_threads=num_threads)
+        preds = runtime.predict_on_batch(images).argmax(axis=1)
+        if reference_preds is None:
+            reference_preds = preds
+
+        single = measure_latency(runtime, images[:1], steps)
+        batch = measure_latency(runtime, images, steps)
+        print(
+            f"{path}: latency p50 {np.median(single) * 1000:.1f} ms, "
+            f"p99 {np.percentile(single, 99) * 1000:.1f} ms, "
+            f"throughput {batch_size / np.median(batch):.1f} images/s, "
+            f"agreement {np.mean(preds == reference_preds):.3f}"
+        )
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    main(
+        args.models,
+        args.steps,
+        args.batch_size,
+        args.image_size,
+        args.num_threads,
+    )
@@ -0,0 +1,109 @@
+"""
+Micro-benchmark for `utils.detection.select_largest_vehicle()` against the
+previous Python loop used by `get_vehicle_coordinates()`, on synthetic
+detector outputs with hundreds of boxes per image.
+
+Usage:
+    $ python benchmarks/select_largest_vehicle.py --boxes 300 --images 1000
+"""
+import argparse
+import time
+
+import numpy as np
+
+from utils.detection import select_largest_vehicle
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Benchmark vehicle box selection."
+    )
+    parser.add_argument(
+        "--boxes",
+        type=int,
+        default=300,
+        help="Number of detections per image.",
+    )
+    parser.add_argument(
+        "--images",
+        type=int,
+        default=1000,
+        help="Number of synthetic images.",
+    )
+    parser.add_argument("--seed", type=int, default=123)
+
+    args = parser.parse_args()
+
+    return args
+
+
+def loop_selection(classes, boxes, shape):
+    """
+    Box selection as it was implemented before, kept here as baseline.
+    The full image fallback only applies when no vehicle is found, so
+    results can be compared with the vectorized version.
+    """
+    box_area_list = []
+    coordinates_list = []
+    box_coordinates = [0, 0, shape[1], shape[0]]
+    for index, class_num in enumerate(classes):
+        if class_num == 2 or class_num == 7:
+            x1 = int(boxes[index][0])
+            y1 = int(boxes[index][1])
+            x2 = int(boxes[index][2])
+            y2 = int(boxes[index][3])
+            box_area_list.append(abs(x2 - x1) * abs(y2 - y1))
+            coordinates_list.append((x1, y1, x2, y2))
+            max_area_index = box_area_list.index(max(box_area_list))
+            box_coordinates = coordinates_list[max_area_index]
+
+    return box_coordinates
+
+
+def main(boxes, images, seed):
+    """
+    Parameters
+    ----------
+    boxes : int
+        Number of detections per image.
+
+    images : int
+        Number of synthetic images.
+
+    seed : int
+        Random seed for the synthetic detections.
+    """
+    rng = np.random.default_rng(seed)
+    shape = (480, 640)
+    classes = rng.integers(0, 10, size=(images, boxes))
+    x1y1 = rng.uniform(0, 300, size=(images, boxes, 2))
+    x2y2 = x1y1 + rng.uniform(1, 300, size=(images, boxes, 2))
+    coords = np.concatenate([x1y1, x2y2], axis=-1).astype(np.float32)
+    shapes = np.tile(shape, (images, 1))
+
+    start = time.perf_counter()
+    expected = [loop_selection(c, b, shape) for c, b in zip(classes, coords)]
+    loop_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    single = [
+        select_largest_vehicle(c, b, shape) for c, b in zip(classes, coords)
+    ]
+    single_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    stacked = select_largest_vehicle(classes, coords, shapes)
+    stacked_time = time.perf_counter() - start
+
+    assert np.array_equal(np.array(expected), np.array(single))
+    assert np.array_equal(np.array(expected), stacked)
+
+    print(f"{images} images x {boxes} boxes")
+    print(f"python loop: {images / loop_time:.0f} images/sec")
+    print(f"numpy per image: {images / single_time:.0f} images/sec")
+    print(f"numpy stacked batch: {images / stacked_time:.0f} images/sec")
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    main(args.boxes, args.images, args.seed)
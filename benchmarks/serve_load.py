@@ -0,0 +1,111 @@
+"""
+Load test for the inference service started with `scripts/serve.py`.
+For each concurrency level, it keeps that many requests in flight against
+the service and reports requests/sec and p50/p99 latencies.
+
+Usage:
+    $ python benchmarks/serve_load.py tests/test_data/ \\
+        --url http://127.0.0.1:8000/predict --concurrency 1 4 16 64
+"""
+import argparse
+import asyncio
+import time
+
+import aiohttp
+import numpy as np
+
+from utils.utils import walkdir
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Load test the inference service."
+    )
+    parser.add_argument(
+        "data_folder",
+        type=str,
+        help="Full path to a directory having the images to send.",
+    )
+    parser.add_argument(
+        "--url", type=str, default="http://127.0.0.1:8000/predict"
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        nargs="+",
+        default=[1, 4, 16, 64],
+        help="Number of requests in flight to try.",
+    )
+    parser.add_argument(
+        "--requests",
+        type=int,
+        default=256,
+        help="Number of requests sent for each concurrency level.",
+    )
+
+    args = parser.parse_args()
+
+    return args
+
+
+async def run_level(session, url, images, concurrency, num_requests):
+    latencies = []
+    next_request = iter(range(num_requests))
+
+    async def client():
+        for i in next_request:
+            start = time.perf_counter()
+            async with session.post(url, data=images[i % len(images)]) as r:
+                r.raise_for_status()
+                await r.json()
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    latencies_ms = np.array(latencies) * 1000
+    return (
+        f"concurrency={concurrency}: {num_requests / elapsed:.2f} req/sec, "
+        f"p50 {np.percentile(latencies_ms, 50):.1f} ms, "
+        f"p99 {np.percentile(latencies_ms, 99):.1f} ms"
+    )
+
+
+async def main(data_folder, url, concurrency, num_requests):
+    """
+    Parameters
+    ----------
+    data_folder : str
+        Full path to a directory having the images to send.
+
+    url : str
+        Service prediction endpoint.
+
+    concurrency : list
+        Number of requests in flight to try.
+
+    num_requests : int
+        Number of requests sent for each concurrency level.
+    """
+    images = []
+    for dirpath, filename in walkdir(data_folder):
+        if filename.lower().endswith((".jpg", ".jpeg", ".png")):
+            with open(f"{dirpath}/{filename}", "rb") as f:
+                images.append(f.read())
+
+    connector = aiohttp.TCPConnector(limit=max(concurrency))
+    async with aiohttp.ClientSession(connector=connector) as session:
+        # Warm up, first model calls are always slower
+        await run_level(session, url, images, 1, 4)
+        for level in concurrency:
+            print(
+                await run_level(session, url, images, level, num_requests)
+            )
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    asyncio.run(
+        main(args.data_folder, args.url, args.concurrency, args.requests)
+    )
@@ -0,0 +1,110 @@
+"""
+This script compares one training epoch of input data read from the JPEG
+tree against the TFRecord shards written by `scripts/export_shards.py`,
+without running the model, and the disk space used by each one.
+
+Usage:
+    $ python benchmarks/shard_epoch.py experiments/exp_001/config.yml \\
+        data/car_ims_v1_shards/
+"""
+import argparse
+import os
+import time
+
+from utils import datasets, shards, utils
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Benchmark reading TFRecord shards against JPEG files."
+    )
+    parser.add_argument(
+        "config_file",
+        type=str,
+        help="Full path to experiment configuration file.",
+    )
+    parser.add_argument(
+        "shards_folder",
+        type=str,
+        help="Full path to the shards exported from the same config.",
+    )
+    parser.add_argument(
+        "--epochs",
+        type=int,
+        default=2,
+        help="Number of passes over the training split.",
+    )
+
+    args = parser.parse_args()
+
+    return args
+
+
+def time_epochs(dataset, epochs):
+    # Seconds taken by each full pass over `dataset`
+    times = []
+    for _ in range(epochs):
+        start = time.perf_counter()
+        for _ in dataset:
+            pass
+        times.append(time.perf_counter() - start)
+
+    return times
+
+
+def main(config_file, shards_folder, epochs):
+    """
+    Parameters
+    ----------
+    config_file : str
+        Full path to experiment configuration file.
+
+    shards_folder : str
+        Full path to the shards exported from the same config.
+
+    epochs : int
+        Number of passes over the training split.
+    """
+    config = utils.load_config(config_file)
+    class_names = utils.get_class_names(config)
+    data = config["data"]
+    data.pop("pipeline", None)
+    kwargs = dict(
+        label_mode=data.get("label_mode", "int"),
+        class_names=class_names,
+        image_size=data.get("image_size", (256, 256)),
+        batch_size=data.get("batch_size", 32),
+        seed=config["seed"],
+        validation_split=data.get("validation_split"),
+        subset="training" if data.get("validation_split") else None,
+    )
+
+    jpeg_ds = datasets.image_dataset_from_directory(
+        data["directory"],
+        boxes=data.get("boxes"),
+        interpolation=data.get("interpolation", "bilinear"),
+        **kwargs,
+    )
+    shards_ds = shards.image_dataset_from_shards(shards_folder, **kwargs)
+
+    jpeg_size = sum(os.path.getsize(path) for path in jpeg_ds.file_paths)
+    index = shards.load_index(shards_folder)
+    shards_size = sum(
+        os.path.getsize(os.path.join(shards_folder, fname))
+        for fname in index["splits"]["training"]["files"]
+    )
+
+    jpeg_times = time_epochs(jpeg_ds, epochs)
+    shards_times = time_epochs(shards_ds, epochs)
+    for name, times, size in (
+        ("jpeg", jpeg_times, jpeg_size),
+        ("shards", shards_times, shards_size),
+    ):
+        epoch_times = ", ".join(f"{t:.2f}s" for t in times)
+        print(f"{name}: epochs {epoch_times}, {size / 1024**2:.1f} MB")
+    print(f"speedup: {min(jpeg_times) / min(shards_times):.2f}x")
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    main(args.config_file, args.shards_folder, args.epochs)
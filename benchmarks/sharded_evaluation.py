@@ -0,0 +1,119 @@
+"""
+This script measures how evaluation over a test folder scales when the
+images are split between several worker processes, see
+`utils.evaluation.EvaluationResult.from_folder_sharded()`.
+
+Usage:
+    $ python benchmarks/sharded_evaluation.py \\
+        experiments/exp_001/config.yml \\
+        experiments/exp_001/model.06-2.0449.h5 \\
+        data/car_ims_v2/test/ \\
+        --workers 1 2 4 8
+"""
+import argparse
+import time
+
+import numpy as np
+
+from utils import utils
+from utils.evaluation import EvaluationResult
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Benchmark sharded evaluation scaling."
+    )
+    parser.add_argument(
+        "config_file",
+        type=str,
+        help="Full path to experiment configuration file.",
+    )
+    parser.add_argument(
+        "weights",
+        type=str,
+        help="Full path to the trained model weights.",
+    )
+    parser.add_argument(
+        "test_folder",
+        type=str,
+        help="Full path to the test images folder.",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        nargs="+",
+        default=[1, 2, 4, 8],
+        help="Number of worker processes to try.",
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=32,
+        help="Number of images sent to the model at once.",
+    )
+
+    args = parser.parse_args()
+
+    return args
+
+
+def main(config_file, weights, test_folder, workers, batch_size):
+    """
+    Parameters
+    ----------
+    config_file : str
+        Full path to experiment configuration file.
+
+    weights : str
+        Full path to the trained model weights.
+
+    test_folder : str
+        Full path to the test images folder.
+
+    workers : list
+        Number of worker processes to try.
+
+    batch_size : int
+        Number of images sent to the model at once.
+    """
+    config = utils.load_config(config_file)
+    class_names = utils.get_class_names(config)
+    input_size = config["data"]["image_size"]
+
+    baseline = None
+    reference = None
+    for num_workers in workers:
+        # Wall time includes starting the workers and loading the models
+        start = time.perf_counter()
+        result = EvaluationResult.from_folder_sharded(
+            test_folder,
+            weights,
+            input_size,
+            class_names,
+            workers=num_workers,
+            batch_size=batch_size,
+        )
+        elapsed = time.perf_counter() - start
+        throughput = len(result) / elapsed
+        baseline = baseline or throughput
+        print(
+            f"workers={num_workers}: {throughput:.2f} images/sec, "
+            f"speedup x{throughput / baseline:.2f}, "
+            f"accuracy {result.accuracy():.4f}"
+        )
+
+        # Merged results must not depend on the number of workers
+        if reference is None:
+            reference = result.predictions
+        assert np.array_equal(reference, result.predictions)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    main(
+        args.config_file,
+        args.weights,
+        args.test_folder,
+        args.workers,
+        args.batch_size,
+    )
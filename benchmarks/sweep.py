@@ -0,0 +1,164 @@
+"""
+This script compares running the trials of a hyperparameter search as
+separate `scripts/train.py` processes, one per trial config, against
+running them all in one process with `scripts/sweep.py`, and reports the
+trials per hour of each.
+
+A synthetic dataset of random JPEGs is used. Random weights are used too
+(`weights: null`), so the time saved by reading the ImageNet weights once
+isn't included. Early stopping is turned off, every trial trains all its
+epochs in both runs.
+
+Usage:
+    $ python benchmarks/sweep.py --images 256 --image-size 96 --trials 4
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+import yaml
+from PIL import Image
+
+from scripts import sweep
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Benchmark hyperparameter search trials per hour."
+    )
+    parser.add_argument("--images", type=int, default=256)
+    parser.add_argument("--classes", type=int, default=4)
+    parser.add_argument("--image-size", type=int, default=96)
+    parser.add_argument("--epochs", type=int, default=2)
+    parser.add_argument("--trials", type=int, default=4)
+
+    args = parser.parse_args()
+
+    return args
+
+
+def make_dataset(folder, images, classes):
+    # Folder of random JPEGs per class, like `data/car_ims_v1/train`
+    rng = np.random.RandomState(0)
+    for i in range(images):
+        class_folder = os.path.join(folder, f"Class {i % classes}")
+        os.makedirs(class_folder, exist_ok=True)
+        pixels = rng.randint(0, 256, (240, 320, 3), dtype=np.uint8)
+        Image.fromarray(pixels).save(os.path.join(class_folder, f"{i}.jpg"))
+
+
+def write_yaml(path, content):
+    with open(path, "w") as f:
+        yaml.safe_dump(content, f, sort_keys=False)
+
+    return path
+
+
+def main(images, classes, image_size, epochs, trials):
+    """
+    Parameters
+    ----------
+    images : int
+        Number of synthetic images.
+
+    classes : int
+        Number of classes.
+
+    image_size : int
+        Model input height and width.
+
+    epochs : int
+        Epochs trained by each trial.
+
+    trials : int
+        Number of trials of the search.
+    """
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        data = os.path.join(tmp_dir, "data")
+        make_dataset(data, images, classes)
+        config = {
+            "seed": 123,
+            "data": {
+                "directory": data,
+                "label_mode": "categorical",
+                "validation_split": 0.2,
+                "image_size": [image_size, image_size],
+                "batch_size": 32,
+            },
+            "model": {
+                "weights": None,
+                "input_shape": [image_size, image_size, 3],
+                "classes": classes,
+            },
+            "compile": {
+                "loss": "categorical_crossentropy",
+                "metrics": ["accuracy"],
+            },
+            "fit": {"epochs": epochs, "verbose": 0},
+        }
+        search = {
+            "search": "random",
+            "trials": trials,
+            "seed": 0,
+            "parameters": {
+                "compile.optimizer": [
+                    {"adam": {"learning_rate": 0.001}},
+                    {"sgd": {"learning_rate": 0.01, "momentum": 0.9}},
+                ],
+                "model.dropout_rate": {"uniform": [0.1, 0.6]},
+                "model.data_aug_layer": [
+                    None,
+                    {"random_flip": {"mode": "horizontal"}},
+                ],
+            },
+            "early_stopping": {"min_runs": trials + 1},
+        }
+        config_file = write_yaml(os.path.join(tmp_dir, "config.yml"), config)
+        sweep_file = write_yaml(os.path.join(tmp_dir, "sweep.yml"), search)
+
+        # One `scripts/train.py` process per trial
+        start = time.perf_counter()
+        for i, params in enumerate(sweep.trial_parameters(search)):
+            trial_folder = os.path.join(tmp_dir, "processes", f"trial_{i}")
+            os.makedirs(trial_folder)
+            trial_file = write_yaml(
+                os.path.join(trial_folder, "config.yml"),
+                sweep.trial_config(config, params, trial_folder),
+            )
+            subprocess.run(
+                [sys.executable, "scripts/train.py", trial_file],
+                cwd=ROOT,
+                env={**os.environ, "PYTHONPATH": ROOT},
+                check=True,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+            )
+        processes = time.perf_counter() - start
+
+        # All the trials in one process
+        start = time.perf_counter()
+        sweep.main(config_file, sweep_file, os.path.join(tmp_dir, "sweep"))
+        single = time.perf_counter() - start
+
+    print(f"\n{trials} trials of {epochs} epochs, {images} images")
+    for name, elapsed in (
+        ("One process per trial", processes),
+        ("scripts/sweep.py", single),
+    ):
+        print(
+            f"{name:>24}: {elapsed:6.1f}s, "
+            f"{trials / elapsed * 3600:6.1f} trials per hour"
+        )
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    main(
+        args.images, args.classes, args.image_size, args.epochs, args.trials
+    )
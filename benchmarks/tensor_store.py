@@ -0,0 +1,86 @@
+"""
+This script measures how long it takes to open a tensor store built with
+`scripts/build_tensor_store.py` and to read one training epoch from it,
+against the JPEG loader, without running the model.
+
+Run it twice, or in several processes at the same time: once the store is
+in the page cache, reads don't touch the disk and all processes share the
+same physical memory.
+
+Usage:
+    $ python benchmarks/tensor_store.py experiments/exp_001/config.yml \\
+        data/car_ims_v1_store/
+"""
+import argparse
+import time
+
+from utils import datasets, utils
+from utils.tensor_store import image_sequence_from_store
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Benchmark reading a tensor store against JPEG files."
+    )
+    parser.add_argument(
+        "config_file",
+        type=str,
+        help="Full path to experiment configuration file.",
+    )
+    parser.add_argument(
+        "store_folder",
+        type=str,
+        help="Full path to the tensor store built from the same config.",
+    )
+
+    args = parser.parse_args()
+
+    return args
+
+
+def main(config_file, store_folder):
+    """
+    Parameters
+    ----------
+    config_file : str
+        Full path to experiment configuration file.
+
+    store_folder : str
+        Full path to the tensor store built from the same config.
+    """
+    config = utils.load_config(config_file)
+    class_names = utils.get_class_names(config)
+    data = config["data"]
+    kwargs = dict(
+        label_mode=data.get("label_mode", "int"),
+        class_names=class_names,
+        image_size=data.get("image_size", (256, 256)),
+        batch_size=data.get("batch_size", 32),
+        seed=config["seed"],
+        validation_split=data.get("validation_split"),
+        subset="training" if data.get("validation_split") else None,
+    )
+
+    start = time.perf_counter()
+    sequence = image_sequence_from_store(store_folder, **kwargs)
+    print(f"store: opened in {(time.perf_counter() - start) * 1000:.1f} ms")
+    start = time.perf_counter()
+    for i in range(len(sequence)):
+        sequence[i]
+    print(f"store: epoch {time.perf_counter() - start:.2f}s")
+
+    start = time.perf_counter()
+    jpeg_ds = datasets.image_dataset_from_directory(
+        data["directory"],
+        boxes=data.get("boxes"),
+        interpolation=data.get("interpolation", "bilinear"),
+        **kwargs,
+    )
+    for _ in jpeg_ds:
+        pass
+    print(f"jpeg: epoch {time.perf_counter() - start:.2f}s")
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    main(args.config_file, args.store_folder)
@@ -1,23 +1,300 @@
-import boto3
-import os
-
-# fetch credentials from env variables
-aws_access_key_id = os.environ.get('AWS_ACCESS_KEY_ID')
-aws_secret_access_key = os.environ.get('AWS_SECRET_ACCESS_KEY')
-
-# setup a AWS S3 client/resource
-s3 = boto3.resource(
-    's3',
-    aws_access_key_id=aws_access_key_id,
-    aws_secret_access_key=aws_secret_access_key,
-    )
-
-# point the resource at the existing bucket
-bucket = s3.Bucket('anyoneai-datasets')
-
-# download the training dataset
-with open('training_image_set.tgz', 'wb') as data:
-    bucket.download_fileobj('cars196/car_ims.tgz', data)
-# download the dataset labels
-with open('car_dataset_labels.csv', 'wb') as data:
-    bucket.download_fileobj('cars196/car_dataset_labels.csv', data)
\ No newline at end of file
+"""
+This script downloads the dataset files from S3: the images archive, saved
+as `training_image_set.tgz`, and the labels `car_dataset_labels.csv`.
+
+Big files are downloaded in ranged parts, many at a time, see
+`--max-concurrency` and `--chunk-size-mb`. Parts are written into a
+`.part` file and the finished ones are tracked in a `.download.json` file
+next to it, so an interrupted download resumes where it stopped when run
+again. Each file is checked against its S3 ETag once downloaded, and files
+already downloaded and verified are skipped.
+
+AWS credentials are taken from the `AWS_ACCESS_KEY_ID` and
+`AWS_SECRET_ACCESS_KEY` environment variables.
+
+Usage:
+    $ python download.py --output-folder data/ --max-concurrency 16
+"""
+import argparse
+import hashlib
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import boto3
+from boto3.s3.transfer import TransferConfig
+
+BUCKET = "anyoneai-datasets"
+
+# S3 key of each dataset file and its local file name
+FILES = {
+    "cars196/car_ims.tgz": "training_image_set.tgz",
+    "cars196/car_dataset_labels.csv": "car_dataset_labels.csv",
+}
+
+# Files kept next to a download while it's in progress
+PART_SUFFIX = ".part"
+STATE_SUFFIX = ".download.json"
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Download the dataset.")
+    parser.add_argument(
+        "--output-folder",
+        type=str,
+        default=".",
+        help="Full path to the directory in which files are saved.",
+    )
+    parser.add_argument("--bucket", type=str, default=BUCKET)
+    parser.add_argument(
+        "--max-concurrency",
+        type=int,
+        default=8,
+        help="Number of parts downloaded at the same time.",
+    )
+    parser.add_argument(
+        "--chunk-size-mb",
+        type=int,
+        default=8,
+        help="Size of each downloaded part, in MB.",
+    )
+
+    args = parser.parse_args()
+
+    return args
+
+
+def create_client():
+    """
+    S3 client using the credentials from the environment variables.
+    """
+    return boto3.client(
+        "s3",
+        aws_access_key_id=os.environ.get("AWS_ACCESS_KEY_ID"),
+        aws_secret_access_key=os.environ.get("AWS_SECRET_ACCESS_KEY"),
+    )
+
+
+def file_etag(path, part_size=None, parts_count=1):
+    """
+    Computes the ETag S3 gives to `path` once uploaded: the MD5 of the file
+    for single part uploads, or the MD5 of the parts MD5s followed by the
+    number of parts for multipart uploads.
+
+    Parameters
+    ----------
+    path : str
+        Full path to the local file.
+
+    part_size : int
+        Size of the upload parts, except the last one. Only needed when
+        `parts_count` > 1.
+
+    parts_count : int
+        Number of parts the object was uploaded in.
+
+    Returns
+    -------
+    etag : str
+        ETag without quotes.
+    """
+    block_size = part_size if parts_count > 1 else 1024**2
+    file_digest = hashlib.md5()
+    part_digests = b""
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            file_digest.update(block)
+            part_digests += hashlib.md5(block).digest()
+
+    if parts_count <= 1:
+        return file_digest.hexdigest()
+
+    return f"{hashlib.md5(part_digests).hexdigest()}-{parts_count}"
+
+
+def verify(client, bucket, key, path, head):
+    """
+    Whether the local file `path` has the same content as the S3 object,
+    comparing sizes and ETags. Objects encrypted with KMS have ETags that
+    aren't MD5 digests, only their size is compared.
+
+    Parameters
+    ----------
+    client : botocore.client.S3
+        S3 client.
+
+    bucket, key : str
+        S3 object location.
+
+    path : str
+        Full path to the local file.
+
+    head : dict
+        Output of `client.head_object()` for the object.
+    """
+    if os.path.getsize(path) != head["ContentLength"]:
+        return False
+    if head.get("ServerSideEncryption") == "aws:kms":
+        return True
+
+    etag = head["ETag"].strip('"')
+    parts_count = int(etag.split("-")[1]) if "-" in etag else 1
+    part_size = None
+    if parts_count > 1:
+        part_size = client.head_object(Bucket=bucket, Key=key, PartNumber=1)[
+            "ContentLength"
+        ]
+
+    return file_etag(path, part_size, parts_count) == etag
+
+
+def fetch(client, bucket, key, path, config=None):
+    """
+    Downloads an S3 object to `path` with ranged requests running in
+    parallel, resuming a previous interrupted download of the same object
+    version, and verifies it, see `verify()`.
+
+    Parameters
+    ----------
+    client : botocore.client.S3
+        S3 client.
+
+    bucket, key : str
+        S3 object location.
+
+    path : str
+        Full path to the local file.
+
+    config : boto3.s3.transfer.TransferConfig
+        Objects bigger than `multipart_threshold` are downloaded in parts
+        of `multipart_chunksize` bytes, `max_concurrency` at a time.
+
+    Returns
+    -------
+    downloaded : bool
+        False when a verified copy of the object was already in `path`.
+    """
+    config = config or TransferConfig()
+    head = client.head_object(Bucket=bucket, Key=key)
+    etag = head["ETag"].strip('"')
+    size = head["ContentLength"]
+    part_path = path + PART_SUFFIX
+    state_path = path + STATE_SUFFIX
+    state = _load_state(state_path)
+
+    if os.path.isfile(path):
+        if state.get("etag") == etag and state.get("verified"):
+            if os.path.getsize(path) == size:
+                return False
+        # Downloaded before this script kept its state, or changed since
+        elif verify(client, bucket, key, path, head):
+            _save_state(state_path, {"etag": etag, "verified": True})
+            return False
+
+    chunk_size = max(size, 1)
+    if size > config.multipart_threshold:
+        chunk_size = config.multipart_chunksize
+    # Parts are only reused for the same object version and part size
+    if (
+        state.get("etag") != etag
+        or state.get("chunk_size") != chunk_size
+        or not os.path.isfile(part_path)
+    ):
+        state = {"etag": etag, "chunk_size": chunk_size, "done": []}
+        with open(part_path, "wb") as f:
+            f.truncate(size)
+        _save_state(state_path, state)
+
+    done = set(state["done"])
+    chunks = [
+        start for start in range(0, size, chunk_size) if start not in done
+    ]
+    lock = threading.Lock()
+
+    def download_chunk(start):
+        end = min(start + chunk_size, size) - 1
+        response = client.get_object(
+            Bucket=bucket,
+            Key=key,
+            Range=f"bytes={start}-{end}",
+            IfMatch=head["ETag"],
+        )
+        os.pwrite(fd, response["Body"].read(), start)
+        with lock:
+            state["done"].append(start)
+            _save_state(state_path, state)
+
+    fd = os.open(part_path, os.O_WRONLY)
+    try:
+        with ThreadPoolExecutor(config.max_concurrency) as executor:
+            list(executor.map(download_chunk, chunks))
+    finally:
+        os.close(fd)
+
+    if not verify(client, bucket, key, part_path, head):
+        # Start from zero next time
+        os.remove(part_path)
+        os.remove(state_path)
+        raise ValueError(
+            f"Downloaded s3://{bucket}/{key} doesn't match its ETag"
+        )
+    os.replace(part_path, path)
+    _save_state(state_path, {"etag": etag, "verified": True})
+
+    return True
+
+
+def _load_state(state_path):
+    try:
+        with open(state_path, "r") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def _save_state(state_path, state):
+    # Replaced at once, an interruption never leaves a partial state
+    with open(f"{state_path}.tmp", "w") as f:
+        json.dump(state, f)
+    os.replace(f"{state_path}.tmp", state_path)
+
+
+def main(output_folder, bucket, max_concurrency, chunk_size_mb):
+    """
+    Parameters
+    ----------
+    output_folder : str
+        Full path to the directory in which files are saved.
+
+    bucket : str
+        S3 bucket having the dataset.
+
+    max_concurrency : int
+        Number of parts downloaded at the same time.
+
+    chunk_size_mb : int
+        Size of each downloaded part, in MB.
+    """
+    client = create_client()
+    config = TransferConfig(
+        multipart_chunksize=chunk_size_mb * 1024**2,
+        max_concurrency=max_concurrency,
+    )
+    os.makedirs(output_folder, exist_ok=True)
+    for key, filename in FILES.items():
+        path = os.path.join(output_folder, filename)
+        if fetch(client, bucket, key, path, config):
+            print(f"Downloaded s3://{bucket}/{key} to {path}")
+        else:
+            print(f"{path} already downloaded")
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    main(
+        args.output_folder,
+        args.bucket,
+        args.max_concurrency,
+        args.chunk_size_mb,
+    )
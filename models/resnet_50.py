@@ -6,12 +6,64 @@ from tensorflow.keras import callbacks
 from tensorflow.keras.models import Sequential
 from tensorflow.keras import regularizers
 
+
+# ImageNet backbone weights already loaded in this process, by input shape
+_BACKBONE_WEIGHTS = {}
+
+
+def create_backbone(weights="imagenet", input_shape=(224, 224, 3)):
+    """
+    Creates the ResNet50 backbone without its classification layer and with
+    global average pooling as output.
+
+    The ImageNet weights are only read from disk (or downloaded) the first
+    time, later backbones created in the same process get a copy of them,
+    e.g. each trial of `scripts/sweep.py`. Use `clear_backbone_cache()` to
+    free them.
+
+    Parameters
+    ----------
+    weights : str
+        One of None (random initialization) or 'imagenet'.
+
+    input_shape : tuple
+        Input image shape as (height, width, channels).
+
+    Returns
+    -------
+    base_model : keras.Model
+        ResNet50 backbone.
+    """
+    key = tuple(input_shape)
+    cached = weights == "imagenet" and key in _BACKBONE_WEIGHTS
+    base_model = keras.applications.resnet50.ResNet50(
+        include_top=False,
+        weights=None if cached else weights,
+        pooling="avg",
+        input_shape=input_shape,
+    )
+    if cached:
+        base_model.set_weights(_BACKBONE_WEIGHTS[key])
+    elif weights == "imagenet":
+        _BACKBONE_WEIGHTS[key] = base_model.get_weights()
+
+    return base_model
+
+
+def clear_backbone_cache():
+    """
+    Frees the backbone weights kept by `create_backbone()`.
+    """
+    _BACKBONE_WEIGHTS.clear()
+
+
 def create_model(
     weights: str = "imagenet",
     input_shape: tuple = (224, 224, 3),
     dropout_rate: float = 0.0,
     data_aug_layer: dict = None,
     classes: int = None,
+    dtype_policy: str = None,
 ):
     
     """
@@ -60,6 +112,14 @@ def create_model(
         already has the output classes number defined and we shouldn't change
         it.
 
+    dtype_policy : str
+        Keras dtype policy used to build the model, e.g. "mixed_bfloat16",
+        see `keras.mixed_precision.Policy`. It only applies while building
+        this model, the global policy is restored afterwards. The softmax
+        output always stays in float32 for numerical stability.
+        Only needed when weights='imagenet'. Otherwise, the trained model
+        already has its layers dtype defined.
+
     Returns
     -------
     model : keras.Model
@@ -67,8 +127,20 @@ def create_model(
         predictions.
     """
 
+    # Build all the layers with the requested policy, without leaking it to
+    # models created afterwards
+    if dtype_policy is not None:
+        previous_policy = keras.mixed_precision.global_policy()
+        keras.mixed_precision.set_global_policy(dtype_policy)
+        try:
+            return create_model(
+                weights, input_shape, dropout_rate, data_aug_layer, classes
+            )
+        finally:
+            keras.mixed_precision.set_global_policy(previous_policy)
+
     # Create the model to be used for finetuning here!
-    if weights == "imagenet":
+    if weights in ("imagenet", None):
         # Define the Input layer
         # Assign it to `input` variable
         # Use keras.layers.Input(), following this requirements:
@@ -104,7 +176,7 @@ def create_model(
         #   3. Use Global average pooling as model output
         # TODO
         #tf.keras.applications.resnet50.ResNet50(include_top=True, weights='imagenet', input_tensor=None, input_shape=None, pooling=None, classes=1000, **kwargs)
-        base_model = keras.applications.resnet50.ResNet50(include_top=False, weights=weights, pooling='avg', input_shape=input_shape)
+        base_model = create_backbone(weights, input_shape)
         
         #unfreezing the last 30 layers
         for layer in base_model.layers[-30:]:
@@ -124,7 +196,12 @@ def create_model(
         # Assign it to `outputs` variable
         # TODO
         #outputs = None
-        x2 = keras.layers.Dense(classes, kernel_regularizer=regularizers.l2(0.0005), activation='softmax')
+        x2 = keras.layers.Dense(
+            classes,
+            kernel_regularizer=regularizers.l2(0.0005),
+            activation="softmax",
+            dtype="float32",
+        )
         outputs = x2(x)
 
         # Now you have all the layers in place, create a new model
@@ -142,3 +219,71 @@ def create_model(
         model=keras.models.load_model(weights) 
 
     return model
+
+
+def split_model(model):
+    """
+    Splits a model made by `create_model()` in two parts sharing its layers:
+    the frozen backbone, from the input image to the pooled features, and
+    the trainable head, the final Dropout and Dense layers.
+
+    Training the head also trains `model`, as they share the same layers.
+
+    Parameters
+    ----------
+    model : keras.Model
+        Model made by `create_model()`.
+
+    Returns
+    -------
+    backbone, head : tuple
+        Keras models, the backbone returns the pooled features and the head
+        takes them as input.
+    """
+    dropout, dense = model.layers[-2], model.layers[-1]
+    if not isinstance(dropout, keras.layers.Dropout) or not isinstance(
+        dense, keras.layers.Dense
+    ):
+        raise ValueError(
+            "Model must end with a Dropout and a Dense layer, "
+            "see `create_model()`"
+        )
+
+    backbone = keras.Model(model.inputs, dropout.input)
+    head = keras.Sequential(
+        [keras.layers.Input(shape=dropout.input.shape[1:]), dropout, dense]
+    )
+
+    return backbone, head
+
+
+def create_inference_model(model):
+    """
+    Rebuilds a model made by `create_model()` without the layers only used
+    while training, data augmentation and Dropout. The result takes the
+    same raw RGB images, `preprocess_input()` stays part of the graph, and
+    gives the same predictions.
+
+    Parameters
+    ----------
+    model : keras.Model
+        Model made by `create_model()`, e.g. a loaded checkpoint.
+
+    Returns
+    -------
+    inference_model : keras.Model
+        Model sharing the backbone and output layers of `model`.
+    """
+    try:
+        base_model = model.get_layer("resnet50")
+    except ValueError:
+        raise ValueError(
+            "Model has no `resnet50` layer, see `create_model()`"
+        ) from None
+
+    inputs = keras.layers.Input(shape=model.input_shape[1:], dtype=tf.float32)
+    x = keras.applications.resnet50.preprocess_input(inputs)
+    x = base_model(x, training=False)
+    outputs = model.layers[-1](x)
+
+    return keras.Model(inputs, outputs, name="classifier")
@@ -0,0 +1,88 @@
+"""
+This script decodes, crops and resizes all the images of a dataset split
+once and stores them in a memory-mapped tensor store: a single uint8 array
+with shape (N, height, width, 3), a labels array and a JSON index.
+
+Image size, crop boxes and class order are taken from the experiment
+config, by default the split stored is `data.directory`.
+
+The resulting directory structure looks like this:
+    data/car_ims_v1_store/
+    ├── images.npy
+    ├── index.json
+    ├── labels.npy
+
+Then add `tensor_store: "/home/app/src/data/car_ims_v1_store"` to the
+`data` section of the experiment config. A store built from a test folder
+can be passed to `utils.predict_from_folder()` instead of the folder.
+
+Usage:
+    $ python scripts/build_tensor_store.py experiments/exp_001/config.yml \\
+        data/car_ims_v1_store/
+    $ python scripts/build_tensor_store.py experiments/exp_001/config.yml \\
+        data/car_ims_v1_test_store/ --directory data/car_ims_v1/test/
+"""
+import argparse
+
+from utils import datasets, utils
+from utils.tensor_store import TensorStore
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Build a memory-mapped tensor store."
+    )
+    parser.add_argument(
+        "config_file",
+        type=str,
+        help="Full path to experiment configuration file.",
+    )
+    parser.add_argument(
+        "output_folder",
+        type=str,
+        help="Full path to the directory in which the store is written.",
+    )
+    parser.add_argument(
+        "--directory",
+        type=str,
+        help="Dataset split stored, by default `data.directory`.",
+    )
+
+    args = parser.parse_args()
+
+    return args
+
+
+def main(config_file, output_folder, directory=None):
+    """
+    Parameters
+    ----------
+    config_file : str
+        Full path to experiment configuration file.
+
+    output_folder : str
+        Full path to the directory in which the store is written.
+
+    directory : str
+        Dataset split stored, by default `data.directory`.
+    """
+    config = utils.load_config(config_file)
+    class_names = utils.get_class_names(config)
+    data = config["data"]
+
+    boxes = datasets.load_boxes(data["boxes"]) if "boxes" in data else None
+    store = TensorStore.build(
+        directory or data["directory"],
+        output_folder,
+        class_names,
+        data.get("image_size", (256, 256)),
+        boxes=boxes,
+        interpolation=data.get("interpolation", "bilinear"),
+    )
+    size = store.images.nbytes / 1024**2
+    print(f"{len(store)} images stored, {size:.1f} MB")
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    main(args.config_file, args.output_folder, args.directory)
@@ -0,0 +1,157 @@
+"""
+This script exports a trained model for inference. The exported graph
+drops the layers only used while training, data augmentation and Dropout,
+and keeps `resnet50.preprocess_input()` inside, so it takes the same RGB
+images with values in [0, 255] as the training checkpoint.
+
+The resulting directory structure looks like this:
+    experiments/exp_001/export/
+    ├── saved_model/
+    ├── model.tflite
+    ├── model.onnx  (with --onnx, needs tf2onnx)
+
+Each artifact is checked against the checkpoint on random images before
+the script ends. Any of them can then be passed to `scripts/serve.py` or
+loaded with `utils.runtime.load_runtime()`, and compared with
+`benchmarks/runtimes.py`.
+
+Usage:
+    $ python scripts/export_model.py \\
+        experiments/exp_001/model.06-2.0449.h5 experiments/exp_001/export/
+"""
+import argparse
+import os
+
+import numpy as np
+import tensorflow as tf
+
+from models import resnet_50
+from utils.runtime import INPUT_NAME, OUTPUT_NAME, load_runtime
+
+# Maximum difference allowed between the checkpoint and exported models
+# probabilities
+TOLERANCE = 1e-3
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Export your model for inference."
+    )
+    parser.add_argument(
+        "weights",
+        type=str,
+        help="Full path to the trained model weights.",
+    )
+    parser.add_argument(
+        "output_folder",
+        type=str,
+        help="Full path to the directory in which models are written.",
+    )
+    parser.add_argument(
+        "--onnx",
+        action="store_true",
+        help="Also export an ONNX model, needs tf2onnx.",
+    )
+
+    args = parser.parse_args()
+
+    return args
+
+
+def export_saved_model(model, path):
+    """
+    Saves `model` as a SavedModel with a single serving signature, taking
+    float32 `images` with any batch size and returning `probabilities`.
+    """
+    input_spec = tf.TensorSpec(
+        (None, *model.input_shape[1:]), tf.float32, name=INPUT_NAME
+    )
+
+    @tf.function(input_signature=[input_spec])
+    def serve(images):
+        return {OUTPUT_NAME: model(images, training=False)}
+
+    tf.saved_model.save(model, path, signatures={"serving_default": serve})
+
+
+def export_tflite(saved_model_path, path):
+    """
+    Converts the SavedModel written by `export_saved_model()` to a float32
+    TFLite model.
+    """
+    converter = tf.lite.TFLiteConverter.from_saved_model(saved_model_path)
+    with open(path, "wb") as f:
+        f.write(converter.convert())
+
+
+def export_onnx(model, path):
+    """
+    Converts `model` to an ONNX model with tf2onnx.
+    """
+    try:
+        import tf2onnx
+    except ImportError:
+        raise ImportError(
+            "ONNX export needs tf2onnx, install it with `pip install tf2onnx`"
+        ) from None
+
+    input_spec = tf.TensorSpec(
+        (None, *model.input_shape[1:]), tf.float32, name=INPUT_NAME
+    )
+    tf2onnx.convert.from_keras(
+        model, input_signature=[input_spec], output_path=path
+    )
+
+
+def main(weights, output_folder, onnx=False):
+    """
+    Parameters
+    ----------
+    weights : str
+        Full path to the trained model weights.
+
+    output_folder : str
+        Full path to the directory in which models are written.
+
+    onnx : bool
+        Also export an ONNX model.
+
+    Returns
+    -------
+    paths : list
+        Exported models.
+    """
+    model = resnet_50.create_model(weights=weights)
+    inference_model = resnet_50.create_inference_model(model)
+
+    os.makedirs(output_folder, exist_ok=True)
+    saved_model_path = os.path.join(output_folder, "saved_model")
+    tflite_path = os.path.join(output_folder, "model.tflite")
+    export_saved_model(inference_model, saved_model_path)
+    export_tflite(saved_model_path, tflite_path)
+    paths = [saved_model_path, tflite_path]
+    if onnx:
+        onnx_path = os.path.join(output_folder, "model.onnx")
+        export_onnx(inference_model, onnx_path)
+        paths.append(onnx_path)
+
+    images = np.random.RandomState(0).uniform(
+        0, 255, size=(4, *model.input_shape[1:])
+    )
+    expected = model.predict_on_batch(images)
+    for path in paths:
+        probs = load_runtime(path).predict_on_batch(images)
+        max_diff = np.abs(probs - expected).max()
+        print(f"{path}: max difference with checkpoint {max_diff:.2e}")
+        if max_diff > TOLERANCE:
+            raise ValueError(
+                f"{path} predictions differ from the checkpoint by "
+                f"{max_diff:.2e}, more than {TOLERANCE}"
+            )
+
+    return paths
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    main(args.weights, args.output_folder, args.onnx)
@@ -0,0 +1,123 @@
+"""
+This script decodes, crops and resizes the images of an experiment once
+and writes them as TFRecord shards, so training doesn't decode the full
+size JPEGs again on every epoch.
+
+The training/validation split is the same one `scripts/train.py` makes from
+the experiment config (`directory`, `seed`, `validation_split`, `boxes`),
+images are resized to `image_size` and labels follow `get_class_names()`
+order. Optionally, a test folder is exported as a third split.
+
+The resulting directory structure looks like this:
+    data/car_ims_v1_shards/
+    ├── shards.json
+    ├── training-00000.tfrecord
+    ├── ...
+    ├── validation-00000.tfrecord
+    ├── ...
+    ├── test-00000.tfrecord
+    ├── ...
+
+Then add `shards: "/home/app/src/data/car_ims_v1_shards"` to the `data`
+section of the experiment config.
+
+Usage:
+    $ python scripts/export_shards.py experiments/exp_001/config.yml \\
+        data/car_ims_v1_shards/ --test-directory data/car_ims_v1/test/
+"""
+import argparse
+
+from utils import datasets, shards, utils
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Export the experiment dataset as TFRecord shards."
+    )
+    parser.add_argument(
+        "config_file",
+        type=str,
+        help="Full path to experiment configuration file.",
+    )
+    parser.add_argument(
+        "output_folder",
+        type=str,
+        help="Full path to the directory in which shards are stored.",
+    )
+    parser.add_argument(
+        "--test-directory",
+        type=str,
+        help="Full path to the test split, exported as `test` if given.",
+    )
+    parser.add_argument(
+        "--shard-size",
+        type=int,
+        default=1024,
+        help="Maximum number of images per shard file.",
+    )
+
+    args = parser.parse_args()
+
+    return args
+
+
+def main(config_file, output_folder, test_directory=None, shard_size=1024):
+    """
+    Parameters
+    ----------
+    config_file : str
+        Full path to experiment configuration file.
+
+    output_folder : str
+        Full path to the directory in which shards are stored.
+
+    test_directory : str
+        Full path to the test split, exported as `test` if given.
+
+    shard_size : int
+        Maximum number of images per shard file.
+    """
+    config = utils.load_config(config_file)
+    class_names = utils.get_class_names(config)
+    data = config["data"]
+    validation_split = data.get("validation_split") or None
+
+    # Same split as `scripts/train.py`
+    file_paths, labels = datasets.index_directory(
+        data["directory"], class_names, shuffle=True, seed=config["seed"]
+    )
+    splits = {}
+    subsets = ["training", "validation"] if validation_split else [None]
+    for subset in subsets:
+        splits[subset or "training"] = datasets.split_subset(
+            file_paths, labels, validation_split, subset
+        )
+    if test_directory:
+        splits["test"] = datasets.index_directory(
+            test_directory, class_names, shuffle=False
+        )
+
+    boxes = datasets.load_boxes(data["boxes"]) if "boxes" in data else None
+    index = shards.export_shards(
+        output_folder,
+        splits,
+        class_names,
+        data.get("image_size", (256, 256)),
+        boxes=boxes,
+        interpolation=data.get("interpolation", "bilinear"),
+        shard_size=shard_size,
+        seed=config["seed"],
+        validation_split=validation_split,
+    )
+    for name, split in index["splits"].items():
+        print(f"{name}: {split['count']} images, {len(split['files'])} shards")
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    main(
+        args.config_file,
+        args.output_folder,
+        args.test_directory,
+        args.shard_size,
+    )
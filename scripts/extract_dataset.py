@@ -0,0 +1,240 @@
+"""
+This script extracts the images of `car_ims.tgz` straight into the
+`train` and `test` folders of each class, in a single streaming pass over
+the archive. It replaces extracting the whole archive into `car_ims` and
+then running `scripts/prepare_train_test_dataset.py`.
+
+Archive members are read in order and each image name is looked up in the
+annotations loaded from `car_dataset_labels.csv`, then written to its
+final split/class path. Images not in the CSV are skipped.
+
+With `--shards`, images are also resized and written as TFRecord shards
+in the same pass, with splits named "training" and "test", see
+`utils.shards.image_dataset_from_shards()`. Those shards have no
+validation split, use `scripts/export_shards.py` for that.
+
+The resulting directory structure looks like this:
+    data/
+    ├── car_ims_v1
+    │   ├── test
+    │   │   ├── AM General Hummer SUV 2000
+    │   │   │   ├── 000046.jpg
+    │   │   │   ├── ...
+    │   ├── train
+    │   │   ├── AM General Hummer SUV 2000
+    │   │   │   ├── 000001.jpg
+    │   │   │   ├── ...
+
+Usage:
+    $ python scripts/extract_dataset.py training_image_set.tgz \\
+        car_dataset_labels.csv data/car_ims_v1/
+    $ python scripts/extract_dataset.py training_image_set.tgz \\
+        car_dataset_labels.csv data/car_ims_v1/ \\
+        --shards data/car_ims_v1_shards/ --image-size 224 224
+"""
+import argparse
+import os
+import shutil
+import tarfile
+
+import pandas as pd
+
+from scripts import prepare_train_test_dataset
+from utils import shards
+
+# Shards split name of each CSV subset
+SHARD_SPLITS = {"train": "training", "test": "test"}
+
+# Images decoded at once when writing shards
+DECODE_CHUNK = 256
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Extract the dataset archive into train/test splits."
+    )
+    parser.add_argument(
+        "archive",
+        type=str,
+        help="Full path to the images archive, e.g. `car_ims.tgz`.",
+    )
+    parser.add_argument(
+        "labels",
+        type=str,
+        help="Full path to the CSV file with data labels.",
+    )
+    parser.add_argument(
+        "output_data_folder",
+        type=str,
+        help="Full path to the directory in which splits are written.",
+    )
+    parser.add_argument(
+        "--shards",
+        type=str,
+        help="Full path to a directory in which shards are also written.",
+    )
+    parser.add_argument(
+        "--image-size",
+        type=int,
+        nargs=2,
+        default=[224, 224],
+        help="Shards image size as height width.",
+    )
+    parser.add_argument("--shard-size", type=int, default=1024)
+
+    args = parser.parse_args()
+
+    return args
+
+
+class _ShardsOutput:
+    """
+    Resizes the extracted images of each split in chunks and appends them
+    to its shards. Images are read back right after being written, so they
+    come from the page cache.
+    """
+
+    def __init__(self, folder, class_names, image_size, shard_size):
+        os.makedirs(folder, exist_ok=True)
+        self.folder = folder
+        self.class_names = class_names
+        self.class_indices = {name: i for i, name in enumerate(class_names)}
+        self.image_size = tuple(image_size)
+        self.writers = {}
+        self.pending = {}
+        self.shard_size = shard_size
+
+    def add(self, subset, path, class_name):
+        split = SHARD_SPLITS.get(subset, subset)
+        if split not in self.writers:
+            self.writers[split] = shards.ShardWriter(
+                os.path.join(self.folder, split), self.shard_size
+            )
+            self.pending[split] = []
+        self.pending[split].append((path, self.class_indices[class_name]))
+        if len(self.pending[split]) >= DECODE_CHUNK:
+            self._flush(split)
+
+    def _flush(self, split):
+        if not self.pending[split]:
+            return
+        paths, labels = zip(*self.pending[split])
+        images = shards.decoded_images(list(paths), self.image_size)
+        for image, label in zip(images, labels):
+            self.writers[split].write(image, label)
+        self.pending[split] = []
+
+    def close(self):
+        index = {
+            "class_names": self.class_names,
+            "image_size": list(self.image_size),
+            "seed": None,
+            "validation_split": None,
+            "splits": {},
+        }
+        for split, writer in self.writers.items():
+            self._flush(split)
+            writer.close()
+            index["splits"][split] = {
+                "files": writer.shard_files,
+                "count": writer.count,
+            }
+        shards.save_index(self.folder, index)
+
+
+def main(
+    archive,
+    labels,
+    output_data_folder,
+    shards_folder=None,
+    image_size=(224, 224),
+    shard_size=1024,
+):
+    """
+    Parameters
+    ----------
+    archive : str
+        Full path to the images archive.
+
+    labels : str
+        Full path to CSV file with data annotations.
+
+    output_data_folder : str
+        Full path to the directory in which splits are written.
+
+    shards_folder : str
+        Full path to a directory in which shards are also written.
+
+    image_size : tuple
+        Shards image size as (height, width).
+
+    shard_size : int
+        Maximum number of records per shard file.
+
+    Returns
+    -------
+    counts : dict
+        Number of images "extracted" and archive files "skipped".
+    """
+    cars_df = pd.read_csv(labels, header=0)
+    # Image name -> (subset, class), the only lookup done per member
+    destinations = dict(
+        zip(
+            cars_df["img_name"].astype(str),
+            zip(cars_df["subset"].astype(str), cars_df["class"].astype(str)),
+        )
+    )
+    prepare_train_test_dataset.class_folders(cars_df, output_data_folder)
+    shards_output = None
+    if shards_folder:
+        shards_output = _ShardsOutput(
+            shards_folder,
+            sorted(cars_df["class"].astype(str).unique()),
+            image_size,
+            shard_size,
+        )
+
+    counts = {"extracted": 0, "skipped": 0}
+    # "r|gz" reads the archive as a stream, members in order, no seeks
+    with tarfile.open(archive, "r|gz") as tar:
+        for member in tar:
+            if not member.isfile():
+                continue
+            img_name = os.path.basename(member.name)
+            if img_name not in destinations:
+                counts["skipped"] += 1
+                continue
+
+            subset, clase = destinations[img_name]
+            path = os.path.join(output_data_folder, subset, clase, img_name)
+            # `path` may be a hard link into `car_ims` made by
+            # prepare_train_test_dataset.py, write a new file and replace
+            # the link instead of truncating the shared inode
+            tmp_path = path + ".part"
+            with tar.extractfile(member) as src, open(tmp_path, "wb") as dst:
+                shutil.copyfileobj(src, dst)
+            os.replace(tmp_path, path)
+            counts["extracted"] += 1
+            if shards_output is not None:
+                shards_output.add(subset, path, clase)
+
+    if shards_output is not None:
+        shards_output.close()
+    print(
+        f"{counts['extracted']} images extracted to {output_data_folder}, "
+        f"{counts['skipped']} files not in {labels} skipped"
+    )
+
+    return counts
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    main(
+        args.archive,
+        args.labels,
+        args.output_data_folder,
+        args.shards,
+        args.image_size,
+        args.shard_size,
+    )
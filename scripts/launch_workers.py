@@ -0,0 +1,234 @@
+"""
+This script trains a model with `scripts/train.py` on many worker
+processes of this machine, for experiments having
+`distribute.strategy: "multi_worker_mirrored"`. Each worker gets its own
+`TF_CONFIG` listing all of them on free localhost ports, and trains on its
+part of the data, see `utils.distribute`. Worker 0 is the chief, the one
+writing checkpoints and logs.
+
+Each worker uses `--threads-per-worker` threads, by default the CPU cores
+split evenly between them, so they don't compete for the same cores.
+
+Training is synchronous, when a worker fails all of them are stopped. With
+`--max-restarts`, all the workers are started again and, if the config has
+a `backup_and_restore` callback, training resumes from the last epoch
+finished.
+
+To train on many hosts, run `scripts/train.py` on each one with the same
+config and a `TF_CONFIG` listing the addresses of all the hosts, see
+https://www.tensorflow.org/guide/distributed_training#TF_CONFIG.
+
+Usage:
+    $ python scripts/launch_workers.py experiments/exp_001/config.yml \\
+        --workers 4 --max-restarts 2 --log-dir experiments/exp_001/workers/
+"""
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+
+from utils import utils
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Train your model on many local worker processes."
+    )
+    parser.add_argument(
+        "config_file",
+        type=str,
+        help="Full path to experiment configuration file.",
+    )
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument(
+        "--threads-per-worker",
+        type=int,
+        help="TensorFlow and oneDNN threads of each worker.",
+    )
+    parser.add_argument(
+        "--max-restarts",
+        type=int,
+        default=0,
+        help="Times the workers are started again after a failure.",
+    )
+    parser.add_argument(
+        "--log-dir",
+        type=str,
+        help="Folder where the output of each worker is written, otherwise "
+        "only the chief output is printed.",
+    )
+
+    args = parser.parse_args()
+
+    return args
+
+
+def free_ports(count):
+    """
+    Returns `count` localhost TCP ports free at the moment.
+    """
+    sockets = []
+    try:
+        for _ in range(count):
+            sock = socket.socket()
+            sock.bind(("localhost", 0))
+            sockets.append(sock)
+        return [sock.getsockname()[1] for sock in sockets]
+    finally:
+        for sock in sockets:
+            sock.close()
+
+
+def tf_config(addresses, index):
+    """
+    `TF_CONFIG` value of the worker `index` of a cluster having one worker
+    per address.
+    """
+    return json.dumps(
+        {
+            "cluster": {"worker": addresses},
+            "task": {"type": "worker", "index": index},
+        }
+    )
+
+
+def start_workers(config_file, workers, threads_per_worker, log_dir=None):
+    """
+    Starts `workers` processes of `scripts/train.py`.
+
+    Returns
+    -------
+    processes : list
+        `subprocess.Popen` of each worker, in order.
+    """
+    addresses = [f"localhost:{port}" for port in free_ports(workers)]
+    processes = []
+    for index in range(workers):
+        env = {
+            **os.environ,
+            "PYTHONPATH": os.pathsep.join(
+                filter(None, [ROOT, os.environ.get("PYTHONPATH")])
+            ),
+            "TF_CONFIG": tf_config(addresses, index),
+            "TF_NUM_INTRAOP_THREADS": str(threads_per_worker),
+            "TF_NUM_INTEROP_THREADS": str(threads_per_worker),
+            "OMP_NUM_THREADS": str(threads_per_worker),
+        }
+        output = None if index == 0 else subprocess.DEVNULL
+        if log_dir:
+            output = open(os.path.join(log_dir, f"worker_{index}.log"), "ab")
+        processes.append(
+            subprocess.Popen(
+                [
+                    sys.executable,
+                    os.path.join(ROOT, "scripts", "train.py"),
+                    config_file,
+                ],
+                env=env,
+                stdout=output,
+                stderr=subprocess.STDOUT if log_dir else output,
+            )
+        )
+        if log_dir:
+            output.close()
+
+    return processes
+
+
+def wait_workers(processes):
+    """
+    Waits until all the workers finish, or one of them fails and then stops
+    the others.
+
+    Returns
+    -------
+    failed : tuple
+        Index and exit code of the failed worker, None if all succeeded.
+    """
+    while True:
+        codes = [process.poll() for process in processes]
+        failed = [(i, code) for i, code in enumerate(codes) if code]
+        if failed:
+            for process in processes:
+                if process.poll() is None:
+                    process.terminate()
+            for process in processes:
+                process.wait()
+            return failed[0]
+        if all(code == 0 for code in codes):
+            return None
+        time.sleep(0.5)
+
+
+def main(
+    config_file,
+    workers=2,
+    threads_per_worker=None,
+    max_restarts=0,
+    log_dir=None,
+):
+    """
+    Parameters
+    ----------
+    config_file : str
+        Full path to experiment configuration file.
+
+    workers : int
+        Number of worker processes.
+
+    threads_per_worker : int
+        TensorFlow and oneDNN threads of each worker, by default the CPU
+        cores split evenly between the workers.
+
+    max_restarts : int
+        Times the workers are started again after a failure.
+
+    log_dir : str
+        Folder where the output of each worker is written.
+
+    Returns
+    -------
+    restarts : int
+        Times the workers were started again.
+    """
+    config = utils.load_config(config_file)
+    strategy = config.get("distribute", {}).get("strategy")
+    if strategy != "multi_worker_mirrored":
+        raise ValueError(
+            "Workers only train together with "
+            '`distribute.strategy: "multi_worker_mirrored"`'
+        )
+    if threads_per_worker is None:
+        threads_per_worker = max(1, (os.cpu_count() or 1) // workers)
+    if log_dir:
+        os.makedirs(log_dir, exist_ok=True)
+
+    for restarts in range(max_restarts + 1):
+        processes = start_workers(
+            config_file, workers, threads_per_worker, log_dir
+        )
+        failed = wait_workers(processes)
+        if failed is None:
+            return restarts
+        print(f"Worker {failed[0]} failed with exit code {failed[1]}")
+
+    raise RuntimeError(
+        f"Training failed after {max_restarts} restarts, see the workers "
+        "output"
+    )
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    main(
+        args.config_file,
+        args.workers,
+        args.threads_per_worker,
+        args.max_restarts,
+        args.log_dir,
+    )
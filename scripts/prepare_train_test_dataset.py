@@ -31,11 +31,28 @@ The resulting directory structure should look like this:
     │   │   │   ├── 000405.jpg
     │   │   │   ├── 000406.jpg
     │   │   │   ├── ...
+
+Images are hard linked with `os.link()` to avoid wasting disk space, or
+copied when the output folder is on another device. Images already in the
+output folder are skipped, so the script can be run again after adding
+rows to the CSV. Links are made in parallel, see `--workers`, and
+`--dry-run` only prints what would be done.
+
+Usage:
+    $ python scripts/prepare_train_test_dataset.py data/car_ims/ \\
+        data/car_dataset_labels.csv data/car_ims_v1/ --dry-run
 """
 import argparse
+import errno
 import os
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+
 import pandas as pd
 
+# Errors of `os.link()` meaning the file must be copied instead
+LINK_ERRORS = (errno.EXDEV, errno.EPERM, errno.EMLINK, errno.EOPNOTSUPP)
+
 
 def parse_args():
     parser = argparse.ArgumentParser(description="Train your model.")
@@ -63,13 +80,161 @@ def parse_args():
             "train/test splits. E.g. `/home/app/src/data/car_ims_v1/`."
         ),
     )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=16,
+        help="Number of threads linking or copying files.",
+    )
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="Only print how many images would be linked.",
+    )
 
     args = parser.parse_args()
 
     return args
 
 
-def main(data_folder, labels, output_data_folder):
+def plan_links(cars_df, data_folder, output_data_folder):
+    """
+    Computes the source and destination path of every image at once.
+
+    Parameters
+    ----------
+    cars_df : pandas.DataFrame
+        Data annotations, having "img_name", "class" and "subset" columns.
+
+    data_folder : str
+        Full path to raw images folder.
+
+    output_data_folder : str
+        Full path to the train/test splits folder.
+
+    Returns
+    -------
+    plan : pandas.DataFrame
+        One row per image with its "src" path, destination folder
+        "dst_dir" and destination path "dst".
+    """
+    img_names = cars_df["img_name"].astype(str)
+    plan = pd.DataFrame(index=cars_df.index)
+    plan["subset"] = cars_df["subset"].astype(str)
+    plan["src"] = os.path.join(data_folder, "") + img_names
+    plan["dst_dir"] = (
+        os.path.join(output_data_folder, "")
+        + plan["subset"]
+        + os.sep
+        + cars_df["class"].astype(str)
+    )
+    plan["dst"] = plan["dst_dir"] + os.sep + img_names
+
+    return plan
+
+
+def class_folders(cars_df, output_data_folder, create=True):
+    """
+    Folder of every class in every subset of the labels, as
+    `<output_data_folder>/<subset>/<class>`. Every class gets a folder in
+    every subset, even without images.
+
+    Parameters
+    ----------
+    cars_df : pandas.DataFrame
+        Labels having the "subset" and "class" columns.
+
+    output_data_folder : str
+        Full path to the dataset folder.
+
+    create : bool
+        Also create the folders missing.
+
+    Returns
+    -------
+    folders : list
+        Full path of each folder.
+    """
+    folders = [
+        os.path.join(output_data_folder, subset, clase)
+        for subset in cars_df["subset"].astype(str).unique()
+        for clase in cars_df["class"].astype(str).unique()
+    ]
+    if create:
+        for folder in folders:
+            os.makedirs(folder, exist_ok=True)
+
+    return folders
+
+
+def existing_files(folders):
+    """
+    Lists the files already inside each folder, with a single directory
+    scan per folder. Missing folders are taken as empty.
+
+    Returns
+    -------
+    paths : set
+        Full paths of the files found.
+    """
+    paths = set()
+    for folder in folders:
+        try:
+            with os.scandir(folder) as entries:
+                paths.update(os.path.join(folder, e.name) for e in entries)
+        except FileNotFoundError:
+            continue
+
+    return paths
+
+
+def copy_file(src, dst):
+    """
+    Copies `src` to `dst`. `os.copy_file_range()` lets the filesystem
+    clone the file (reflink) or copy it server side when it supports it,
+    otherwise `shutil.copyfile()` is used.
+    """
+    try:
+        with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
+            remaining = os.fstat(fsrc.fileno()).st_size
+            while remaining > 0:
+                copied = os.copy_file_range(
+                    fsrc.fileno(), fdst.fileno(), remaining
+                )
+                if copied == 0:
+                    break
+                remaining -= copied
+        return
+    except (AttributeError, OSError):
+        pass
+
+    shutil.copyfile(src, dst)
+
+
+def link_file(src, dst):
+    """
+    Hard links `src` as `dst`, copying it when links can't be made, e.g.
+    across devices.
+
+    Returns
+    -------
+    linked : bool
+        False if the file was copied instead.
+    """
+    try:
+        os.link(src, dst)
+    except FileExistsError:
+        return True
+    except OSError as exp:
+        if exp.errno not in LINK_ERRORS:
+            raise
+        copy_file(src, dst)
+        return False
+
+    return True
+
+
+def main(data_folder, labels, output_data_folder, workers=16, dry_run=False):
     """
     Parameters
     ----------
@@ -82,35 +247,58 @@ def main(data_folder, labels, output_data_folder):
     output_data_folder : str
         Full path to the directory in which we will store the resulting
         train/test splits.
+
+    workers : int
+        Number of threads linking or copying files.
+
+    dry_run : bool
+        Only print how many images would be linked.
+
+    Returns
+    -------
+    counts : dict
+        Number of images "total", already "existing", "linked" and
+        "copied".
     """
-    #data_folder= "./data/car_ims"
-    #labels= "./data/car_dataset_labels.csv"
-    #output_data_folder="./data/car_ims_v1"
-
-    # For this function, you must:
-    #   1. Load labels CSV file
-    cars_df=pd.read_csv(labels, header = 0)
-    subsets=cars_df["subset"].unique() 
-    classes=cars_df["class"].unique()
-
-    #   2. Iterate over each row in the CSV, create the corresponding
-    #      train/test and class folders
-    for subset in subsets:
-        for clase in classes:
-            subfolder_path=output_data_folder + "/" + subset + "/" + clase + "/"
-            os.makedirs(subfolder_path, exist_ok=True)
-    for car in cars_df.index:
-        if os.path.exists(output_data_folder + "/" + cars_df["subset"][car] +"/" + cars_df["class"][car] + "/" + cars_df["img_name"][car]):
-            continue
-        os.link(data_folder + "/" + cars_df["img_name"][car], output_data_folder + "/" + cars_df["subset"][car] +"/" + cars_df["class"][car] + "/" + cars_df["img_name"][car])
-        
-    #   3. Copy the image to the new folder structure. We recommend you to
-    #      use `os.link()` to avoid wasting disk space with duplicated files
-    return
+    cars_df = pd.read_csv(labels, header=0)
+    plan = plan_links(cars_df, data_folder, output_data_folder)
 
-    # TODO
+    folders = class_folders(cars_df, output_data_folder, create=not dry_run)
+    existing = plan["dst"].isin(existing_files(folders))
+    missing = plan[~existing]
+    counts = {
+        "total": len(plan),
+        "existing": int(existing.sum()),
+        "linked": 0,
+        "copied": 0,
+    }
+    if dry_run:
+        print(
+            f"{counts['total']} images, {counts['existing']} already in "
+            f"{output_data_folder}, {len(missing)} to link:"
+        )
+        for subset, count in missing["subset"].value_counts().items():
+            print(f"    {subset}: {count}")
+        return counts
+
+    with ThreadPoolExecutor(workers) as executor:
+        linked = list(executor.map(link_file, missing["src"], missing["dst"]))
+    counts["linked"] = sum(linked)
+    counts["copied"] = len(linked) - counts["linked"]
+    print(
+        f"{counts['linked']} images linked, {counts['copied']} copied, "
+        f"{counts['existing']} already in {output_data_folder}"
+    )
+
+    return counts
 
 
 if __name__ == "__main__":
     args = parse_args()
-    main(args.data_folder, args.labels, args.output_data_folder)
+    main(
+        args.data_folder,
+        args.labels,
+        args.output_data_folder,
+        args.workers,
+        args.dry_run,
+    )
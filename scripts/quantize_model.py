@@ -0,0 +1,179 @@
+"""
+This script quantizes a trained model to int8 for CPU inference and only
+keeps it if it's accurate enough.
+
+The model is first exported with `scripts/export_model.py`, then converted
+to a TFLite model with int8 weights and activations, calibrated on images
+picked at random from the experiment training folder (`data.directory`).
+Both the float32 and int8 TFLite models are evaluated on the test folder,
+using the class order of `utils.get_class_names()`, and their size,
+latency and accuracy are printed side by side. If the int8 top-1 accuracy
+drops more than `--max-accuracy-drop` the int8 model is discarded and the
+script fails.
+
+The resulting directory structure looks like this:
+    experiments/exp_001/export/
+    ├── saved_model/
+    ├── model.tflite
+    ├── model_int8.tflite
+
+Usage:
+    $ python scripts/quantize_model.py experiments/exp_001/config.yml \\
+        experiments/exp_001/model.06-2.0449.h5 experiments/exp_001/export/ \\
+        data/car_ims_v2/test/ --max-accuracy-drop 0.01
+"""
+import argparse
+import os
+
+import numpy as np
+
+from scripts import export_model
+from utils import utils
+from utils.evaluation import EvaluationResult
+from utils.quantization import quantize_int8, representative_dataset
+from utils.runtime import TFLiteRuntime, measure_latency
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Quantize your model to int8."
+    )
+    parser.add_argument(
+        "config_file",
+        type=str,
+        help="Full path to experiment configuration file.",
+    )
+    parser.add_argument(
+        "weights",
+        type=str,
+        help="Full path to the trained model weights.",
+    )
+    parser.add_argument(
+        "output_folder",
+        type=str,
+        help="Full path to the directory in which models are written.",
+    )
+    parser.add_argument(
+        "test_folder",
+        type=str,
+        help="Full path to the test images, used to check accuracy.",
+    )
+    parser.add_argument(
+        "--max-accuracy-drop",
+        type=float,
+        default=0.01,
+        help="Maximum top-1 accuracy lost by the int8 model, e.g. 0.01.",
+    )
+    parser.add_argument(
+        "--calibration-images",
+        type=int,
+        default=200,
+        help="Number of training images used for calibration.",
+    )
+    parser.add_argument("--batch-size", type=int, default=32)
+
+    args = parser.parse_args()
+
+    return args
+
+
+def main(
+    config_file,
+    weights,
+    output_folder,
+    test_folder,
+    max_accuracy_drop=0.01,
+    calibration_images=200,
+    batch_size=32,
+):
+    """
+    Parameters
+    ----------
+    config_file : str
+        Full path to experiment configuration file.
+
+    weights : str
+        Full path to the trained model weights.
+
+    output_folder : str
+        Full path to the directory in which models are written.
+
+    test_folder : str
+        Full path to the test images, used to check accuracy.
+
+    max_accuracy_drop : float
+        Maximum top-1 accuracy lost by the int8 model.
+
+    calibration_images : int
+        Number of training images used for calibration.
+
+    batch_size : int
+        Number of images sent to the model at once while evaluating.
+
+    Returns
+    -------
+    report : dict
+        Size in bytes, batch of one latency in seconds and top-1 accuracy
+        of the "float32" and "int8" models.
+    """
+    config = utils.load_config(config_file)
+    class_names = utils.get_class_names(config)
+    input_size = config["data"]["image_size"]
+
+    saved_model_path, float_path = export_model.main(weights, output_folder)
+    int8_path = os.path.join(output_folder, "model_int8.tflite")
+    # Only renamed once it passes the accuracy check
+    quantize_int8(
+        saved_model_path,
+        representative_dataset(
+            config["data"]["directory"],
+            input_size,
+            calibration_images,
+            config.get("seed"),
+        ),
+        f"{int8_path}.tmp",
+    )
+
+    # Latency doesn't depend on the pixel values
+    images = np.zeros((1, *input_size, 3), dtype=np.float32)
+    report = {}
+    for name, path in (("float32", float_path), ("int8", f"{int8_path}.tmp")):
+        runtime = TFLiteRuntime(path)
+        result = EvaluationResult.from_folder(
+            test_folder, runtime, input_size, class_names, batch_size
+        )
+        report[name] = {
+            "size": os.path.getsize(path),
+            "latency": float(np.median(measure_latency(runtime, images))),
+            "accuracy": result.accuracy(),
+        }
+        print(
+            f"{name}: size {report[name]['size'] / 1024**2:.1f} MB, "
+            f"latency {report[name]['latency'] * 1000:.1f} ms, "
+            f"accuracy {report[name]['accuracy']:.4f}"
+        )
+
+    accuracy_drop = report["float32"]["accuracy"] - report["int8"]["accuracy"]
+    if accuracy_drop > max_accuracy_drop:
+        os.remove(f"{int8_path}.tmp")
+        raise ValueError(
+            f"int8 model loses {accuracy_drop:.4f} top-1 accuracy, more than "
+            f"{max_accuracy_drop}, not saved"
+        )
+    os.replace(f"{int8_path}.tmp", int8_path)
+    print(f"Saved {int8_path}")
+
+    return report
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    main(
+        args.config_file,
+        args.weights,
+        args.output_folder,
+        args.test_folder,
+        args.max_accuracy_drop,
+        args.calibration_images,
+        args.batch_size,
+    )
@@ -6,18 +6,63 @@ from the picture, getting rid of all the background, which may cause
 confusion to our CNN model.
 We must create a new folder to store this new dataset, following exactly the
 same directory structure with its subfolders but with new images.
+
+Images go through a pipeline of three stages connected by bounded queues:
+    1. decode: a pool of threads loading the images from disk.
+    2. detect: batched vehicle detection and crop, in the main thread.
+    3. encode: a pool of threads encoding and writing the cropped images.
+
+Raw detector outputs can be kept in a cache (see `--cache-dir`), keyed by
+the image file hash, so running the script again, e.g. with a different
+crop policy, doesn't need to run the detector.
+
+Every image written is recorded in a manifest inside `output_data_folder`,
+so if the job is interrupted, running it again only processes the images
+that are missing or changed since the last run. Images that can't be
+decoded are skipped with a warning and recorded as failed in the manifest,
+so they are only tried again once the file changes.
+
+With `--index-only`, no images are written. The vehicle boxes are stored in
+a CSV index instead (see `utils.datasets.load_boxes()`), which is used to
+crop the original images on the fly while training. The index also works
+as manifest to resume the job.
 """
 
 import argparse
-import utils
+import csv
+import json
 import os
+import queue
+import threading
+import time
+
 import tensorflow as tf
 from tensorflow import keras
 from utils import detection
+from utils.detection_cache import DetectionCache, file_digest
+from utils.utils import walkdir
 
-from keras.preprocessing.image import load_img
 from keras.preprocessing.image import img_to_array
 
+# Name of the file keeping track of the images already processed
+MANIFEST = "manifest.jsonl"
+
+# Columns of the CSV boxes index written with `--index-only`
+INDEX_COLUMNS = [
+    "img_name",
+    "x1",
+    "y1",
+    "x2",
+    "y2",
+    "path",
+    "size",
+    "mtime_ns",
+]
+
+# Marks the end of the items put in a queue
+_DONE = object()
+
+
 def parse_args():
     parser = argparse.ArgumentParser(description="Train your model.")
     parser.add_argument(
@@ -34,16 +79,181 @@ def parse_args():
         type=str,
         help=(
             "Full path to the directory in which we will store the resulting "
-            "cropped pictures. E.g. `/home/app/src/data/car_ims_v2/`."
+            "cropped pictures. E.g. `/home/app/src/data/car_ims_v2/`. With "
+            "`--index-only`, full path to the CSV boxes index instead. E.g. "
+            "`/home/app/src/data/car_ims_v1_boxes.csv`."
         ),
     )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=4,
+        help="Number of threads used for decoding and for encoding images.",
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=8,
+        help="Number of images sent to the detector in one forward pass.",
+    )
+    parser.add_argument(
+        "--queue-size",
+        type=int,
+        default=64,
+        help="Maximum number of images waiting between two stages.",
+    )
+    parser.add_argument(
+        "--cache-dir",
+        type=str,
+        default=None,
+        help="Full path to the directory caching the detector outputs.",
+    )
+    parser.add_argument(
+        "--index-only",
+        action="store_true",
+        help="Write a CSV index with the vehicle boxes instead of images.",
+    )
 
     args = parser.parse_args()
 
     return args
 
 
-def main(data_folder, output_data_folder):
+class StageStats:
+    """
+    Thread safe counter of the items processed by a pipeline stage and the
+    time spent processing them.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.items = 0
+        self.busy = 0.0
+        self._lock = threading.Lock()
+
+    def add(self, items, seconds):
+        with self._lock:
+            self.items += items
+            self.busy += seconds
+
+    def report(self, wall_time):
+        busy_rate = self.items / self.busy if self.busy else 0.0
+        wall_rate = self.items / wall_time if wall_time else 0.0
+        return (
+            f"{self.name}: {self.items} images, "
+            f"{wall_rate:.2f} images/sec overall, "
+            f"{busy_rate:.2f} images/sec per busy thread"
+        )
+
+
+def load_manifest(output_data_folder, index_only=False):
+    """
+    Loads the manifest of images already processed.
+
+    Parameters
+    ----------
+    output_data_folder : str
+        Full path to the directory having the cropped images, or to the
+        CSV boxes index when `index_only` is True.
+
+    index_only : bool
+        Read the manifest from the CSV boxes index.
+
+    Returns
+    -------
+    manifest : dict
+        Maps each image path, relative to the dataset folder, to a
+        (size, mtime_ns, failed) tuple with the size and modification time
+        of the source image when it was processed, and whether it failed
+        to decode.
+    """
+    manifest = {}
+    if index_only:
+        if os.path.exists(output_data_folder):
+            with open(output_data_folder, "r", newline="") as f:
+                for row in csv.DictReader(f):
+                    if row["mtime_ns"]:
+                        manifest[row["path"]] = (
+                            int(row["size"]),
+                            int(row["mtime_ns"]),
+                            not row["x1"],
+                        )
+        return manifest
+
+    manifest_path = os.path.join(output_data_folder, MANIFEST)
+    if not os.path.exists(manifest_path):
+        return manifest
+
+    with open(manifest_path, "r") as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                # Last line may be incomplete if the job was killed
+                continue
+            manifest[entry["path"]] = (
+                entry["size"],
+                entry["mtime_ns"],
+                "error" in entry,
+            )
+
+    return manifest
+
+
+def list_pending(data_folder, output_data_folder, index_only=False):
+    """
+    Lists the images from `data_folder` having no up to date cropped
+    version in `output_data_folder`, or no box in the CSV index when
+    `index_only` is True.
+
+    Returns
+    -------
+    pending : list
+        List of (relative path, (size, mtime_ns)) tuples.
+    """
+    manifest = load_manifest(output_data_folder, index_only)
+    pending = []
+    for dirpath, filename in walkdir(data_folder):
+        fname = os.path.join(dirpath, filename)
+        rel_path = os.path.relpath(fname, data_folder)
+        stat = os.stat(fname)
+        signature = (stat.st_size, stat.st_mtime_ns)
+        entry = manifest.get(rel_path)
+        done = (
+            entry is not None
+            and entry[:2] == signature
+            and (
+                index_only
+                or entry[2]
+                or os.path.exists(os.path.join(output_data_folder, rel_path))
+            )
+        )
+        if not done:
+            pending.append((rel_path, signature))
+
+    return pending
+
+
+def crop_box(img_array, box):
+    """
+    Returns the box used to crop the image, if the vehicle box is empty we
+    keep the full image.
+    """
+    x1, y1, x2, y2 = box
+    if x2 <= x1 or y2 <= y1:
+        return [0, 0, img_array.shape[1], img_array.shape[0]]
+    return [x1, y1, x2, y2]
+
+
+def main(
+    data_folder,
+    output_data_folder,
+    workers=4,
+    batch_size=8,
+    queue_size=64,
+    cache_dir=None,
+    index_only=False,
+):
     """
     Parameters
     ----------
@@ -52,40 +262,212 @@ def main(data_folder, output_data_folder):
 
     output_data_folder : str
         Full path to the directory in which we will store the resulting
-        cropped images.
+        cropped images, or to the CSV boxes index when `index_only` is
+        True.
+
+    workers : int
+        Number of threads used for decoding and for encoding images.
+
+    batch_size : int
+        Number of images sent to the detector in one forward pass.
+
+    queue_size : int
+        Maximum number of images waiting between two stages.
+
+    cache_dir : str
+        Full path to the directory caching the detector outputs, None to
+        always run the detector.
+
+    index_only : bool
+        Write the vehicle boxes to a CSV index instead of cropped images.
     """
-    # For this function, you must:
-    #   1. Iterate over each image in `data_folder`, you can
-    #      use Python `os.walk()` or `utils.waldir()``
-    #   2. Load the image
-    #   3. Run the detector and get the vehicle coordinates, use
-    #      utils.detection.get_vehicle_coordinates() for this task
-    #   4. Extract the car from the image and store it in
-    #      `output_data_folder` with the same image name. You may also need
-    #      to create additional subfolders following the original
-    #      `data_folder` structure.
-    # TODO
-
-    os.mkdir(output_data_folder)
-
-    for dirpath, _, files in os.walk(data_folder):
-
-        for filename in files:
-            fname= os.path.join(dirpath, filename)
-            img=tf.keras.utils.load_img(fname)
-            img_array= img_to_array(img)
-            box=detection.get_vehicle_coordinates(img_array)
-            try:
-                img_cropped=img_array[box[1]:box[3], box[0]:box[2]]
-                img_out=keras.utils.array_to_img(img_cropped)
-            except:
-                img_out=keras.utils.array_to_img(img_array)
-            output_folder = os.path.join(output_data_folder, dirpath.split('/')[-2], dirpath.split('/')[-1])
-            os.makedirs(output_folder, exist_ok=True)
-            output_file = os.path.join(output_folder, filename)
-            keras.utils.save_img(output_file, img_out)
-
-    
+    if index_only:
+        os.makedirs(
+            os.path.dirname(os.path.abspath(output_data_folder)), exist_ok=True
+        )
+    else:
+        os.makedirs(output_data_folder, exist_ok=True)
+
+    pending = list_pending(data_folder, output_data_folder, index_only)
+    print(f"{len(pending)} images to process")
+    if not pending:
+        return
+
+    cache = DetectionCache(cache_dir) if cache_dir else None
+    stats = {
+        name: StageStats(name) for name in ("decode", "detect", "encode")
+    }
+    errors = []
+    failed = []
+    paths_q = queue.Queue()
+    decoded_q = queue.Queue(maxsize=queue_size)
+    cropped_q = queue.Queue(maxsize=queue_size)
+    stop = threading.Event()
+    manifest_lock = threading.Lock()
+    if index_only:
+        new_index = not os.path.exists(output_data_folder)
+        manifest_file = open(output_data_folder, "a", newline="")
+        index_writer = csv.writer(manifest_file)
+        if new_index:
+            index_writer.writerow(INDEX_COLUMNS)
+    else:
+        manifest_file = open(os.path.join(output_data_folder, MANIFEST), "a")
+
+    for item in pending:
+        paths_q.put(item)
+    for _ in range(workers):
+        paths_q.put(_DONE)
+
+    def record(rel_path, signature, box=None, error=None):
+        """
+        Adds a processed image to the manifest, or to the CSV boxes index
+        when `index_only` is True. Failed images have no box.
+        """
+        with manifest_lock:
+            if index_only:
+                row = [os.path.basename(rel_path)]
+                row += box if box is not None else [""] * 4
+                index_writer.writerow(row + [rel_path, *signature])
+            else:
+                entry = {
+                    "path": rel_path,
+                    "size": signature[0],
+                    "mtime_ns": signature[1],
+                }
+                if error is not None:
+                    entry["error"] = error
+                manifest_file.write(json.dumps(entry) + "\n")
+            manifest_file.flush()
+
+    def decode_worker():
+        try:
+            while True:
+                item = paths_q.get()
+                if item is _DONE or stop.is_set():
+                    break
+                rel_path, signature = item
+                start = time.perf_counter()
+                fname = os.path.join(data_folder, rel_path)
+                try:
+                    img = tf.keras.utils.load_img(fname)
+                except Exception as exp:
+                    # A single bad file must not stop the whole job
+                    print(f"WARNING: skipping {rel_path}: {exp}")
+                    failed.append(rel_path)
+                    record(rel_path, signature, error=str(exp))
+                    continue
+                img_array = img_to_array(img)
+                key = file_digest(fname) if cache is not None else None
+                stats["decode"].add(1, time.perf_counter() - start)
+                decoded_q.put((rel_path, signature, img_array, key))
+        except Exception as exp:
+            errors.append(exp)
+        finally:
+            decoded_q.put(_DONE)
+
+    def encode_worker():
+        try:
+            while True:
+                item = cropped_q.get()
+                if item is _DONE:
+                    break
+                rel_path, signature, img_array, box = item
+                start = time.perf_counter()
+                x1, y1, x2, y2 = crop_box(img_array, box)
+                if index_only:
+                    record(rel_path, signature, box=[x1, y1, x2, y2])
+                    stats["encode"].add(1, time.perf_counter() - start)
+                    continue
+
+                output_file = os.path.join(output_data_folder, rel_path)
+                os.makedirs(os.path.dirname(output_file), exist_ok=True)
+                img_out = keras.utils.array_to_img(img_array[y1:y2, x1:x2])
+                keras.utils.save_img(output_file, img_out)
+                stats["encode"].add(1, time.perf_counter() - start)
+                record(rel_path, signature)
+        except Exception as exp:
+            errors.append(exp)
+            # Keep consuming so the detect stage never blocks on a full queue
+            while cropped_q.get() is not _DONE:
+                pass
+
+    threads = [
+        threading.Thread(target=decode_worker, daemon=True)
+        for _ in range(workers)
+    ] + [
+        threading.Thread(target=encode_worker, daemon=True)
+        for _ in range(workers)
+    ]
+    wall_start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+
+    def detect(batch):
+        start = time.perf_counter()
+        keys = [key for _, _, _, key in batch]
+        boxes = detection.get_vehicle_coordinates_batch(
+            [img_array for _, _, img_array, _ in batch],
+            batch_size=batch_size,
+            cache=cache,
+            keys=keys if cache is not None else None,
+        )
+        stats["detect"].add(len(batch), time.perf_counter() - start)
+        for (rel_path, signature, img_array, _), box in zip(batch, boxes):
+            cropped_q.put((rel_path, signature, img_array, box))
+
+    # Detect stage, batches are sent as soon as they are full or when
+    # decoding is over
+    try:
+        decoders_running = workers
+        batch = []
+        while decoders_running:
+            item = decoded_q.get()
+            if item is _DONE:
+                decoders_running -= 1
+                continue
+            batch.append(item)
+            if len(batch) == batch_size:
+                detect(batch)
+                batch = []
+        if batch:
+            detect(batch)
+    except BaseException:
+        # Unblock the decode workers before waiting for them
+        stop.set()
+        while decoders_running:
+            if decoded_q.get() is _DONE:
+                decoders_running -= 1
+        raise
+    finally:
+        for _ in range(workers):
+            cropped_q.put(_DONE)
+        for thread in threads:
+            thread.join()
+        manifest_file.close()
+        if cache is not None:
+            cache.flush()
+
+    wall_time = time.perf_counter() - wall_start
+    print(f"Processed in {wall_time:.2f} sec")
+    for stage in stats.values():
+        print(stage.report(wall_time))
+    if cache is not None:
+        print(f"detector cache: {cache.hits} hits, {cache.misses} misses")
+    if failed:
+        print(f"{len(failed)} images skipped, they couldn't be decoded")
+
+    if errors:
+        raise errors[0]
+
+
 if __name__ == "__main__":
     args = parse_args()
-    main(args.data_folder, args.output_data_folder)
+    main(
+        args.data_folder,
+        args.output_data_folder,
+        args.workers,
+        args.batch_size,
+        args.queue_size,
+        args.cache_dir,
+        args.index_only,
+    )
@@ -0,0 +1,176 @@
+"""
+This script starts a local HTTP service classifying car images with our
+finetuned model. The model is loaded only once and requests arriving at the
+same time are grouped in batches before running the model.
+
+Endpoints:
+    - POST /predict: the request body is an encoded image (JPEG, PNG, ...),
+      returns a JSON like {"class_name": "Jeep Patriot SUV 2012",
+      "score": 0.93}. With --crop, the vehicle "box" used is returned
+      too.
+    - GET /health: returns {"status": "ok"} once the model is loaded.
+
+Usage:
+    $ python scripts/serve.py experiments/exp_001/config.yml \\
+        experiments/exp_001/model.06-2.0449.h5 --port 8000 --crop
+    $ curl --data-binary @car.jpg http://localhost:8000/predict
+
+`weights` can also be a model exported with `scripts/export_model.py`,
+e.g. `experiments/exp_001/export/model.tflite`, see
+`utils.runtime.load_runtime()`.
+"""
+import argparse
+
+from aiohttp import web
+
+from utils import utils
+from utils.runtime import load_runtime
+from utils.serving import ClassificationService
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Serve your model.")
+    parser.add_argument(
+        "config_file",
+        type=str,
+        help="Full path to experiment configuration file.",
+    )
+    parser.add_argument(
+        "weights",
+        type=str,
+        help="Full path to the trained model weights or exported model.",
+    )
+    parser.add_argument("--host", type=str, default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument(
+        "--max-batch-size",
+        type=int,
+        default=32,
+        help="Maximum number of images per model call.",
+    )
+    parser.add_argument(
+        "--max-wait-ms",
+        type=float,
+        default=5.0,
+        help="Maximum time an image waits for its batch to be filled.",
+    )
+    parser.add_argument(
+        "--crop",
+        action="store_true",
+        help="Crop the vehicle with the detector before classifying.",
+    )
+    parser.add_argument(
+        "--jit-compile",
+        action="store_true",
+        help="Compile Keras models with XLA, best with a fixed batch size.",
+    )
+
+    args = parser.parse_args()
+
+    return args
+
+
+def create_app(service):
+    """
+    Creates the aiohttp application exposing `service`.
+
+    Parameters
+    ----------
+    service : utils.serving.ClassificationService
+        Loaded classification service.
+
+    Returns
+    -------
+    app : aiohttp.web.Application
+        Application ready to run.
+    """
+
+    async def predict(request):
+        image_bytes = await request.read()
+        if not image_bytes:
+            raise web.HTTPBadRequest(text="Missing image in request body")
+        try:
+            result = await service.classify(image_bytes)
+        except OSError:
+            raise web.HTTPBadRequest(text="Invalid image")
+        return web.json_response(result)
+
+    async def health(request):
+        return web.json_response({"status": "ok"})
+
+    async def close_service(app):
+        await service.close()
+
+    app = web.Application(client_max_size=32 * 1024**2)
+    app.add_routes(
+        [web.post("/predict", predict), web.get("/health", health)]
+    )
+    app.on_cleanup.append(close_service)
+
+    return app
+
+
+def main(
+    config_file,
+    weights,
+    host,
+    port,
+    max_batch_size,
+    max_wait_ms,
+    crop,
+    jit_compile=False,
+):
+    """
+    Parameters
+    ----------
+    config_file : str
+        Full path to experiment configuration file.
+
+    weights : str
+        Full path to the trained model weights or exported model.
+
+    host : str
+        Address to listen on.
+
+    port : int
+        Port to listen on.
+
+    max_batch_size : int
+        Maximum number of images per model call.
+
+    max_wait_ms : float
+        Maximum time an image waits for its batch to be filled.
+
+    crop : bool
+        Crop the vehicle with the detector before classifying.
+
+    jit_compile : bool
+        Compile the model with XLA, only used for Keras models.
+    """
+    config = utils.load_config(config_file)
+    class_names = utils.get_class_names(config)
+    model = load_runtime(weights, jit_compile=jit_compile)
+
+    service = ClassificationService(
+        model,
+        class_names,
+        config["data"]["image_size"],
+        crop=crop,
+        max_batch_size=max_batch_size,
+        max_wait_ms=max_wait_ms,
+    )
+    web.run_app(create_app(service), host=host, port=port)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    main(
+        args.config_file,
+        args.weights,
+        args.host,
+        args.port,
+        args.max_batch_size,
+        args.max_wait_ms,
+        args.crop,
+        args.jit_compile,
+    )
@@ -0,0 +1,311 @@
+"""
+This script runs a hyperparameter search: many trainings of
+`scripts/train.py` over a base experiment config, each one with different
+values of `compile.optimizer`, `model.dropout_rate` and
+`model.data_aug_layer`.
+
+All the trials run in this process, one after the other, so what doesn't
+change between them is only done once:
+    - the config is loaded and TensorFlow imported once.
+    - the training and validation datasets are created once and shared.
+      Unless the base config already sets `data.pipeline.cache` (or uses a
+      tensor store or cached features), decoded images are cached on disk
+      in `<output_folder>/data_cache` by the first trial and read from
+      there by the next ones.
+    - the ImageNet backbone weights are read once, see
+      `resnet_50.create_backbone()`.
+
+Trials worse than the median of the previous ones at the same epoch are
+stopped early, see `utils.callbacks.MedianStopping`.
+
+The search is described in a YAML file:
+    search: random          # "grid" (every combination) or "random"
+    trials: 8               # Number of random trials
+    seed: 42                # Random search seed
+    parameters:             # Values of each parameter
+        compile.optimizer:
+            - adam:
+                learning_rate: 0.001
+            - sgd:
+                learning_rate: 0.01
+                momentum: 0.9
+        model.dropout_rate:
+            uniform: [0.1, 0.6]  # Random search only
+        model.data_aug_layer:
+            - null
+            - random_flip:
+                mode: "horizontal"
+    early_stopping:         # Optional, `MedianStopping` arguments
+        monitor: val_accuracy
+        mode: max
+        grace_epochs: 2
+        min_runs: 3
+
+Each trial gets a folder with its config, usable with `scripts/train.py`,
+and the checkpoints and logs of the base config callbacks. A summary of
+every trial is written to `results.csv`, and the trials per hour printed.
+
+The resulting directory structure looks like this:
+    experiments/sweep_001/
+    ├── data_cache/
+    ├── results.csv
+    ├── trial_000
+    │   ├── config.yml
+    │   ├── logs/
+    │   ├── model.02-3.1562.h5
+    ├── trial_001
+    │   ├── ...
+
+Usage:
+    $ python scripts/sweep.py experiments/exp_001/config.yml \\
+        experiments/sweep_001/sweep.yml experiments/sweep_001/
+"""
+import argparse
+import copy
+import gc
+import itertools
+import json
+import os
+import time
+
+import numpy as np
+import pandas as pd
+import yaml
+from tensorflow import keras
+
+from scripts import train
+from utils import utils
+from utils.callbacks import MedianStopping
+
+# Settings a search can change, as "section.key" of the experiment config
+SEARCH_PARAMETERS = (
+    "compile.optimizer",
+    "model.dropout_rate",
+    "model.data_aug_layer",
+)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Search hyperparameters.")
+    parser.add_argument(
+        "config_file",
+        type=str,
+        help="Full path to the base experiment configuration file.",
+    )
+    parser.add_argument(
+        "sweep_file",
+        type=str,
+        help="Full path to the search configuration file.",
+    )
+    parser.add_argument(
+        "output_folder",
+        type=str,
+        help="Full path to the directory in which trials are saved.",
+    )
+
+    args = parser.parse_args()
+
+    return args
+
+
+def load_sweep(sweep_file):
+    """
+    Loads and checks the search settings, see the format above.
+
+    Parameters
+    ----------
+    sweep_file : str
+        Full path to the search configuration file.
+
+    Returns
+    -------
+    sweep : dict
+        Search settings as a Python dict.
+    """
+    with open(sweep_file, "r") as f:
+        sweep = yaml.safe_load(f)
+
+    search = sweep.get("search", "grid")
+    if search not in ("grid", "random"):
+        raise ValueError(f'Search must be "grid" or "random", got {search}')
+    if search == "random" and not sweep.get("trials"):
+        raise ValueError("Random search needs the number of `trials`")
+
+    parameters = sweep.get("parameters") or {}
+    if not parameters:
+        raise ValueError("Missing search parameters")
+    unknown = set(parameters) - set(SEARCH_PARAMETERS)
+    if unknown:
+        raise ValueError(
+            f"Unknown search parameters: {sorted(unknown)}, expected any "
+            f"of {list(SEARCH_PARAMETERS)}"
+        )
+    for name, values in parameters.items():
+        if isinstance(values, dict) and set(values) == {"uniform"}:
+            if search == "grid":
+                raise ValueError(
+                    f"Grid search needs a list of values for `{name}`"
+                )
+        elif not isinstance(values, list) or not values:
+            raise ValueError(
+                f"Search parameter `{name}` must be a list of values or "
+                "{uniform: [low, high]}"
+            )
+
+    return sweep
+
+
+def trial_parameters(sweep):
+    """
+    Lists the parameter values of each trial.
+
+    Parameters
+    ----------
+    sweep : dict
+        Search settings, see `load_sweep()`.
+
+    Returns
+    -------
+    trials : list
+        One dict per trial, mapping each parameter to its value.
+    """
+    parameters = sweep["parameters"]
+    names = sorted(parameters)
+    if sweep.get("search", "grid") == "grid":
+        return [
+            dict(zip(names, values))
+            for values in itertools.product(*(parameters[n] for n in names))
+        ]
+
+    rng = np.random.RandomState(sweep.get("seed"))
+    trials = []
+    for _ in range(sweep["trials"]):
+        params = {}
+        for name in names:
+            values = parameters[name]
+            if isinstance(values, dict):
+                params[name] = float(rng.uniform(*values["uniform"]))
+            else:
+                params[name] = values[rng.randint(len(values))]
+        trials.append(params)
+
+    return trials
+
+
+def trial_config(config, params, trial_folder):
+    """
+    Copy of the base experiment `config` with the trial parameter values,
+    and checkpoints, logs and backups saved in `trial_folder`.
+    """
+    config = copy.deepcopy(config)
+    for name, value in params.items():
+        section, key = name.split(".")
+        config[section][key] = copy.deepcopy(value)
+
+    callbacks = config["fit"].get("callbacks") or {}
+    if "model_checkpoint" in callbacks:
+        filepath = callbacks["model_checkpoint"]["filepath"]
+        callbacks["model_checkpoint"]["filepath"] = os.path.join(
+            trial_folder, os.path.basename(filepath)
+        )
+    if "tensor_board" in callbacks:
+        callbacks["tensor_board"]["log_dir"] = os.path.join(
+            trial_folder, "logs"
+        )
+    # Otherwise a trial would resume from the state of the previous one
+    if "backup_and_restore" in callbacks:
+        callbacks["backup_and_restore"]["backup_dir"] = os.path.join(
+            trial_folder, "backup"
+        )
+
+    return config
+
+
+def main(config_file, sweep_file, output_folder):
+    """
+    Parameters
+    ----------
+    config_file : str
+        Full path to the base experiment configuration file.
+
+    sweep_file : str
+        Full path to the search configuration file.
+
+    output_folder : str
+        Full path to the directory in which trials are saved.
+
+    Returns
+    -------
+    results : pandas.DataFrame
+        One row per trial, with its parameters, best monitored value,
+        epochs trained and time.
+    """
+    config = utils.load_config(config_file)
+    sweep = load_sweep(sweep_file)
+    class_names = utils.get_class_names(config)
+    if len(class_names) != config["model"]["classes"]:
+        raise ValueError(
+            "The number of classes between your dataset and your model "
+            "doesn't match."
+        )
+
+    # Decoded images shared by all the trials
+    os.makedirs(output_folder, exist_ok=True)
+    data = config["data"]
+    if "tensor_store" not in data and "feature_cache" not in data:
+        data["pipeline"] = data.get("pipeline") or {}
+        data["pipeline"].setdefault(
+            "cache", os.path.join(output_folder, "data_cache")
+        )
+    train_ds, val_ds = train.load_datasets(config, class_names)
+
+    stopping = {"monitor": "val_accuracy", **sweep.get("early_stopping", {})}
+    previous = []
+    results = []
+    trials = trial_parameters(sweep)
+    start = time.perf_counter()
+    for i, params in enumerate(trials):
+        trial_folder = os.path.join(output_folder, f"trial_{i:03d}")
+        os.makedirs(trial_folder, exist_ok=True)
+        trial = trial_config(config, params, trial_folder)
+        with open(os.path.join(trial_folder, "config.yml"), "w") as f:
+            yaml.safe_dump(trial, f, sort_keys=False)
+
+        print(f"Trial {i + 1}/{len(trials)}: {json.dumps(params)}")
+        median_stopping = MedianStopping(previous, **stopping)
+        trial_start = time.perf_counter()
+        history = train.train(
+            trial, class_names, train_ds, val_ds, callbacks=[median_stopping]
+        )
+        values = history.history.get(stopping["monitor"], [])
+        previous.append(values)
+        results.append(
+            {
+                "trial": i,
+                **{name: json.dumps(value) for name, value in params.items()},
+                stopping["monitor"]: median_stopping.best,
+                "epochs": len(values),
+                "stopped_early": median_stopping.stopped_epoch is not None,
+                "seconds": time.perf_counter() - trial_start,
+            }
+        )
+
+        # Frees the trial model, the datasets and backbone weights stay
+        keras.backend.clear_session()
+        gc.collect()
+
+    elapsed = time.perf_counter() - start
+    results = pd.DataFrame(results)
+    results.to_csv(os.path.join(output_folder, "results.csv"), index=False)
+    print(results.to_string(index=False))
+    print(
+        f"{len(trials)} trials in {elapsed / 60:.1f} minutes, "
+        f"{len(trials) / elapsed * 3600:.1f} trials per hour"
+    )
+
+    return results
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    main(args.config_file, args.sweep_file, args.output_folder)
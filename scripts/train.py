@@ -5,12 +5,16 @@ the experiment settings like dataset, model output folder, epochs,
 learning rate, data augmentation, etc.
 """
 import argparse
+import functools
 
 import tensorflow as tf
 from tensorflow import keras
 
 from models import resnet_50
-from utils import utils
+from utils import datasets, distribute, shards, tensor_store, utils
+from utils.callbacks import FullModelCheckpoint, InputStallLogger
+from utils.data_aug import augment_dataset, create_data_aug_layer
+from utils.feature_cache import AugmentedFeatureSequence, FeatureCache
 
 # Prevent tensorflow to allocate the entire GPU
 # https://www.tensorflow.org/api_docs/python/tf/config/experimental/set_memory_growth
@@ -32,6 +36,7 @@ CALLBACKS = {
     "model_checkpoint": keras.callbacks.ModelCheckpoint,
     "tensor_board": keras.callbacks.TensorBoard,
     "early_stopping": keras.callbacks.EarlyStopping,
+    "backup_and_restore": keras.callbacks.BackupAndRestore,
 }
 
 
@@ -51,7 +56,7 @@ def parse_args():
     return args
 
 
-def parse_optimizer(config):
+def parse_optimizer(config, learning_rate_scale=1):
     """
     Get experiment settings for optimizer algorithm.
 
@@ -59,16 +64,22 @@ def parse_optimizer(config):
     ----------
     config : str
         Experiment settings.
+
+    learning_rate_scale : int
+        Factor applied to the learning rate, e.g. the number of replicas
+        when the global batch size grows with them.
     """
     opt_name, opt_params = list(config["compile"]["optimizer"].items())[0]
     optimizer = OPTIMIZERS[opt_name](**opt_params)
+    if learning_rate_scale != 1:
+        optimizer.learning_rate = optimizer.learning_rate * learning_rate_scale
 
     del config["compile"]["optimizer"]
 
     return optimizer
 
 
-def parse_callbacks(config):
+def parse_callbacks(config, available=CALLBACKS):
     """
     Add Keras callbacks based on experiment settings.
 
@@ -76,75 +87,391 @@ def parse_callbacks(config):
     ----------
     config : str
         Experiment settings.
+
+    available : dict
+        Maps callback names used in the settings to the callback class.
     """
     callbacks = []
     if "callbacks" in config["fit"]:
         for callbk_name, callbk_params in config["fit"]["callbacks"].items():
-            callbacks.append(CALLBACKS[callbk_name](**callbk_params))
+            callbacks.append(available[callbk_name](**callbk_params))
 
         del config["fit"]["callbacks"]
 
     return callbacks
 
 
-def main(config_file):
+def fit_on_cached_features(
+    config,
+    class_names,
+    cnn_model,
+    train_ds,
+    val_ds,
+    cache_dir,
+    views=1,
+    callbacks=None,
+):
     """
-    Code for the training logic.
+    Trains only the head of `cnn_model` (Dropout and Dense layers) on the
+    pooled features of the frozen backbone. Features are computed once for
+    the training and validation data and cached on disk, so each epoch
+    only runs the head.
+
+    With `data_aug_layer`, `views` augmented copies of each training image
+    are made with the same augmentation layers and their features cached,
+    then each epoch uses one of them at random for each image.
+
+    Checkpoints store the full model, see
+    `utils.callbacks.FullModelCheckpoint`.
 
     Parameters
     ----------
-    config_file : str
-        Full path to experiment configuration file.
-    """
-    # Load configuration file, use utils.load_config()
-    config = utils.load_config(config_file)
+    config : dict
+        Experiment settings.
 
-    # Get the list of output classes
-    # We will use it to control the order of the output predictions from
-    # keras is consistent
-    class_names = utils.get_class_names(config)
+    class_names : list
+        List of classes as string.
 
-    # Check if number of classes is correct
-    if len(class_names) != config["model"]["classes"]:
+    cnn_model : keras.Model
+        Model made by `resnet_50.create_model()`.
+
+    train_ds, val_ds : iterable
+        Training and validation batches of (images, labels).
+
+    cache_dir : str
+        Features cache folder, `data.feature_cache` in the settings.
+
+    views : int
+        Number of augmented views of each training image,
+        `data.feature_views` in the settings.
+
+    callbacks : list
+        Keras callbacks used along with the ones from the settings.
+
+    Returns
+    -------
+    history : keras.callbacks.History
+        Training metrics of each epoch.
+    """
+    data_aug_layer = config["model"].get("data_aug_layer")
+    if data_aug_layer and views < 2:
         raise ValueError(
-            "The number classes between your dataset and your model"
-            "doen't match."
+            "Cached features with `data_aug_layer` need many augmented "
+            "views of each image, set `data.feature_views`"
+        )
+    if views > 1 and not data_aug_layer:
+        raise ValueError(
+            "`data.feature_views` needs `data_aug_layer`, otherwise all the "
+            "views are the same"
         )
+    if config["model"].get("weights", "imagenet") != "imagenet":
+        raise ValueError(
+            "Cached features need the frozen imagenet backbone, "
+            'use `weights: "imagenet"`'
+        )
+
+    cache = FeatureCache(
+        cache_dir,
+        {
+            "seed": config["seed"],
+            "data": config["data"],
+            "class_names": class_names,
+            "input_shape": config["model"].get("input_shape"),
+            "dtype_policy": config["model"].get("dtype_policy"),
+            "data_aug_layer": data_aug_layer,
+            "views": views,
+        },
+    )
+    if data_aug_layer:
+        data_augmentation = create_data_aug_layer(data_aug_layer)
+
+        def augment(images):
+            return data_augmentation(images, training=True)
+
+    else:
+        augment = None
+
+    backbone, head = resnet_50.split_model(cnn_model)
+    train_x, train_y = cache.get_or_compute(
+        "training", backbone, train_ds, views=views, augment=augment
+    )
+    val_x, val_y = cache.get_or_compute("validation", backbone, val_ds)
+    batch_size = config["data"].get("batch_size", 32)
+    if views > 1:
+        train_data = {
+            "x": AugmentedFeatureSequence(
+                train_x, train_y, batch_size, seed=config["seed"]
+            )
+        }
+    else:
+        train_data = {"x": train_x[0], "y": train_y, "batch_size": batch_size}
+
+    optimizer = parse_optimizer(config)
+    head.compile(optimizer=optimizer, **config["compile"])
+    callbacks = parse_callbacks(
+        config,
+        {
+            **CALLBACKS,
+            "model_checkpoint": functools.partial(
+                FullModelCheckpoint, cnn_model
+            ),
+        },
+    ) + list(callbacks or [])
 
-    # Load training dataset
+    return head.fit(
+        **train_data,
+        validation_data=(val_x[0], val_y),
+        callbacks=callbacks,
+        **config["fit"],
+    )
+
+
+def load_datasets(config, class_names, num_workers=1, worker_index=0):
+    """
+    Loads the training and validation datasets with the loader matching
+    the `data` settings: Keras `image_dataset_from_directory()`, the repo
+    loader when there are crop boxes or `data.pipeline` settings, TFRecord
+    shards or a tensor store.
+
+    `config` isn't modified, the same datasets can be used to train many
+    models, e.g. `scripts/sweep.py`.
+
+    Parameters
+    ----------
+    config : dict
+        Experiment settings.
+
+    class_names : list
+        List of classes as string.
+
+    num_workers, worker_index : int
+        Number of training workers and index of this one, each worker only
+        loads its part of the data, see `utils.distribute.worker_shard()`.
+
+    Returns
+    -------
+    train_ds, val_ds : tuple
+        Training and validation batches of (images, labels).
+    """
     # We will split train data in train/validation while training our
     # model, keeping away from our experiments the testing dataset
-    train_ds = keras.preprocessing.image_dataset_from_directory(
+    # If a boxes index is given, images are cropped while decoding, see
+    # `utils.datasets.image_dataset_from_directory()`
+    # The same loader applies the input pipeline settings (caching,
+    # parallel decoding, prefetching, ...) from `data.pipeline`
+    data = dict(config["data"])
+    pipeline = data.pop("pipeline", None)
+    data.pop("feature_cache", None)
+    data.pop("feature_views", None)
+    load_dataset = keras.preprocessing.image_dataset_from_directory
+    if "boxes" in data or pipeline is not None or num_workers > 1:
+        load_dataset = functools.partial(
+            datasets.image_dataset_from_directory, pipeline=pipeline
+        )
+    # Images already cropped and resized by `scripts/export_shards.py`
+    if "shards" in data:
+        for key in ("directory", "boxes", "interpolation"):
+            data.pop(key, None)
+        load_dataset = functools.partial(
+            shards.image_dataset_from_shards, pipeline=pipeline
+        )
+    # Images read straight from a memory-mapped tensor store, see
+    # `scripts/build_tensor_store.py`
+    if "tensor_store" in data:
+        if pipeline is not None:
+            raise ValueError(
+                "Data pipeline settings can't be used with a tensor store"
+            )
+        if num_workers > 1:
+            raise ValueError(
+                "A tensor store can't be split between training workers"
+            )
+        for key in ("directory", "boxes", "interpolation"):
+            data.pop(key, None)
+        load_dataset = tensor_store.image_sequence_from_store
+    if num_workers > 1:
+        load_dataset = functools.partial(
+            load_dataset, num_workers=num_workers, worker_index=worker_index
+        )
+    train_ds = load_dataset(
         subset="training",
         class_names=class_names,
         seed=config["seed"],
-        **config["data"],
+        **data,
     )
-    val_ds = keras.preprocessing.image_dataset_from_directory(
+    val_ds = load_dataset(
         subset="validation",
         class_names=class_names,
         seed=config["seed"],
-        **config["data"],
+        **data,
     )
 
-    # Creates a Resnet50 model for finetuning
-    cnn_model = resnet_50.create_model(**config["model"])
+    return train_ds, val_ds
+
+
+def train(
+    config, class_names, train_ds, val_ds, callbacks=None, strategy=None
+):
+    """
+    Creates the model from the `model` settings and trains it on the given
+    datasets, made by `load_datasets()`.
+
+    Some settings are consumed while building the optimizer, callbacks and
+    input pipeline, pass a copy of `config` to train again with the same
+    settings.
+
+    Parameters
+    ----------
+    config : dict
+        Experiment settings.
+
+    class_names : list
+        List of classes as string.
+
+    train_ds, val_ds : iterable
+        Training and validation batches of (images, labels).
+
+    callbacks : list
+        Keras callbacks used along with the ones from the settings.
+
+    strategy : tf.distribute.Strategy
+        Strategy the model is built and trained with, see
+        `utils.distribute.create_strategy()`. With many workers, the
+        datasets must be each worker's part, made by `load_datasets()`.
+
+    Returns
+    -------
+    history : keras.callbacks.History
+        Training metrics of each epoch.
+    """
+    strategy = strategy or tf.distribute.get_strategy()
+    num_workers, _ = distribute.worker_shard(strategy)
+    # Counted before the datasets are transformed below
+    train_count = getattr(train_ds, "samples_count", None)
+    val_count = getattr(val_ds, "samples_count", None)
+    pipeline = config["data"].pop("pipeline", None)
+    feature_cache = config["data"].pop("feature_cache", None)
+    feature_views = config["data"].pop("feature_views", 1)
+    if distribute.is_multi_worker(strategy) and feature_cache is not None:
+        raise ValueError(
+            "Cached features can't be used with a multi-worker strategy"
+        )
+
+    # Augment training batches in the input pipeline, in parallel with the
+    # model steps, so the model itself has no augmentation layers
+    if pipeline is not None and pipeline.get("augment"):
+        if feature_cache is not None:
+            raise ValueError(
+                "Data pipeline `augment` can't be used with cached features"
+            )
+        data_aug_layer = config["model"].pop("data_aug_layer", None)
+        if data_aug_layer:
+            train_ds = augment_dataset(
+                train_ds,
+                data_aug_layer,
+                pipeline.get("num_parallel_calls", "autotune"),
+                pipeline.get("deterministic"),
+            )
+
+    # Creates a Resnet50 model for finetuning, its variables are mirrored
+    # in every replica
+    with strategy.scope():
+        cnn_model = resnet_50.create_model(**config["model"])
     print(cnn_model.summary())
 
+    # Backbone features computed once, then only the head is trained
+    if feature_cache is not None:
+        return fit_on_cached_features(
+            config,
+            class_names,
+            cnn_model,
+            train_ds,
+            val_ds,
+            feature_cache,
+            feature_views,
+            callbacks,
+        )
+
     # Compile model, prepare for training
-    optimizer = parse_optimizer(config)
-    cnn_model.compile(
-        optimizer=optimizer,
-        **config["compile"],
-    )
+    # `data.batch_size` is the batch of each replica, the global batch
+    # size grows with the number of replicas and so can the learning rate
+    replicas = strategy.num_replicas_in_sync
+    scale = 1
+    if config.get("distribute", {}).get("scale_learning_rate"):
+        scale = replicas
+    with strategy.scope():
+        optimizer = parse_optimizer(config, learning_rate_scale=scale)
+        cnn_model.compile(
+            optimizer=optimizer,
+            **config["compile"],
+        )
 
     # Start training!
-    callbacks = parse_callbacks(config)
-    cnn_model.fit(
+    callbacks = parse_callbacks(config) + list(callbacks or [])
+    # The stall logger pairs each batch with a step, so it can't measure
+    # steps running many batches
+    steps_per_execution = config["compile"].get("steps_per_execution", 1)
+    if pipeline is not None and steps_per_execution == 1:
+        # First in the list, so other callbacks see the stall time logged
+        stall_logger = InputStallLogger()
+        train_ds = stall_logger.wrap(train_ds)
+        callbacks.insert(0, stall_logger)
+    if num_workers > 1:
+        global_batch_size = config["data"].get("batch_size", 32) * replicas
+        print(
+            f"Training on {num_workers} workers, {replicas} replicas, "
+            f"global batch size {global_batch_size}"
+        )
+        train_ds, steps = distribute.distribute_dataset(
+            strategy, train_ds, train_count, global_batch_size
+        )
+        val_ds, val_steps = distribute.distribute_dataset(
+            strategy, val_ds, val_count, global_batch_size
+        )
+        config["fit"].setdefault("steps_per_epoch", steps)
+        config["fit"].setdefault("validation_steps", val_steps)
+
+    return cnn_model.fit(
         train_ds, validation_data=val_ds, callbacks=callbacks, **config["fit"]
     )
 
 
+def main(config_file):
+    """
+    Code for the training logic.
+
+    Parameters
+    ----------
+    config_file : str
+        Full path to experiment configuration file.
+    """
+    # Load configuration file, use utils.load_config()
+    config = utils.load_config(config_file)
+
+    # Multi-worker strategies must be created before running any op
+    strategy = distribute.create_strategy(config.get("distribute"))
+
+    # Get the list of output classes
+    # We will use it to control the order of the output predictions from
+    # keras is consistent
+    class_names = utils.get_class_names(config)
+
+    # Check if number of classes is correct
+    if len(class_names) != config["model"]["classes"]:
+        raise ValueError(
+            "The number classes between your dataset and your model"
+            "doen't match."
+        )
+
+    # Load training dataset, only this worker's part when training on many
+    num_workers, worker_index = distribute.worker_shard(strategy)
+    train_ds, val_ds = load_datasets(
+        config, class_names, num_workers, worker_index
+    )
+
+    train(config, class_names, train_ds, val_ds, strategy=strategy)
+
+
 if __name__ == "__main__":
     args = parse_args()
     main(args.config_file)
@@ -0,0 +1,145 @@
+import os
+import shutil
+import time
+
+import numpy as np
+
+TEST_DATA = os.path.join(os.path.dirname(__file__), "test_data")
+
+# Images of each class in the dataset made by `make_class_folders()`
+CLASS_IMAGES = {
+    "class_a": ["005652.jpg", "008773.jpg", "cat.jpeg"],
+    "class_b": ["012310.jpg", "005652.jpg"],
+}
+
+
+def make_class_folders(root, images=None):
+    """
+    Creates a small dataset in `root`, with one subfolder per class holding
+    copies of the `tests/test_data` images named `<class name>_<i>.jpg`.
+
+    Parameters
+    ----------
+    root : str
+        Folder where the class subfolders are created.
+
+    images : dict
+        Test image file names of each class, `CLASS_IMAGES` by default.
+
+    Returns
+    -------
+    class_names : list
+        Sorted class names.
+    """
+    images = CLASS_IMAGES if images is None else images
+    for class_name, fnames in images.items():
+        os.makedirs(os.path.join(root, class_name))
+        for i, fname in enumerate(fnames):
+            shutil.copy(
+                os.path.join(TEST_DATA, fname),
+                os.path.join(root, class_name, f"{class_name}_{i}.jpg"),
+            )
+
+    return sorted(images)
+
+
+def create_test_model(image_size=(8, 8)):
+    """
+    Tiny image classifier of RGB images into 2 classes, 8x8 images by
+    default, see `image_size` as (height, width).
+    """
+    # Imported here so tests only needing the stand-ins don't load
+    # TensorFlow
+    from tensorflow import keras
+
+    keras.utils.set_random_seed(123)
+    return keras.Sequential(
+        [
+            keras.layers.Input(shape=(*image_size, 3)),
+            keras.layers.Conv2D(4, 3),
+            keras.layers.GlobalAveragePooling2D(),
+            keras.layers.Dropout(0.5),
+            keras.layers.Dense(2, activation="softmax"),
+        ]
+    )
+
+
+class _Array:
+    # Mimics the torch.Tensor methods used to read detectron2 outputs
+    def __init__(self, values):
+        self.values = np.asarray(values)
+
+    def cpu(self):
+        return self
+
+    def numpy(self):
+        return self.values
+
+
+class _Boxes:
+    def __init__(self, boxes):
+        self.tensor = _Array(boxes)
+
+
+class _Instances:
+    def __init__(self, classes, boxes, scores):
+        self.pred_classes = _Array(classes)
+        self.pred_boxes = _Boxes(boxes)
+        self.scores = _Array(scores)
+
+
+class StandInDetector:
+    """
+    Lightweight replacement for the Faster R-CNN model, always returns a
+    person, a small car and a bigger truck. The start time of each call is
+    kept in `calls`.
+    """
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.calls = []
+
+    def detections(self, img):
+        return (
+            [0, 2, 7],
+            [[0, 0, 5, 5], [1, 1, 4, 4], [2.7, 3.2, 20.9, 15.5]],
+            [0.9, 0.8, 0.7],
+        )
+
+    def __call__(self, img):
+        self.calls.append(time.perf_counter())
+        time.sleep(self.delay)
+        classes, boxes, scores = self.detections(img)
+        return {"instances": _Instances(classes, boxes, scores)}
+
+
+class QuarterCarDetector(StandInDetector):
+    """
+    Finds a car in the top left quarter of every image.
+    """
+
+    def detections(self, img):
+        height, width = img.shape[:2]
+        return [2], [[0, 0, width // 2, height // 2]], [0.9]
+
+
+class StandInModel:
+    """
+    Returns the mean of each image as the score of the second class. The
+    start time, end time and batch size of each call are kept in `calls`.
+    """
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.calls = []
+
+    @property
+    def batch_sizes(self):
+        return [size for _, _, size in self.calls]
+
+    def predict_on_batch(self, images):
+        start = time.perf_counter()
+        time.sleep(self.delay)
+        self.calls.append((start, time.perf_counter(), len(images)))
+        score = images.mean(axis=(1, 2, 3)) / 255
+        return np.stack([1 - score, score], axis=-1)
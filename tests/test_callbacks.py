@@ -0,0 +1,98 @@
+import time
+import unittest
+
+import numpy as np
+import tensorflow as tf
+from tensorflow import keras
+
+from utils.callbacks import InputStallLogger, MedianStopping
+
+
+class TestInputStallLogger(unittest.TestCase):
+    def test_logs_stall_time(self):
+        def slow_load(x):
+            # Slow input pipeline, each batch takes at least 20ms
+            time.sleep(0.02)
+            return x
+
+        x = np.random.rand(8, 4).astype(np.float32)
+        y = np.random.rand(8, 1).astype(np.float32)
+        dataset = tf.data.Dataset.from_tensor_slices((x, y)).batch(2)
+        dataset = dataset.map(
+            lambda x, y: (tf.numpy_function(slow_load, [x], tf.float32), y)
+        )
+
+        model = keras.Sequential(
+            [keras.layers.Input(shape=(4,)), keras.layers.Dense(1)]
+        )
+        model.compile(optimizer="sgd", loss="mse")
+
+        stall_logger = InputStallLogger()
+        history = model.fit(
+            stall_logger.wrap(dataset),
+            epochs=2,
+            callbacks=[stall_logger],
+            verbose=0,
+        )
+        stalls = history.history["input_stall"]
+        self.assertEqual(len(stalls), 2)
+        # 4 batches per epoch
+        for stall in stalls:
+            self.assertGreaterEqual(stall, 0.06)
+
+    def test_steps_per_execution(self):
+        x = np.random.rand(8, 4).astype(np.float32)
+        y = np.random.rand(8, 1).astype(np.float32)
+        dataset = tf.data.Dataset.from_tensor_slices((x, y)).batch(2)
+        model = keras.Sequential(
+            [keras.layers.Input(shape=(4,)), keras.layers.Dense(1)]
+        )
+        model.compile(optimizer="sgd", loss="mse", steps_per_execution=2)
+
+        stall_logger = InputStallLogger()
+        with self.assertRaisesRegex(ValueError, "steps_per_execution"):
+            model.fit(
+                stall_logger.wrap(dataset),
+                callbacks=[stall_logger],
+                verbose=0,
+            )
+
+
+class TestMedianStopping(unittest.TestCase):
+    def _run(self, callback, values):
+        model = keras.Sequential([keras.layers.Input(shape=(1,))])
+        callback.set_model(model)
+        callback.on_train_begin()
+        for epoch, value in enumerate(values):
+            callback.on_epoch_end(epoch, {"val_accuracy": value})
+            if model.stop_training:
+                return epoch + 1
+        return len(values)
+
+    def test_stops_below_median(self):
+        previous = [[0.2, 0.5, 0.6], [0.3, 0.4, 0.7], [0.1, 0.6, 0.8]]
+        callback = MedianStopping(previous, grace_epochs=2, min_runs=3)
+        # Best 0.3 < median 0.5 at the second epoch
+        self.assertEqual(self._run(callback, [0.3, 0.3, 0.9]), 2)
+        self.assertEqual(callback.stopped_epoch, 1)
+        self.assertEqual(callback.best, 0.3)
+
+        # Best value so far counts, not the last one
+        callback = MedianStopping(previous, grace_epochs=1, min_runs=3)
+        self.assertEqual(self._run(callback, [0.55, 0.3, 0.8]), 3)
+        self.assertIsNone(callback.stopped_epoch)
+
+        # Not enough previous runs
+        callback = MedianStopping(previous[:2], min_runs=3)
+        self.assertEqual(self._run(callback, [0.0, 0.0, 0.0]), 3)
+
+    def test_min_mode(self):
+        previous = [[1.0, 0.5], [2.0, 0.6], [1.5]]
+        callback = MedianStopping(
+            previous, monitor="val_accuracy", mode="min", min_runs=3
+        )
+        # Median of the best values at the second epoch: 0.6
+        self.assertEqual(self._run(callback, [1.2, 0.7]), 2)
+
+        with self.assertRaises(ValueError):
+            MedianStopping(previous, mode="mean")
@@ -1,8 +1,10 @@
 import unittest
 
+import numpy as np
+import tensorflow as tf
 from tensorflow import keras
 
-from utils.data_aug import create_data_aug_layer
+from utils.data_aug import augment_dataset, create_data_aug_layer
 
 
 class TestDataAug(unittest.TestCase):
@@ -76,3 +78,25 @@ class TestDataAug(unittest.TestCase):
             places=4,
             msg="Incorrect RandomZoom 'width_factor' parameter",
         )
+
+    def test_augment_dataset(self):
+        images = np.random.rand(16, 8, 8, 3).astype(np.float32)
+        labels = np.arange(16)
+        dataset = tf.data.Dataset.from_tensor_slices((images, labels))
+        dataset = augment_dataset(
+            dataset.batch(4),
+            {"random_flip": {"mode": "horizontal", "seed": 1}},
+            num_parallel_calls=2,
+            deterministic=True,
+        )
+
+        flipped = 0
+        for batch_images, batch_labels in dataset:
+            self.assertEqual(batch_images.shape, (4, 8, 8, 3))
+            for image, label in zip(batch_images.numpy(), batch_labels):
+                original = images[label]
+                # Each image is either kept or flipped horizontally
+                if not np.allclose(image, original):
+                    np.testing.assert_allclose(image, original[:, ::-1])
+                    flipped += 1
+        self.assertGreater(flipped, 0)
@@ -0,0 +1,137 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+import tensorflow as tf
+from tensorflow import keras
+
+from tests.helpers import make_class_folders
+from utils import datasets
+
+
+class TestDatasets(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.directory = os.path.join(self.tmp_dir.name, "train")
+        make_class_folders(self.directory)
+        self.boxes_file = os.path.join(self.tmp_dir.name, "boxes.csv")
+        with open(self.boxes_file, "w") as f:
+            f.write("img_name,x1,y1,x2,y2\n")
+            f.write("class_a_0.jpg,7,21,234,155\n")
+            f.write("class_b_0.jpg,72,106,572,359\n")
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_same_split_as_keras(self):
+        for subset in ("training", "validation"):
+            kwargs = dict(
+                label_mode="categorical",
+                class_names=["class_a", "class_b"],
+                image_size=(64, 64),
+                batch_size=2,
+                seed=123,
+                validation_split=0.4,
+                subset=subset,
+            )
+            keras_ds = keras.utils.image_dataset_from_directory(
+                self.directory, **kwargs
+            )
+            ds = datasets.image_dataset_from_directory(
+                self.directory, **kwargs
+            )
+            self.assertEqual(ds.file_paths, keras_ds.file_paths)
+
+            images, labels = next(iter(ds))
+            self.assertEqual(images.shape.as_list()[1:], [64, 64, 3])
+            self.assertEqual(labels.shape.as_list()[1:], [2])
+
+    def test_crop_boxes(self):
+        ds = datasets.image_dataset_from_directory(
+            self.directory,
+            boxes=self.boxes_file,
+            class_names=["class_a", "class_b"],
+            image_size=(32, 48),
+            shuffle=False,
+        )
+        images, labels = next(iter(ds))
+        self.assertEqual(labels.numpy().tolist(), [0, 0, 0, 1, 1])
+
+        # First image is cropped with its box while being decoded
+        path = os.path.join(self.directory, "class_a", "class_a_0.jpg")
+        image = tf.io.decode_jpeg(tf.io.read_file(path), channels=3)
+        expected = tf.image.resize(image[21:155, 7:234], (32, 48))
+        np.testing.assert_allclose(images[0], expected, atol=1.0)
+
+        # Second image has no box, the full image is used
+        path = os.path.join(self.directory, "class_a", "class_a_1.jpg")
+        image = tf.io.decode_jpeg(tf.io.read_file(path), channels=3)
+        expected = tf.image.resize(image, (32, 48))
+        np.testing.assert_allclose(images[1], expected, atol=1e-3)
+
+    def test_empty_box(self):
+        # A box with no height keeps the full image, like no box at all
+        path = os.path.join(self.directory, "class_a", "class_a_0.jpg")
+        for box in ([7, 21, 234, 21], [234, 21, 7, 155]):
+            image = datasets.decode_image(
+                tf.constant(path), tf.constant(box), (32, 48)
+            )
+            expected = datasets.decode_image(
+                tf.constant(path), tf.constant([-1, -1, -1, -1]), (32, 48)
+            )
+            np.testing.assert_array_equal(image, expected)
+
+    def test_worker_parts(self):
+        kwargs = dict(
+            class_names=["class_a", "class_b"],
+            image_size=(32, 32),
+            batch_size=2,
+            seed=123,
+        )
+        full = datasets.image_dataset_from_directory(self.directory, **kwargs)
+        parts = [
+            datasets.image_dataset_from_directory(
+                self.directory, num_workers=2, worker_index=i, **kwargs
+            )
+            for i in range(2)
+        ]
+        self.assertEqual([len(ds.file_paths) for ds in parts], [3, 2])
+        # Same shuffle on every worker, each image in a single part
+        self.assertEqual(
+            sorted(parts[0].file_paths + parts[1].file_paths),
+            sorted(full.file_paths),
+        )
+        for ds in parts:
+            self.assertEqual(ds.samples_count, 5)
+
+    def test_pipeline(self):
+        kwargs = dict(
+            class_names=["class_a", "class_b"],
+            image_size=(32, 32),
+            batch_size=2,
+            shuffle=False,
+        )
+        expected = datasets.image_dataset_from_directory(
+            self.directory, **kwargs
+        )
+        expected = np.concatenate([images for images, _ in expected])
+
+        cache_dir = os.path.join(self.tmp_dir.name, "cache")
+        ds = datasets.image_dataset_from_directory(
+            self.directory,
+            pipeline={
+                "cache": cache_dir,
+                "num_parallel_calls": 2,
+                "deterministic": True,
+                "prefetch": 1,
+                "private_threadpool_size": 2,
+            },
+            **kwargs,
+        )
+        self.assertEqual(ds.options().threading.private_threadpool_size, 2)
+        # Second epoch is read from the cache
+        for _ in range(2):
+            images = np.concatenate([images for images, _ in ds])
+            np.testing.assert_array_equal(images, expected)
+        self.assertTrue(os.listdir(cache_dir))
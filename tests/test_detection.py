@@ -1,8 +1,19 @@
+import functools
 import unittest
+from unittest import mock
 
 import cv2
+import numpy as np
 
-from utils.detection import get_vehicle_coordinates
+from tests.helpers import StandInDetector
+from utils import detection
+from utils.detection import (
+    DETECTOR_CONFIG,
+    get_vehicle_coordinates,
+    get_vehicle_coordinates_batch,
+    select_largest_vehicle,
+    set_detector,
+)
 
 
 class TestDataAug(unittest.TestCase):
@@ -36,3 +47,101 @@ class TestDataAug(unittest.TestCase):
         self.assertAlmostEqual(y1, 181, delta=5)
         self.assertAlmostEqual(x2, 543, delta=5)
         self.assertAlmostEqual(y2, 408, delta=5)
+
+    def test_get_vehicle_coordinates_batch(self):
+        # Batched detections must match the single image function
+        ims = [
+            cv2.imread("tests/test_data/cat.jpeg"),
+            cv2.imread("tests/test_data/012310.jpg"),
+            cv2.imread("tests/test_data/005652.jpg"),
+            cv2.imread("tests/test_data/008773.jpg"),
+        ]
+        expected = [get_vehicle_coordinates(im) for im in ims]
+        dets = get_vehicle_coordinates_batch(ims, batch_size=3)
+        self.assertEqual(len(dets), len(ims))
+        for det, exp in zip(dets, expected):
+            for coord, exp_coord in zip(det, exp):
+                self.assertAlmostEqual(coord, exp_coord, delta=2)
+
+
+class TestDetectorOverride(unittest.TestCase):
+    def setUp(self):
+        self.detector = StandInDetector()
+        set_detector(self.detector)
+
+    def tearDown(self):
+        set_detector(None)
+
+    def test_stand_in_detector(self):
+        im = np.zeros((32, 48, 3), dtype=np.uint8)
+        self.assertEqual(list(get_vehicle_coordinates(im)), [2, 3, 20, 15])
+        self.assertEqual(len(self.detector.calls), 1)
+
+        dets = get_vehicle_coordinates_batch([im] * 3, batch_size=2)
+        self.assertEqual([list(d) for d in dets], [[2, 3, 20, 15]] * 3)
+        self.assertEqual(len(self.detector.calls), 4)
+
+
+class TestGetDetector(unittest.TestCase):
+    def test_same_settings_share_detector(self):
+        builds = []
+
+        @functools.lru_cache(maxsize=None)
+        def build_detector(*settings):
+            builds.append(settings)
+            return object()
+
+        with mock.patch.object(detection, "_build_detector", build_detector):
+            detector = detection.get_detector(device="cpu", weights="w.pkl")
+            for same in (
+                detection.get_detector(
+                    DETECTOR_CONFIG, 0.5, device="cpu", weights="w.pkl"
+                ),
+                detection.get_detector(
+                    weights="w.pkl", score_thresh=0.5, device="cpu"
+                ),
+            ):
+                self.assertIs(same, detector)
+            other = detection.get_detector(
+                score_thresh=0.7, device="cpu", weights="w.pkl"
+            )
+        self.assertIsNot(other, detector)
+        self.assertEqual(
+            builds,
+            [
+                (DETECTOR_CONFIG, 0.5, "cpu", "w.pkl"),
+                (DETECTOR_CONFIG, 0.7, "cpu", "w.pkl"),
+            ],
+        )
+
+
+class TestSelectLargestVehicle(unittest.TestCase):
+    def test_no_detections(self):
+        box = select_largest_vehicle(
+            np.zeros((0,)), np.zeros((0, 4)), (40, 60, 3)
+        )
+        self.assertEqual(box.tolist(), [0, 0, 60, 40])
+
+    def test_order_independent(self):
+        # A non vehicle detected after the vehicles must not change the box
+        classes = np.array([7, 2, 0])
+        boxes = np.array(
+            [[1.9, 1.2, 10.8, 10.5], [0, 0, 30, 20], [0, 0, 60, 40]]
+        )
+        box = select_largest_vehicle(classes, boxes, (40, 60))
+        self.assertEqual(box.tolist(), [0, 0, 30, 20])
+
+        box = select_largest_vehicle(classes[::-1], boxes[::-1], (40, 60))
+        self.assertEqual(box.tolist(), [0, 0, 30, 20])
+
+    def test_batch(self):
+        # Second image only has padding, third one only a person
+        classes = np.array([[0, 2, 7], [-1, -1, -1], [0, -1, -1]])
+        boxes = np.zeros((3, 3, 4))
+        boxes[0, 1] = [5.5, 5.5, 9.9, 9.9]
+        boxes[0, 2] = [1, 2, 3, 4]
+        shapes = np.array([[10, 20], [30, 40], [50, 60]])
+        result = select_largest_vehicle(classes, boxes, shapes)
+        self.assertEqual(
+            result.tolist(), [[5, 5, 9, 9], [0, 0, 40, 30], [0, 0, 60, 50]]
+        )
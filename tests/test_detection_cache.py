@@ -0,0 +1,103 @@
+import tempfile
+import unittest
+
+import numpy as np
+
+from tests.helpers import StandInDetector
+from utils.detection import detect, get_vehicle_coordinates_batch
+from utils.detection_cache import DetectionCache, array_digest, file_digest
+
+
+class TestDetectionCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.cache_dir = self.tmp_dir.name
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_put_get_reload(self):
+        boxes = np.array([[1, 2, 3, 4], [5, 6, 7, 8]], dtype=np.float32)
+        with DetectionCache(self.cache_dir) as cache:
+            self.assertIsNone(cache.get("a"))
+            cache.put("a", [2, 7], boxes, [0.9, 0.8])
+            cache.put("b", [], np.zeros((0, 4)), [])
+            self.assertIn("a", cache)
+
+        # Entries written to disk are found by a new cache instance
+        cache = DetectionCache(self.cache_dir)
+        self.assertEqual(len(cache), 2)
+        classes, cached_boxes, scores = cache.get("a")
+        self.assertEqual(classes.tolist(), [2, 7])
+        np.testing.assert_array_equal(cached_boxes, boxes)
+        np.testing.assert_allclose(scores, [0.9, 0.8])
+        self.assertEqual(len(cache.get("b")[0]), 0)
+        self.assertEqual((cache.hits, cache.misses), (2, 0))
+
+        # A different detector setting never sees these entries
+        other = DetectionCache(self.cache_dir, score_thresh=0.7)
+        self.assertIsNone(other.get("a"))
+
+    def test_instances_sharing_folder(self):
+        boxes = np.zeros((1, 4), dtype=np.float32)
+        first = DetectionCache(self.cache_dir)
+        second = DetectionCache(self.cache_dir)
+        first.put("a", [2], boxes, [0.9])
+        second.put("b", [3], boxes, [0.8])
+        first.flush()
+        second.flush()
+        second.put("c", [7], boxes, [0.7])
+        second.flush()
+
+        cache = DetectionCache(self.cache_dir)
+        self.assertEqual(len(cache), 3)
+        self.assertEqual(cache.get("b")[0].tolist(), [3])
+        self.assertEqual(cache.get("c")[0].tolist(), [7])
+
+    def test_long_keys(self):
+        # Only the end of these keys differs
+        keys = ["/data/car_ims/" + "x" * 40 + f"/{i}.jpg" for i in range(3)]
+        boxes = np.zeros((1, 4), dtype=np.float32)
+        with DetectionCache(self.cache_dir) as cache:
+            for i, key in enumerate(keys):
+                cache.put(key, [i], boxes, [0.9])
+
+        cache = DetectionCache(self.cache_dir)
+        self.assertEqual(len(cache), 3)
+        for i, key in enumerate(keys):
+            self.assertEqual(cache.get(key)[0].tolist(), [i])
+
+    def test_detect_with_cache(self):
+        detector = StandInDetector()
+        images = [
+            np.zeros((32, 48, 3), dtype=np.uint8),
+            np.ones((32, 48, 3), dtype=np.uint8),
+        ]
+        with DetectionCache(self.cache_dir) as cache:
+            expected = get_vehicle_coordinates_batch(
+                images, detector=detector, cache=cache
+            )
+        self.assertEqual(len(detector.calls), 2)
+
+        # Warm cache, no inference needed
+        cache = DetectionCache(self.cache_dir)
+        boxes = get_vehicle_coordinates_batch(
+            images, detector=detector, cache=cache
+        )
+        self.assertEqual(boxes, expected)
+        self.assertEqual(len(detector.calls), 2)
+
+        keys = [array_digest(img) for img in images]
+        detections = detect(images, detector=detector, cache=cache, keys=keys)
+        self.assertEqual(detections[1][0].tolist(), [0, 2, 7])
+        self.assertEqual(len(detector.calls), 2)
+
+    def test_file_digest(self):
+        self.assertEqual(
+            file_digest("tests/test_data/cat.jpeg"),
+            file_digest("tests/test_data/cat.jpeg"),
+        )
+        self.assertNotEqual(
+            file_digest("tests/test_data/cat.jpeg"),
+            file_digest("tests/test_data/012310.jpg"),
+        )
@@ -0,0 +1,125 @@
+import json
+import os
+import tempfile
+import types
+import unittest
+
+import numpy as np
+import tensorflow as tf
+import yaml
+
+from scripts import launch_workers
+from tests.helpers import make_class_folders
+from utils import distribute
+
+
+class TestDistribute(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_worker_shard(self):
+        self.assertEqual(
+            distribute.worker_shard(tf.distribute.get_strategy()), (1, 0)
+        )
+
+        cluster = tf.train.ClusterSpec(
+            {"chief": ["host:1"], "worker": ["host:2", "host:3"]}
+        )
+        for task_type, task_id, expected in (
+            ("chief", 0, (3, 0)),
+            ("worker", 0, (3, 1)),
+            ("worker", 1, (3, 2)),
+        ):
+            resolver = tf.distribute.cluster_resolver.SimpleClusterResolver(
+                cluster, task_type=task_type, task_id=task_id
+            )
+            strategy = types.SimpleNamespace(cluster_resolver=resolver)
+            self.assertEqual(distribute.worker_shard(strategy), expected)
+
+    def test_distribute_dataset(self):
+        dataset = tf.data.Dataset.range(10).batch(4)
+        strategy = tf.distribute.get_strategy()
+        distributed, steps = distribute.distribute_dataset(
+            strategy, dataset, 10, 4
+        )
+        self.assertEqual(steps, 2)
+        # Repeated, so workers with smaller parts never run out
+        batches = iter(distributed)
+        values = np.concatenate([next(batches) for _ in range(4)])
+        np.testing.assert_array_equal(values, list(range(10)) + [0, 1, 2, 3])
+
+    def test_tf_config(self):
+        addresses = ["localhost:1234", "localhost:1235"]
+        self.assertEqual(
+            json.loads(launch_workers.tf_config(addresses, 1)),
+            {
+                "cluster": {"worker": addresses},
+                "task": {"type": "worker", "index": 1},
+            },
+        )
+
+    def test_launch_workers(self):
+        data = os.path.join(self.tmp_dir.name, "data")
+        images = ["005652.jpg", "008773.jpg", "012310.jpg"] * 2
+        make_class_folders(data, {"a": images, "b": images})
+        config = {
+            "seed": 123,
+            "data": {
+                "directory": data,
+                "label_mode": "categorical",
+                "validation_split": 0.25,
+                "image_size": [32, 32],
+                "batch_size": 2,
+            },
+            "model": {
+                "weights": None,
+                "input_shape": [32, 32, 3],
+                "classes": 2,
+            },
+            "compile": {
+                "optimizer": {"sgd": {"learning_rate": 0.01}},
+                "loss": "categorical_crossentropy",
+                "metrics": ["accuracy"],
+            },
+            "fit": {
+                "epochs": 1,
+                "callbacks": {
+                    "model_checkpoint": {
+                        "filepath": os.path.join(
+                            self.tmp_dir.name, "model.{epoch:02d}.h5"
+                        )
+                    },
+                },
+            },
+        }
+        config_file = os.path.join(self.tmp_dir.name, "config.yml")
+        with open(config_file, "w") as f:
+            yaml.safe_dump(config, f)
+        # Workers would train on their own
+        with self.assertRaises(ValueError):
+            launch_workers.main(config_file)
+
+        config["distribute"] = {"strategy": "multi_worker_mirrored"}
+        with open(config_file, "w") as f:
+            yaml.safe_dump(config, f)
+        log_dir = os.path.join(self.tmp_dir.name, "logs")
+        restarts = launch_workers.main(config_file, 2, log_dir=log_dir)
+        self.assertEqual(restarts, 0)
+
+        # Only the chief writes the checkpoint
+        self.assertTrue(
+            os.path.isfile(os.path.join(self.tmp_dir.name, "model.01.h5"))
+        )
+        for i in range(2):
+            with open(os.path.join(log_dir, f"worker_{i}.log")) as f:
+                self.assertIn(
+                    "Training on 2 workers, 2 replicas, global batch size 4",
+                    f.read(),
+                )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,142 @@
+import io
+import os
+import tempfile
+import unittest
+
+import boto3
+from boto3.s3.transfer import TransferConfig
+from moto import mock_aws
+
+import download
+
+MB = 1024**2
+
+
+class TestDownload(unittest.TestCase):
+    def setUp(self):
+        self.mock = mock_aws()
+        self.mock.start()
+        self.client = boto3.client("s3", region_name="us-east-1")
+        self.client.create_bucket(Bucket="test-bucket")
+        # Multipart upload, parts must be at least 5MB
+        self.data = os.urandom(5 * MB) + os.urandom(MB // 2)
+        self.client.upload_fileobj(
+            io.BytesIO(self.data),
+            "test-bucket",
+            "car_ims.tgz",
+            Config=TransferConfig(
+                multipart_threshold=5 * MB, multipart_chunksize=5 * MB
+            ),
+        )
+        self.client.put_object(
+            Bucket="test-bucket", Key="labels.csv", Body=b"img_name\n"
+        )
+        self.config = TransferConfig(
+            multipart_threshold=MB, multipart_chunksize=MB, max_concurrency=4
+        )
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp_dir.name, "car_ims.tgz")
+        self.get_calls = 0
+        self.client.meta.events.register(
+            "before-call.s3.GetObject", self._count_get
+        )
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+        self.mock.stop()
+
+    def _count_get(self, **kwargs):
+        self.get_calls += 1
+
+    def _read(self, path):
+        with open(path, "rb") as f:
+            return f.read()
+
+    def test_fetch(self):
+        downloaded = download.fetch(
+            self.client, "test-bucket", "car_ims.tgz", self.path, self.config
+        )
+        self.assertTrue(downloaded)
+        self.assertEqual(self._read(self.path), self.data)
+        # One ranged request per MB
+        self.assertEqual(self.get_calls, 6)
+        self.assertFalse(os.path.exists(self.path + download.PART_SUFFIX))
+
+        # Small files are downloaded in a single request
+        csv_path = os.path.join(self.tmp_dir.name, "labels.csv")
+        download.fetch(
+            self.client, "test-bucket", "labels.csv", csv_path, self.config
+        )
+        self.assertEqual(self._read(csv_path), b"img_name\n")
+        self.assertEqual(self.get_calls, 7)
+
+    def test_skip_verified(self):
+        download.fetch(
+            self.client, "test-bucket", "car_ims.tgz", self.path, self.config
+        )
+        self.get_calls = 0
+        downloaded = download.fetch(
+            self.client, "test-bucket", "car_ims.tgz", self.path, self.config
+        )
+        self.assertFalse(downloaded)
+        self.assertEqual(self.get_calls, 0)
+
+        # A copy downloaded by other means is verified with its ETag
+        os.remove(self.path + download.STATE_SUFFIX)
+        downloaded = download.fetch(
+            self.client, "test-bucket", "car_ims.tgz", self.path, self.config
+        )
+        self.assertFalse(downloaded)
+        self.assertEqual(self.get_calls, 0)
+
+        # A different file is downloaded again
+        os.remove(self.path + download.STATE_SUFFIX)
+        with open(self.path, "r+b") as f:
+            f.write(b"broken")
+        downloaded = download.fetch(
+            self.client, "test-bucket", "car_ims.tgz", self.path, self.config
+        )
+        self.assertTrue(downloaded)
+        self.assertEqual(self._read(self.path), self.data)
+
+    def test_resume(self):
+        def fail_after_two(**kwargs):
+            if self.get_calls > 2:
+                raise ConnectionError("Connection lost")
+
+        self.client.meta.events.register(
+            "before-call.s3.GetObject", fail_after_two
+        )
+        config = TransferConfig(
+            multipart_threshold=MB, multipart_chunksize=MB, max_concurrency=1
+        )
+        with self.assertRaises(ConnectionError):
+            download.fetch(
+                self.client, "test-bucket", "car_ims.tgz", self.path, config
+            )
+        self.assertFalse(os.path.exists(self.path))
+        self.client.meta.events.unregister(
+            "before-call.s3.GetObject", fail_after_two
+        )
+
+        self.get_calls = 0
+        download.fetch(
+            self.client, "test-bucket", "car_ims.tgz", self.path, config
+        )
+        self.assertEqual(self._read(self.path), self.data)
+        # Only the parts missing were downloaded
+        self.assertEqual(self.get_calls, 4)
+
+    def test_file_etag(self):
+        with open(self.path, "wb") as f:
+            f.write(self.data)
+        etag = self.client.head_object(
+            Bucket="test-bucket", Key="car_ims.tgz"
+        )["ETag"]
+        self.assertEqual(
+            download.file_etag(self.path, 5 * MB, 2), etag.strip('"')
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
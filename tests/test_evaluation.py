@@ -0,0 +1,129 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from tests.helpers import create_test_model, make_class_folders
+from utils.evaluation import EvaluationResult
+from utils.utils import predict_from_folder
+
+
+class TestEvaluationResult(unittest.TestCase):
+    def setUp(self):
+        probabilities = np.array(
+            [
+                [0.7, 0.2, 0.1],
+                [0.1, 0.3, 0.6],
+                [0.5, 0.4, 0.1],
+                [0.2, 0.2, 0.6],
+            ],
+            dtype=np.float32,
+        )
+        self.result = EvaluationResult(
+            probabilities,
+            file_paths=["a/1.jpg", "b/2.jpg", "b/3.jpg", "c/4.jpg"],
+            labels=[0, 1, 1, 2],
+            class_names=["a", "b", "c"],
+        )
+
+    def test_metrics(self):
+        self.assertEqual(self.result.predictions.tolist(), [0, 2, 0, 2])
+        self.assertAlmostEqual(self.result.accuracy(), 0.5)
+        self.assertAlmostEqual(self.result.top_k_accuracy(2), 1.0)
+        self.assertAlmostEqual(self.result.top_k_accuracy(5), 1.0)
+        np.testing.assert_array_equal(
+            self.result.confusion_matrix(),
+            [[1, 0, 0], [1, 0, 1], [0, 0, 1]],
+        )
+
+        metrics = self.result.per_class_metrics()
+        np.testing.assert_allclose(metrics["precision"], [0.5, 0.0, 0.5])
+        np.testing.assert_allclose(metrics["recall"], [1.0, 0.0, 1.0])
+        np.testing.assert_array_equal(metrics["support"], [1, 2, 1])
+
+        _, _, counts = self.result.calibration_curve(bins=10)
+        self.assertEqual(counts.sum(), 4)
+
+    def test_unknown_labels(self):
+        # Images from a folder not in `class_names` are left out
+        result = EvaluationResult(
+            np.concatenate([self.result.probabilities, [[0.1, 0.8, 0.1]]]),
+            file_paths=self.result.file_paths + ["d/5.jpg"],
+            labels=[0, 1, 1, 2, -1],
+            class_names=["a", "b", "c"],
+        )
+        self.assertAlmostEqual(result.accuracy(), 0.5)
+        self.assertAlmostEqual(result.top_k_accuracy(1), 0.5)
+        self.assertAlmostEqual(result.top_k_accuracy(2), 1.0)
+        self.assertEqual(result.confusion_matrix().sum(), 4)
+        self.assertEqual(result.calibration_curve()[2].sum(), 4)
+
+    def test_save_load(self):
+        with tempfile.TemporaryDirectory() as path:
+            self.result.save(path)
+            loaded = EvaluationResult.load(path)
+            self.assertIsInstance(loaded.probabilities, np.memmap)
+            np.testing.assert_array_equal(
+                loaded.probabilities, self.result.probabilities
+            )
+            self.assertEqual(loaded.file_paths, self.result.file_paths)
+            self.assertEqual(loaded.class_names, self.result.class_names)
+            self.assertAlmostEqual(loaded.accuracy(), 0.5)
+
+    def test_from_folder(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            folder = os.path.join(tmp_dir, "test")
+            make_class_folders(
+                folder, {"a": ["cat.jpeg"], "b": ["012310.jpg"]}
+            )
+
+            model = create_test_model((32, 32))
+            output = os.path.join(tmp_dir, "result")
+            result = EvaluationResult.from_folder(
+                folder, model, (32, 32), ["a", "b"], path=output
+            )
+            predictions, _ = predict_from_folder(
+                folder, model, (32, 32), ["a", "b"]
+            )
+            self.assertEqual(result.predicted_class_names(), predictions)
+            self.assertEqual(sorted(result.labels.tolist()), [0, 1])
+
+            loaded = EvaluationResult.load(output)
+            np.testing.assert_array_equal(
+                loaded.probabilities, result.probabilities
+            )
+
+    def test_from_folder_sharded(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            folder = os.path.join(tmp_dir, "test")
+            make_class_folders(
+                folder,
+                {
+                    "a": ["cat.jpeg", "005652.jpg"],
+                    "b": ["012310.jpg", "008773.jpg"],
+                },
+            )
+
+            model = create_test_model((32, 32))
+            weights = os.path.join(tmp_dir, "model.h5")
+            model.save(weights)
+
+            expected = EvaluationResult.from_folder(
+                folder, model, (32, 32), ["a", "b"], batch_size=1
+            )
+            # 4 images over 3 workers, shards have different sizes
+            result = EvaluationResult.from_folder_sharded(
+                folder,
+                weights,
+                (32, 32),
+                ["a", "b"],
+                workers=3,
+                batch_size=1,
+                threads_per_worker=1,
+            )
+            self.assertEqual(result.file_paths, expected.file_paths)
+            np.testing.assert_array_equal(result.labels, expected.labels)
+            np.testing.assert_allclose(
+                result.probabilities, expected.probabilities, rtol=1e-5
+            )
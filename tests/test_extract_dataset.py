@@ -0,0 +1,131 @@
+import io
+import os
+import tarfile
+import tempfile
+import unittest
+
+import pandas as pd
+
+from scripts import extract_dataset, prepare_train_test_dataset
+from tests.helpers import TEST_DATA
+from utils import shards
+
+# Test image used for each archive member, with its subset and class
+IMAGES = {
+    "000001.jpg": ("005652.jpg", "train", "Class A"),
+    "000002.jpg": ("008773.jpg", "test", "Class A"),
+    "000003.jpg": ("012310.jpg", "train", "Class B"),
+    "000004.jpg": ("cat.jpeg", "train", "Class A"),
+}
+
+
+class TestExtractDataset(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.output = os.path.join(self.tmp_dir.name, "car_ims_v1")
+        self.archive = os.path.join(self.tmp_dir.name, "car_ims.tgz")
+        with tarfile.open(self.archive, "w:gz") as tar:
+            folder = tarfile.TarInfo("car_ims")
+            folder.type = tarfile.DIRTYPE
+            tar.addfile(folder)
+            for img_name, (fname, _, _) in IMAGES.items():
+                tar.add(
+                    os.path.join(TEST_DATA, fname), f"car_ims/{img_name}"
+                )
+            # Not in the labels, skipped
+            member = tarfile.TarInfo("car_ims/README.txt")
+            member.size = 5
+            tar.addfile(member, io.BytesIO(b"hello"))
+
+        self.labels = os.path.join(self.tmp_dir.name, "labels.csv")
+        pd.DataFrame(
+            {
+                "img_name": list(IMAGES),
+                "class": [clase for _, _, clase in IMAGES.values()],
+                "subset": [subset for _, subset, _ in IMAGES.values()],
+            }
+        ).to_csv(self.labels, index=False)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def _read(self, path):
+        with open(path, "rb") as f:
+            return f.read()
+
+    def test_extract(self):
+        counts = extract_dataset.main(self.archive, self.labels, self.output)
+        self.assertEqual(counts, {"extracted": 4, "skipped": 1})
+
+        for img_name, (fname, subset, clase) in IMAGES.items():
+            path = os.path.join(self.output, subset, clase, img_name)
+            self.assertEqual(
+                self._read(path), self._read(os.path.join(TEST_DATA, fname))
+            )
+        # Every class has a folder in every subset, even without images
+        self.assertEqual(
+            sorted(os.listdir(os.path.join(self.output, "test"))),
+            ["Class A", "Class B"],
+        )
+        self.assertEqual(
+            os.listdir(os.path.join(self.output, "test", "Class B")), []
+        )
+        self.assertEqual(
+            sorted(os.listdir(os.path.join(self.output, "train", "Class A"))),
+            ["000001.jpg", "000004.jpg"],
+        )
+
+    def test_extract_over_links(self):
+        # Two steps flow first, images are hard links into `car_ims`
+        with tarfile.open(self.archive, "r:gz") as tar:
+            tar.extractall(self.tmp_dir.name)
+        car_ims = os.path.join(self.tmp_dir.name, "car_ims")
+        prepare_train_test_dataset.main(car_ims, self.labels, self.output)
+        source = os.path.join(car_ims, "000001.jpg")
+        with open(source, "wb") as f:
+            f.write(b"changed")
+
+        extract_dataset.main(self.archive, self.labels, self.output)
+
+        # The extracted image replaced the link, `car_ims` is untouched
+        path = os.path.join(self.output, "train", "Class A", "000001.jpg")
+        self.assertEqual(
+            self._read(path),
+            self._read(os.path.join(TEST_DATA, "005652.jpg")),
+        )
+        self.assertEqual(self._read(source), b"changed")
+        self.assertFalse(os.path.exists(path + ".part"))
+
+    def test_extract_shards(self):
+        shards_folder = os.path.join(self.tmp_dir.name, "shards")
+        extract_dataset.main(
+            self.archive,
+            self.labels,
+            self.output,
+            shards_folder=shards_folder,
+            image_size=(32, 48),
+            shard_size=2,
+        )
+
+        index = shards.load_index(shards_folder)
+        self.assertEqual(index["class_names"], ["Class A", "Class B"])
+        self.assertEqual(index["image_size"], [32, 48])
+        self.assertEqual(index["splits"]["training"]["count"], 3)
+        self.assertEqual(len(index["splits"]["training"]["files"]), 2)
+        self.assertEqual(index["splits"]["test"]["count"], 1)
+
+        ds = shards.image_dataset_from_shards(
+            shards_folder,
+            class_names=["Class A", "Class B"],
+            image_size=(32, 48),
+            batch_size=8,
+            shuffle=False,
+            subset="test",
+        )
+        images, labels = next(iter(ds))
+        self.assertEqual(tuple(images.shape), (1, 32, 48, 3))
+        self.assertEqual(labels.numpy().tolist(), [0])
+
+
+if __name__ == "__main__":
+    unittest.main()
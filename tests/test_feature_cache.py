@@ -0,0 +1,117 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+import tensorflow as tf
+from tensorflow import keras
+
+from models.resnet_50 import create_model, split_model
+from utils.callbacks import FullModelCheckpoint
+from utils.data_aug import create_data_aug_layer
+from utils.feature_cache import AugmentedFeatureSequence, FeatureCache
+
+
+class TestFeatureCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        keras.utils.set_random_seed(123)
+        # Stand-in for a `create_model()` model, pooling is the backbone
+        inputs = keras.layers.Input(shape=(8, 8, 3))
+        x = keras.layers.GlobalAveragePooling2D()(inputs)
+        x = keras.layers.Dropout(0.5)(x)
+        outputs = keras.layers.Dense(2, activation="softmax")(x)
+        self.model = keras.Model(inputs, outputs)
+
+        images = np.random.rand(10, 8, 8, 3).astype(np.float32)
+        labels = np.eye(2, dtype=np.float32)[np.arange(10) % 2]
+        self.dataset = tf.data.Dataset.from_tensor_slices((images, labels))
+        self.dataset = self.dataset.shuffle(10).batch(4)
+        self.images = images
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_compute_and_load(self):
+        backbone, _ = split_model(self.model)
+        cache = FeatureCache(self.tmp_dir.name, {"image_size": [8, 8]})
+        self.assertNotIn("training", cache)
+
+        features, labels = cache.get_or_compute(
+            "training", backbone, self.dataset
+        )
+        self.assertIn("training", cache)
+        self.assertIsInstance(features, np.memmap)
+        self.assertEqual(features.shape, (1, 10, 3))
+        self.assertEqual(labels.shape, (10, 2))
+
+        # Features stay paired with their labels after shuffling
+        expected = self.images.mean(axis=(1, 2))
+        for feature, label in zip(features[0], labels):
+            i = np.argmin(np.abs(expected - feature).sum(axis=1))
+            self.assertEqual(label.argmax(), i % 2)
+
+        # Other settings use a different folder
+        other = FeatureCache(self.tmp_dir.name, {"image_size": [16, 16]})
+        self.assertNotIn("training", other)
+
+    def test_fit_head_and_save_full_model(self):
+        backbone, head = split_model(self.model)
+        cache = FeatureCache(self.tmp_dir.name, {})
+        features, labels = cache.compute("training", backbone, self.dataset)
+
+        path = os.path.join(self.tmp_dir.name, "model.h5")
+        head.compile(optimizer="sgd", loss="categorical_crossentropy")
+        head.fit(
+            features[0],
+            labels,
+            epochs=2,
+            callbacks=[FullModelCheckpoint(self.model, filepath=path)],
+            verbose=0,
+        )
+
+        loaded = create_model(weights=path)
+        self.assertEqual(len(loaded.layers), len(self.model.layers))
+        np.testing.assert_allclose(
+            loaded.predict(self.images, verbose=0),
+            self.model.predict(self.images, verbose=0),
+            rtol=1e-5,
+        )
+
+    def test_augmented_views(self):
+        backbone, head = split_model(self.model)
+        cache = FeatureCache(self.tmp_dir.name, {})
+        data_augmentation = create_data_aug_layer(
+            {"random_flip": {"mode": "horizontal", "seed": 1}}
+        )
+        features, labels = cache.compute(
+            "training",
+            backbone,
+            self.dataset,
+            views=3,
+            augment=lambda x: data_augmentation(x, training=True),
+        )
+        self.assertEqual(features.shape, (3, 10, 3))
+        self.assertEqual(labels.shape, (10, 2))
+        # Flipping keeps the channel means, but the backbone ran on each
+        # augmented view
+        for k in range(1, 3):
+            np.testing.assert_allclose(features[k], features[0], rtol=1e-5)
+
+        sequence = AugmentedFeatureSequence(features, labels, 4, seed=1)
+        self.assertEqual(len(sequence), 3)
+        x, y = sequence[2]
+        self.assertEqual(x.shape, (2, 3))
+        self.assertEqual(y.shape, (2, 2))
+        # Each epoch picks one view per sample
+        views = sequence.views.copy()
+        for _ in range(5):
+            sequence.on_epoch_end()
+        self.assertTrue(np.all(sequence.views < 3))
+        self.assertFalse(np.array_equal(sequence.views, views))
+
+        head.compile(optimizer="sgd", loss="categorical_crossentropy")
+        head.fit(sequence, epochs=2, verbose=0)
+
+        with self.assertRaises(ValueError):
+            cache.compute("other", backbone, self.dataset, views=2)
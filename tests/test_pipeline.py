@@ -0,0 +1,74 @@
+import unittest
+
+from tests.helpers import QuarterCarDetector, StandInModel
+from utils.pipeline import STAGES, DetectClassifyPipeline
+
+
+class TestDetectClassifyPipeline(unittest.TestCase):
+    def setUp(self):
+        with open("tests/test_data/cat.jpeg", "rb") as f:
+            self.image_bytes = f.read()
+
+    def test_predict(self):
+        model = StandInModel()
+        pipeline = DetectClassifyPipeline(
+            model,
+            ["dark", "bright"],
+            (32, 32),
+            batch_size=2,
+            detector=QuarterCarDetector(),
+        )
+        results = pipeline.predict([self.image_bytes] * 5)
+        pipeline.close()
+
+        self.assertEqual(len(results), 5)
+        self.assertEqual(model.batch_sizes, [2, 2, 1])
+        self.assertEqual(set(results[0]), {"class_name", "score", "box"})
+        # Boxes are in the original image coordinates
+        self.assertEqual(results[0]["box"], [0, 0, 300, 200])
+        for result in results[1:]:
+            self.assertEqual(result, results[0])
+        self.assertEqual(pipeline.images_count, 5)
+        self.assertEqual(set(pipeline.timings), set(STAGES))
+        self.assertTrue(all(t > 0 for t in pipeline.timings.values()))
+
+        pipeline.reset_timings()
+        self.assertEqual(pipeline.images_count, 0)
+
+    def test_no_crop(self):
+        detector = QuarterCarDetector()
+        pipeline = DetectClassifyPipeline(
+            StandInModel(),
+            ["dark", "bright"],
+            (32, 32),
+            crop=False,
+            detector=detector,
+        )
+        results = pipeline.predict([self.image_bytes])
+        pipeline.close()
+
+        self.assertEqual(detector.calls, [])
+        self.assertEqual(results[0]["box"], [0, 0, 600, 401])
+
+    def test_stages_overlap(self):
+        detector = QuarterCarDetector(delay=0.05)
+        model = StandInModel(delay=0.1)
+        pipeline = DetectClassifyPipeline(
+            model,
+            ["dark", "bright"],
+            (32, 32),
+            batch_size=1,
+            detector=detector,
+        )
+        pipeline.predict([self.image_bytes] * 3)
+        pipeline.close()
+
+        # Detection of the second image starts while the first one is
+        # still being classified
+        first_start, first_end, _ = model.calls[0]
+        self.assertLess(first_start, detector.calls[1])
+        self.assertLess(detector.calls[1], first_end)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,165 @@
+import contextlib
+import errno
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+import pandas as pd
+
+from scripts import prepare_train_test_dataset
+from tests.helpers import TEST_DATA
+
+# Test image used for each raw image, with its subset and class
+IMAGES = {
+    "000001.jpg": ("005652.jpg", "train", "Class A"),
+    "000002.jpg": ("008773.jpg", "test", "Class A"),
+    "000003.jpg": ("012310.jpg", "train", "Class B"),
+    "000004.jpg": ("cat.jpeg", "test", "Class B"),
+}
+
+
+class TestPrepareTrainTestDataset(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.data_folder = os.path.join(self.tmp_dir.name, "car_ims")
+        self.output = os.path.join(self.tmp_dir.name, "car_ims_v1")
+        os.makedirs(self.data_folder)
+        for img_name, (fname, _, _) in IMAGES.items():
+            shutil.copy(
+                os.path.join(TEST_DATA, fname),
+                os.path.join(self.data_folder, img_name),
+            )
+        self.labels = os.path.join(self.tmp_dir.name, "labels.csv")
+        pd.DataFrame(
+            {
+                "img_name": list(IMAGES),
+                "class": [clase for _, _, clase in IMAGES.values()],
+                "subset": [subset for _, subset, _ in IMAGES.values()],
+            }
+        ).to_csv(self.labels, index=False)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def _destination(self, img_name):
+        _, subset, clase = IMAGES[img_name]
+        return os.path.join(self.output, subset, clase, img_name)
+
+    def test_plan_links(self):
+        cars_df = pd.read_csv(self.labels)
+        plan = prepare_train_test_dataset.plan_links(
+            cars_df, self.data_folder, self.output
+        )
+        for img_name, row in zip(IMAGES, plan.itertuples()):
+            self.assertEqual(
+                row.src, os.path.join(self.data_folder, img_name)
+            )
+            self.assertEqual(row.dst, self._destination(img_name))
+            self.assertEqual(row.dst_dir, os.path.dirname(row.dst))
+
+    def test_link_and_skip_existing(self):
+        counts = prepare_train_test_dataset.main(
+            self.data_folder, self.labels, self.output, workers=2
+        )
+        self.assertEqual(
+            counts, {"total": 4, "existing": 0, "linked": 4, "copied": 0}
+        )
+        for img_name in IMAGES:
+            self.assertTrue(
+                os.path.samefile(
+                    self._destination(img_name),
+                    os.path.join(self.data_folder, img_name),
+                )
+            )
+
+        # Images already in the output folder are skipped
+        os.remove(self._destination("000003.jpg"))
+        existing = prepare_train_test_dataset.existing_files(
+            prepare_train_test_dataset.class_folders(
+                pd.read_csv(self.labels), self.output, create=False
+            )
+        )
+        expected = {"000001.jpg", "000002.jpg", "000004.jpg"}
+        self.assertEqual(
+            existing, {self._destination(name) for name in expected}
+        )
+        counts = prepare_train_test_dataset.main(
+            self.data_folder, self.labels, self.output, workers=2
+        )
+        self.assertEqual(
+            counts, {"total": 4, "existing": 3, "linked": 1, "copied": 0}
+        )
+
+    def test_dry_run(self):
+        os.makedirs(os.path.dirname(self._destination("000002.jpg")))
+        shutil.copy(
+            os.path.join(self.data_folder, "000002.jpg"),
+            self._destination("000002.jpg"),
+        )
+        counts = prepare_train_test_dataset.main(
+            self.data_folder, self.labels, self.output, dry_run=True
+        )
+        cars_df = pd.read_csv(self.labels)
+        plan = prepare_train_test_dataset.plan_links(
+            cars_df, self.data_folder, self.output
+        )
+        self.assertEqual(counts["total"], len(plan))
+        self.assertEqual(counts["existing"], 1)
+        self.assertEqual((counts["linked"], counts["copied"]), (0, 0))
+        # Nothing is created
+        self.assertEqual(os.listdir(self.output), ["test"])
+        for img_name in ("000001.jpg", "000003.jpg", "000004.jpg"):
+            self.assertFalse(os.path.exists(self._destination(img_name)))
+
+    def test_copy_across_devices(self):
+        cross_device = OSError(errno.EXDEV, os.strerror(errno.EXDEV))
+        for copy_file_range in (True, False):
+            output = os.path.join(self.tmp_dir.name, str(copy_file_range))
+            with contextlib.ExitStack() as stack:
+                stack.enter_context(
+                    mock.patch("os.link", side_effect=cross_device)
+                )
+                if not copy_file_range:
+                    # Fall back on `shutil.copyfile()`
+                    stack.enter_context(
+                        mock.patch(
+                            "os.copy_file_range",
+                            side_effect=OSError(errno.ENOSYS, "no"),
+                            create=True,
+                        )
+                    )
+                copy = stack.enter_context(
+                    mock.patch("shutil.copyfile", wraps=shutil.copyfile)
+                )
+                counts = prepare_train_test_dataset.main(
+                    self.data_folder, self.labels, output, workers=2
+                )
+            self.assertEqual((counts["linked"], counts["copied"]), (0, 4))
+            if not copy_file_range:
+                self.assertEqual(copy.call_count, 4)
+            for img_name, (fname, subset, clase) in IMAGES.items():
+                path = os.path.join(output, subset, clase, img_name)
+                self.assertFalse(
+                    os.path.samefile(
+                        path, os.path.join(self.data_folder, img_name)
+                    )
+                )
+                with open(path, "rb") as f:
+                    copied = f.read()
+                with open(os.path.join(TEST_DATA, fname), "rb") as f:
+                    self.assertEqual(copied, f.read())
+
+        # Other link errors are raised
+        with mock.patch("os.link", side_effect=OSError(errno.EIO, "I/O")):
+            with self.assertRaises(OSError):
+                prepare_train_test_dataset.main(
+                    self.data_folder,
+                    self.labels,
+                    os.path.join(self.tmp_dir.name, "error"),
+                )
+
+
+if __name__ == "__main__":
+    unittest.main()
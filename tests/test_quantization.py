@@ -0,0 +1,99 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+import yaml
+
+from scripts import quantize_model
+from scripts.export_model import export_saved_model, export_tflite
+from tests.helpers import TEST_DATA, create_test_model, make_class_folders
+from utils.quantization import representative_dataset
+
+
+class TestQuantization(unittest.TestCase):
+    def test_representative_dataset(self):
+        generator = representative_dataset(
+            TEST_DATA, (32, 48), num_images=3, seed=1
+        )
+        samples = list(generator())
+        self.assertEqual(len(samples), 3)
+        for (images,) in samples:
+            self.assertEqual(images.shape, (1, 32, 48, 3))
+            self.assertLessEqual(float(np.max(images)), 255.0)
+        # Same seed, same images
+        again = [images for (images,) in generator()]
+        for (images,), same in zip(samples, again):
+            np.testing.assert_array_equal(images, same)
+
+        # Never more images than the folder has
+        generator = representative_dataset(TEST_DATA, (32, 48), 100)
+        self.assertEqual(len(list(generator())), 4)
+
+
+class TestQuantizeModel(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        tmp = self.tmp_dir.name
+        # Used for calibration and evaluation
+        self.data = os.path.join(tmp, "data")
+        make_class_folders(self.data)
+        self.config_file = os.path.join(tmp, "config.yml")
+        with open(self.config_file, "w") as f:
+            yaml.safe_dump(
+                {
+                    "seed": 123,
+                    "data": {"directory": self.data, "image_size": [8, 8]},
+                },
+                f,
+            )
+        self.output_folder = os.path.join(tmp, "export")
+        self.int8_path = os.path.join(self.output_folder, "model_int8.tflite")
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def export_test_model(self, weights, output_folder):
+        # Stands in for `export_model.main()`, which needs a ResNet50
+        saved_model_path = os.path.join(output_folder, "saved_model")
+        tflite_path = os.path.join(output_folder, "model.tflite")
+        export_saved_model(create_test_model(), saved_model_path)
+        export_tflite(saved_model_path, tflite_path)
+        return [saved_model_path, tflite_path]
+
+    def quantize(self, max_accuracy_drop):
+        with mock.patch.object(
+            quantize_model.export_model, "main", self.export_test_model
+        ):
+            return quantize_model.main(
+                self.config_file,
+                None,
+                self.output_folder,
+                self.data,
+                max_accuracy_drop=max_accuracy_drop,
+                calibration_images=4,
+            )
+
+    def test_accuracy_drop_allowed(self):
+        report = self.quantize(max_accuracy_drop=1.0)
+        self.assertTrue(os.path.exists(self.int8_path))
+        self.assertFalse(os.path.exists(f"{self.int8_path}.tmp"))
+        self.assertEqual(set(report), {"float32", "int8"})
+        self.assertEqual(
+            report["int8"]["size"], os.path.getsize(self.int8_path)
+        )
+
+    def test_accuracy_drop_too_large(self):
+        # Any accuracy difference, even none, is more than -1
+        with self.assertRaisesRegex(ValueError, "not saved"):
+            self.quantize(max_accuracy_drop=-1.0)
+        self.assertFalse(os.path.exists(self.int8_path))
+        self.assertFalse(os.path.exists(f"{self.int8_path}.tmp"))
+        self.assertTrue(
+            os.path.exists(os.path.join(self.output_folder, "model.tflite"))
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
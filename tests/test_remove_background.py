@@ -0,0 +1,96 @@
+import json
+import os
+import tempfile
+import unittest
+
+import pandas as pd
+
+from scripts import remove_background
+from tests.helpers import StandInDetector, make_class_folders
+from utils.datasets import load_boxes
+from utils.detection import set_detector
+
+
+class TestRemoveBackground(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.data_folder = os.path.join(self.tmp_dir.name, "car_ims_v1")
+        self.output_folder = os.path.join(self.tmp_dir.name, "car_ims_v2")
+        make_class_folders(self.data_folder)
+        self.corrupt = os.path.join("class_b", "corrupt.jpg")
+        with open(os.path.join(self.data_folder, self.corrupt), "wb") as f:
+            f.write(b"not an image")
+
+    def tearDown(self):
+        set_detector(None)
+        self.tmp_dir.cleanup()
+
+    def _run(self, output, **kwargs):
+        # Returns the number of images sent to the detector
+        detector = StandInDetector()
+        set_detector(detector)
+        remove_background.main(
+            self.data_folder, output, workers=2, batch_size=2, **kwargs
+        )
+        return len(detector.calls)
+
+    def _manifest(self):
+        path = os.path.join(self.output_folder, remove_background.MANIFEST)
+        with open(path) as f:
+            return [json.loads(line) for line in f]
+
+    def test_resume(self):
+        # The corrupt image is skipped, the others are cropped
+        self.assertEqual(self._run(self.output_folder), 5)
+        for class_name, count in (("class_a", 3), ("class_b", 2)):
+            for i in range(count):
+                fname = os.path.join(
+                    self.output_folder, class_name, f"{class_name}_{i}.jpg"
+                )
+                self.assertTrue(os.path.exists(fname))
+        self.assertFalse(
+            os.path.exists(os.path.join(self.output_folder, self.corrupt))
+        )
+        failed = [entry for entry in self._manifest() if "error" in entry]
+        self.assertEqual([entry["path"] for entry in failed], [self.corrupt])
+
+        # Nothing changed, neither the cropped nor the corrupt images are
+        # processed again
+        self.assertEqual(self._run(self.output_folder), 0)
+
+        # Only the modified image is processed again
+        modified = os.path.join(self.data_folder, "class_a", "class_a_0.jpg")
+        with open(modified, "ab") as f:
+            f.write(b"\0")
+        self.assertEqual(self._run(self.output_folder), 1)
+        self.assertEqual(self._manifest()[-1]["path"], "class_a/class_a_0.jpg")
+
+        # A cropped image deleted from the output folder is written again
+        os.remove(os.path.join(self.output_folder, "class_b", "class_b_1.jpg"))
+        self.assertEqual(self._run(self.output_folder), 1)
+
+    def test_index_only(self):
+        index = os.path.join(self.tmp_dir.name, "boxes.csv")
+        self.assertEqual(self._run(index, index_only=True), 5)
+        self.assertFalse(os.path.exists(self.output_folder))
+
+        index_df = pd.read_csv(index)
+        self.assertEqual(
+            list(index_df.columns), remove_background.INDEX_COLUMNS
+        )
+        self.assertEqual(len(index_df), 6)
+        failed = index_df[index_df["x1"].isna()]
+        self.assertEqual(failed["path"].tolist(), [self.corrupt])
+
+        # Images that failed to decode have no box
+        boxes = load_boxes(index)
+        self.assertEqual(len(boxes), 5)
+        self.assertNotIn("corrupt.jpg", boxes)
+        for box in boxes.values():
+            self.assertEqual(len(box), 4)
+
+        self.assertEqual(self._run(index, index_only=True), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
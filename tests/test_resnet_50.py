@@ -1,8 +1,15 @@
 import unittest
 
+import numpy as np
 from tensorflow import keras
 
-from models.resnet_50 import create_model
+from models import resnet_50
+from models.resnet_50 import (
+    create_backbone,
+    create_inference_model,
+    create_model,
+    split_model,
+)
 
 
 class TestResnet50(unittest.TestCase):
@@ -131,6 +138,74 @@ class TestResnet50(unittest.TestCase):
             msg="Incorrect RandomRotation parameters",
         )
 
+    def test_split_model(self):
+        # Random weights, so the test runs without downloading imagenet
+        model = create_model(
+            weights=None, input_shape=(32, 32, 3), dropout_rate=0.5, classes=3
+        )
+        backbone, head = split_model(model)
+        self.assertEqual(backbone.output_shape, (None, 2048))
+        self.assertEqual(head.output_shape, (None, 3))
+        # Head shares the trainable layers of the full model
+        self.assertEqual(len(head.trainable_weights), 2)
+        self.assertIs(head.layers[-1], model.layers[-1])
+
+        images = np.random.rand(2, 32, 32, 3).astype(np.float32) * 255
+        np.testing.assert_allclose(
+            head(backbone(images)), model(images), rtol=1e-5
+        )
+
+    def test_create_model_dtype_policy(self):
+        model = create_model(
+            weights=None,
+            input_shape=(32, 32, 3),
+            classes=3,
+            dtype_policy="mixed_bfloat16",
+        )
+        # Policy is only used while building the model
+        self.assertEqual(keras.mixed_precision.global_policy().name, "float32")
+        resnet50 = model.get_layer("resnet50")
+        self.assertEqual(resnet50.layers[2].compute_dtype, "bfloat16")
+        # Softmax output stays in float32
+        self.assertEqual(model.layers[-1].compute_dtype, "float32")
+        self.assertEqual(model.output.dtype, "float32")
+
+    def test_create_inference_model(self):
+        model = create_model(
+            weights=None,
+            input_shape=(32, 32, 3),
+            dropout_rate=0.5,
+            data_aug_layer={"random_flip": {"mode": "horizontal"}},
+            classes=3,
+        )
+        inference_model = create_inference_model(model)
+        layer_types = [type(layer) for layer in inference_model.layers]
+        self.assertNotIn(keras.layers.Dropout, layer_types)
+        self.assertNotIn(keras.Sequential, layer_types)
+        self.assertEqual(inference_model.output_shape, (None, 3))
+
+        images = np.random.rand(2, 32, 32, 3).astype(np.float32) * 255
+        np.testing.assert_allclose(
+            inference_model(images, training=True),
+            model(images, training=False),
+            rtol=1e-5,
+        )
+
+        with self.assertRaises(ValueError):
+            create_inference_model(keras.Sequential([keras.layers.Dense(2)]))
+
+    def test_create_backbone_cache(self):
+        weights = create_backbone(None, (32, 32, 3)).get_weights()
+        # Stands in for weights loaded from the ImageNet weights file
+        resnet_50._BACKBONE_WEIGHTS[(32, 32, 3)] = weights
+        try:
+            backbone = create_backbone("imagenet", (32, 32, 3))
+            for cached, loaded in zip(weights, backbone.get_weights()):
+                np.testing.assert_array_equal(cached, loaded)
+        finally:
+            resnet_50.clear_backbone_cache()
+        self.assertEqual(resnet_50._BACKBONE_WEIGHTS, {})
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,83 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from scripts.export_model import export_saved_model, export_tflite
+from tests.helpers import create_test_model
+from utils.quantization import quantize_int8
+from utils.runtime import (
+    KerasRuntime,
+    SavedModelRuntime,
+    TFLiteRuntime,
+    load_runtime,
+    measure_latency,
+)
+
+
+class TestKerasRuntime(unittest.TestCase):
+    def test_predict_on_batch(self):
+        model = create_test_model()
+        images = np.random.rand(4, 8, 8, 3).astype(np.float32)
+        expected = model.predict_on_batch(images)
+
+        for jit_compile in (False, True):
+            runtime = KerasRuntime(model, jit_compile=jit_compile)
+            probs = runtime.predict_on_batch(images)
+            self.assertIsInstance(probs, np.ndarray)
+            self.assertEqual(probs.dtype, np.float32)
+            np.testing.assert_allclose(probs, expected, rtol=1e-5)
+            # uint8 batches, e.g. from a tensor store, are converted
+            probs = runtime.predict_on_batch((images * 255).astype(np.uint8))
+            self.assertEqual(probs.shape, (4, 2))
+
+
+class TestExportedRuntimes(unittest.TestCase):
+    def test_predict_on_batch(self):
+        model = create_test_model()
+        images = np.random.rand(4, 8, 8, 3).astype(np.float32)
+        expected = model.predict_on_batch(images)
+
+        with tempfile.TemporaryDirectory() as tmp:
+            saved_model_path = os.path.join(tmp, "saved_model")
+            tflite_path = os.path.join(tmp, "model.tflite")
+            export_saved_model(model, saved_model_path)
+            export_tflite(saved_model_path, tflite_path)
+
+            for path, runtime_class in (
+                (saved_model_path, SavedModelRuntime),
+                (tflite_path, TFLiteRuntime),
+            ):
+                runtime = load_runtime(path)
+                self.assertIsInstance(runtime, runtime_class)
+                probs = runtime.predict_on_batch(images)
+                np.testing.assert_allclose(probs, expected, atol=1e-5)
+                # Any batch size is accepted
+                probs = runtime.predict_on_batch(images[:1])
+                np.testing.assert_allclose(probs, expected[:1], atol=1e-5)
+
+    def test_quantized_tflite(self):
+        model = create_test_model()
+        images = np.random.rand(8, 8, 8, 3).astype(np.float32) * 255
+        expected = model.predict_on_batch(images)
+
+        def representative_data():
+            for image in images:
+                yield [image[np.newaxis]]
+
+        with tempfile.TemporaryDirectory() as tmp:
+            saved_model_path = os.path.join(tmp, "saved_model")
+            int8_path = os.path.join(tmp, "model_int8.tflite")
+            export_saved_model(model, saved_model_path)
+            quantize_int8(saved_model_path, representative_data, int8_path)
+
+            runtime = TFLiteRuntime(int8_path)
+            self.assertEqual(runtime._input["dtype"], np.uint8)
+            # Float images are quantized and outputs come back as float32
+            probs = runtime.predict_on_batch(images)
+            self.assertEqual(probs.dtype, np.float32)
+            np.testing.assert_allclose(probs, expected, atol=0.05)
+
+            latencies = measure_latency(runtime, images[:1], steps=3)
+            self.assertEqual(latencies.shape, (3,))
@@ -0,0 +1,135 @@
+import asyncio
+import unittest
+
+import numpy as np
+from tensorflow import keras
+
+from tests.helpers import QuarterCarDetector, StandInModel
+from utils.detection import set_detector
+from utils.serving import ClassificationService, MicroBatcher, load_image
+
+
+class TestMicroBatcher(unittest.TestCase):
+    def test_batches(self):
+        batch_sizes = []
+
+        def predict_fn(items):
+            batch_sizes.append(len(items))
+            return [item * 2 for item in items]
+
+        async def run():
+            batcher = MicroBatcher(
+                predict_fn, max_batch_size=4, max_wait_ms=50
+            )
+            results = await asyncio.gather(
+                *(batcher.predict(i) for i in range(10))
+            )
+            await batcher.close()
+            return results
+
+        results = asyncio.run(run())
+        self.assertEqual(results, [i * 2 for i in range(10)])
+        self.assertEqual(sum(batch_sizes), 10)
+        self.assertLessEqual(max(batch_sizes), 4)
+        self.assertLess(len(batch_sizes), 10)
+
+    def test_errors(self):
+        def predict_fn(items):
+            raise ValueError("Broken model")
+
+        async def run():
+            batcher = MicroBatcher(predict_fn)
+            try:
+                await batcher.predict(1)
+            except ValueError as exp:
+                return str(exp)
+            finally:
+                await batcher.close()
+
+        self.assertEqual(asyncio.run(run()), "Broken model")
+
+
+class TestLoadImage(unittest.TestCase):
+    def test_same_as_keras(self):
+        path = "tests/test_data/cat.jpeg"
+        with open(path, "rb") as f:
+            img = load_image(f.read(), (32, 48))
+        expected = keras.utils.img_to_array(
+            keras.utils.load_img(path, target_size=(32, 48))
+        )
+        self.assertEqual(img.dtype, np.uint8)
+        np.testing.assert_array_equal(img, expected)
+
+
+class TestClassificationService(unittest.TestCase):
+    def test_classify(self):
+        with open("tests/test_data/cat.jpeg", "rb") as f:
+            image_bytes = f.read()
+        model = StandInModel()
+
+        async def run():
+            service = ClassificationService(
+                model, ["dark", "bright"], (32, 32), max_wait_ms=50
+            )
+            results = await asyncio.gather(
+                *(service.classify(image_bytes) for _ in range(3))
+            )
+            await service.close()
+            return results
+
+        results = asyncio.run(run())
+        self.assertEqual(len(results), 3)
+        self.assertIn(results[0]["class_name"], ["dark", "bright"])
+        self.assertEqual(sum(model.batch_sizes), 3)
+
+    def test_classify_crop(self):
+        with open("tests/test_data/cat.jpeg", "rb") as f:
+            image_bytes = f.read()
+        model = StandInModel()
+
+        async def run():
+            service = ClassificationService(
+                model, ["dark", "bright"], (32, 32), crop=True, max_wait_ms=50
+            )
+            results = await asyncio.gather(
+                *(service.classify(image_bytes) for _ in range(3))
+            )
+            await service.close()
+            return results
+
+        set_detector(QuarterCarDetector())
+        try:
+            results = asyncio.run(run())
+        finally:
+            set_detector(None)
+        self.assertEqual(len(results), 3)
+        self.assertEqual(results[0]["box"], [0, 0, 300, 200])
+        self.assertEqual(sum(model.batch_sizes), 3)
+
+    def test_classify_crop_invalid_image(self):
+        with open("tests/test_data/cat.jpeg", "rb") as f:
+            image_bytes = f.read()
+        model = StandInModel()
+
+        async def run():
+            service = ClassificationService(
+                model, ["dark", "bright"], (32, 32), crop=True, max_wait_ms=50
+            )
+            results = await asyncio.gather(
+                service.classify(image_bytes),
+                service.classify(b"not an image"),
+                service.classify(image_bytes),
+                return_exceptions=True,
+            )
+            await service.close()
+            return results
+
+        set_detector(QuarterCarDetector())
+        try:
+            results = asyncio.run(run())
+        finally:
+            set_detector(None)
+        self.assertIsInstance(results[1], OSError)
+        self.assertEqual(results[0]["box"], [0, 0, 300, 200])
+        self.assertEqual(results[2]["box"], [0, 0, 300, 200])
+        self.assertEqual(sum(model.batch_sizes), 2)
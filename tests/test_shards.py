@@ -0,0 +1,124 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+import tensorflow as tf
+
+from tests.helpers import make_class_folders
+from utils import datasets, shards
+
+
+class TestShards(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.directory = os.path.join(self.tmp_dir.name, "train")
+        self.class_names = make_class_folders(self.directory)
+        self.output = os.path.join(self.tmp_dir.name, "shards")
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_export_and_read(self):
+        file_paths, labels = datasets.index_directory(
+            self.directory, self.class_names, shuffle=True, seed=123
+        )
+        splits = {
+            subset: datasets.split_subset(file_paths, labels, 0.4, subset)
+            for subset in ("training", "validation")
+        }
+        index = shards.export_shards(
+            self.output,
+            splits,
+            self.class_names,
+            (32, 48),
+            shard_size=2,
+            seed=123,
+            validation_split=0.4,
+        )
+        self.assertEqual(index["splits"]["training"]["count"], 3)
+        self.assertEqual(len(index["splits"]["training"]["files"]), 2)
+
+        ds = shards.image_dataset_from_shards(
+            self.output,
+            label_mode="categorical",
+            class_names=self.class_names,
+            image_size=(32, 48),
+            batch_size=2,
+            shuffle=False,
+            seed=123,
+            validation_split=0.4,
+            subset="training",
+        )
+        images, labels = zip(*ds.as_numpy_iterator())
+        images = np.concatenate(images)
+        labels = np.concatenate(labels)
+
+        train_paths, train_labels = splits["training"]
+        np.testing.assert_array_equal(labels.argmax(axis=1), train_labels)
+        # Stored images are the rounded output of the JPEG loader
+        for image, path in zip(images, train_paths):
+            expected = datasets.decode_image(
+                path, tf.constant([-1, -1, -1, -1]), (32, 48)
+            )
+            np.testing.assert_allclose(image, expected, atol=0.5)
+
+        # Shards made with a different split can't be used
+        with self.assertRaises(ValueError):
+            shards.image_dataset_from_shards(
+                self.output,
+                class_names=self.class_names,
+                image_size=(32, 48),
+                seed=1,
+                validation_split=0.4,
+                subset="training",
+            )
+        with self.assertRaises(ValueError):
+            shards.image_dataset_from_shards(self.output, subset="test")
+
+    def test_worker_parts(self):
+        file_paths, labels = datasets.index_directory(
+            self.directory, self.class_names, shuffle=False
+        )
+        shards.export_shards(
+            self.output,
+            {"training": (file_paths, labels)},
+            self.class_names,
+            (32, 48),
+            shard_size=2,
+        )
+        kwargs = dict(class_names=self.class_names, batch_size=8)
+        counts = []
+        for i in range(3):
+            ds = shards.image_dataset_from_shards(
+                self.output, num_workers=3, worker_index=i, **kwargs
+            )
+            self.assertEqual(ds.samples_count, 5)
+            counts.append(sum(len(images) for images, _ in ds))
+        # One shard file per worker
+        self.assertEqual(counts, [2, 2, 1])
+
+        with self.assertRaises(ValueError):
+            shards.image_dataset_from_shards(
+                self.output, num_workers=4, worker_index=0, **kwargs
+            )
+
+    def test_shard_writer(self):
+        images = np.random.randint(0, 256, (5, 4, 6, 3), dtype=np.uint8)
+        prefix = os.path.join(self.tmp_dir.name, "training")
+        with shards.ShardWriter(prefix, shard_size=2) as writer:
+            for label, image in enumerate(images):
+                writer.write(image, label)
+        self.assertEqual(writer.count, 5)
+        self.assertEqual(
+            writer.shard_files,
+            [f"training-{i:05d}.tfrecord" for i in range(3)],
+        )
+
+        records = tf.data.TFRecordDataset(
+            [os.path.join(self.tmp_dir.name, f) for f in writer.shard_files]
+        )
+        for label, serialized in enumerate(records):
+            image, parsed_label = shards.parse_example(serialized, (4, 6))
+            np.testing.assert_array_equal(image, images[label])
+            self.assertEqual(int(parsed_label), label)
@@ -0,0 +1,141 @@
+import os
+import tempfile
+import unittest
+
+import pandas as pd
+import yaml
+
+from scripts import sweep
+from tests.helpers import TEST_DATA, make_class_folders
+from utils import utils
+
+
+class TestSweep(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.sweep = {
+            "search": "grid",
+            "parameters": {
+                "compile.optimizer": [
+                    {"adam": {"learning_rate": 0.001}},
+                    {"sgd": {"learning_rate": 0.01}},
+                ],
+                "model.dropout_rate": [0.2, 0.5],
+            },
+        }
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def _write(self, name, content):
+        path = os.path.join(self.tmp_dir.name, name)
+        with open(path, "w") as f:
+            yaml.safe_dump(content, f)
+        return path
+
+    def test_trial_parameters(self):
+        trials = sweep.trial_parameters(self.sweep)
+        self.assertEqual(len(trials), 4)
+        self.assertIn(
+            {
+                "compile.optimizer": {"sgd": {"learning_rate": 0.01}},
+                "model.dropout_rate": 0.5,
+            },
+            trials,
+        )
+
+        self.sweep.update(search="random", trials=5, seed=1)
+        self.sweep["parameters"]["model.dropout_rate"] = {
+            "uniform": [0.1, 0.3]
+        }
+        trials = sweep.trial_parameters(self.sweep)
+        self.assertEqual(len(trials), 5)
+        for params in trials:
+            self.assertTrue(0.1 <= params["model.dropout_rate"] <= 0.3)
+        # Same seed, same trials
+        self.assertEqual(trials, sweep.trial_parameters(self.sweep))
+
+    def test_load_sweep(self):
+        self.assertEqual(
+            sweep.load_sweep(self._write("sweep.yml", self.sweep)), self.sweep
+        )
+
+        self.sweep["parameters"]["fit.epochs"] = [1, 2]
+        with self.assertRaises(ValueError):
+            sweep.load_sweep(self._write("sweep.yml", self.sweep))
+
+        del self.sweep["parameters"]["fit.epochs"]
+        self.sweep["parameters"]["model.dropout_rate"] = {"uniform": [0, 1]}
+        with self.assertRaises(ValueError):
+            sweep.load_sweep(self._write("sweep.yml", self.sweep))
+
+    def test_trial_config(self):
+        config = utils.load_config(os.path.join(TEST_DATA, "config_test.yml"))
+        params = {"model.dropout_rate": 0.3}
+        trial = sweep.trial_config(config, params, "/sweep/trial_001")
+        self.assertEqual(trial["model"]["dropout_rate"], 0.3)
+        callbacks = trial["fit"]["callbacks"]
+        self.assertEqual(
+            callbacks["model_checkpoint"]["filepath"], "/sweep/trial_001/model"
+        )
+        self.assertEqual(
+            callbacks["tensor_board"]["log_dir"], "/sweep/trial_001/logs"
+        )
+        # Base config unchanged
+        self.assertNotIn("dropout_rate", config["model"])
+        self.assertEqual(
+            config["fit"]["callbacks"]["model_checkpoint"]["filepath"],
+            "/bla/model",
+        )
+
+    def test_main(self):
+        data = os.path.join(self.tmp_dir.name, "data")
+        images = ["005652.jpg", "008773.jpg", "012310.jpg"]
+        make_class_folders(data, {"a": images, "b": images})
+        config = {
+            "seed": 123,
+            "data": {
+                "directory": data,
+                "label_mode": "categorical",
+                "validation_split": 0.5,
+                "image_size": [32, 32],
+                "batch_size": 2,
+            },
+            "model": {
+                "weights": None,
+                "input_shape": [32, 32, 3],
+                "classes": 2,
+            },
+            "compile": {
+                "loss": "categorical_crossentropy",
+                "metrics": ["accuracy"],
+            },
+            "fit": {"epochs": 2, "verbose": 0},
+        }
+        self.sweep["parameters"]["model.dropout_rate"] = [0.2]
+        output_folder = os.path.join(self.tmp_dir.name, "sweep")
+        results = sweep.main(
+            self._write("config.yml", config),
+            self._write("sweep.yml", self.sweep),
+            output_folder,
+        )
+
+        self.assertEqual(len(results), 2)
+        self.assertEqual(list(results["epochs"]), [2, 2])
+        self.assertEqual(
+            len(pd.read_csv(os.path.join(output_folder, "results.csv"))), 2
+        )
+        trial = utils.load_config(
+            os.path.join(output_folder, "trial_001", "config.yml")
+        )
+        self.assertEqual(
+            trial["compile"]["optimizer"], {"sgd": {"learning_rate": 0.01}}
+        )
+        # Decoded images cached on disk for the next trials
+        self.assertTrue(
+            os.listdir(os.path.join(output_folder, "data_cache"))
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,90 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+from tensorflow import keras
+
+from tests.helpers import create_test_model, make_class_folders
+from utils import datasets
+from utils.tensor_store import TensorStore, image_sequence_from_store
+from utils.utils import predict_from_folder
+
+
+class TestTensorStore(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.directory = os.path.join(self.tmp_dir.name, "train")
+        self.class_names = make_class_folders(self.directory)
+        self.path = os.path.join(self.tmp_dir.name, "store")
+        self.store = TensorStore.build(
+            self.directory, self.path, self.class_names, (32, 32)
+        )
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_build(self):
+        store = TensorStore(self.path)
+        self.assertIsInstance(store.images, np.memmap)
+        self.assertEqual(store.images.shape, (5, 32, 32, 3))
+        self.assertEqual(store.images.dtype, np.uint8)
+        self.assertEqual(store.labels.tolist(), [0, 0, 0, 1, 1])
+
+        batches = list(store.batches(batch_size=2))
+        self.assertEqual([len(b) for b in batches], [2, 2, 1])
+        # Batches are views on the memory-mapped array
+        self.assertTrue(np.shares_memory(batches[1], store.images))
+
+    def test_same_split_as_keras(self):
+        for subset in ("training", "validation"):
+            keras_ds = keras.utils.image_dataset_from_directory(
+                self.directory,
+                class_names=self.class_names,
+                image_size=(32, 32),
+                seed=123,
+                validation_split=0.4,
+                subset=subset,
+            )
+            sequence = image_sequence_from_store(
+                self.path,
+                label_mode="categorical",
+                class_names=self.class_names,
+                image_size=[32, 32],
+                batch_size=2,
+                seed=123,
+                validation_split=0.4,
+                subset=subset,
+            )
+            self.assertEqual(sequence.file_paths, keras_ds.file_paths)
+
+        images, labels = sequence[0]
+        self.assertEqual(images.dtype, np.uint8)
+        self.assertEqual(labels.shape, (2, 2))
+
+        with self.assertRaises(ValueError):
+            image_sequence_from_store(self.path, image_size=(64, 64))
+
+    def test_fit_and_predict(self):
+        model = create_test_model((32, 32))
+        model.compile(optimizer="sgd", loss="categorical_crossentropy")
+        sequence = image_sequence_from_store(
+            self.path, label_mode="categorical", batch_size=2, seed=1
+        )
+        history = model.fit(sequence, epochs=2, verbose=0)
+        self.assertEqual(len(history.history["loss"]), 2)
+
+        # Same predictions as images decoded by the training loader
+        predictions, labels = predict_from_folder(
+            self.path, model, (32, 32), self.class_names, batch_size=2
+        )
+        ds = datasets.image_dataset_from_directory(
+            self.directory,
+            class_names=self.class_names,
+            image_size=(32, 32),
+            shuffle=False,
+        )
+        images = np.concatenate([images for images, _ in ds])
+        expected = np.argmax(model.predict(np.round(images), verbose=0), 1)
+        self.assertEqual(predictions, [self.class_names[i] for i in expected])
+        self.assertEqual(labels, ["class_a"] * 3 + ["class_b"] * 2)
@@ -1,6 +1,12 @@
+import os
+import tempfile
 import unittest
 
-from utils.utils import load_config
+import numpy as np
+from tensorflow import keras
+
+from tests.helpers import create_test_model, make_class_folders
+from utils.utils import load_config, predict_from_folder, validate_config
 
 
 class TestUtils(unittest.TestCase):
@@ -44,3 +50,83 @@ class TestUtils(unittest.TestCase):
         loaded_config = load_config("tests/test_data/config_test.yml")
 
         self.assertDictEqual(loaded_config, config)
+
+    def test_predict_from_folder(self):
+        with tempfile.TemporaryDirectory() as folder:
+            make_class_folders(
+                folder,
+                {
+                    "class_a": ["005652.jpg", "008773.jpg", "cat.jpeg"],
+                    "class_b": ["012310.jpg"],
+                },
+            )
+
+            model = create_test_model((32, 32))
+            class_names = ["class_a", "class_b"]
+
+            # Expected outputs running images one by one
+            expected_preds = []
+            expected_labels = []
+            for dirpath, _, files in os.walk(folder):
+                for filename in files:
+                    img = keras.utils.load_img(
+                        os.path.join(dirpath, filename), target_size=(32, 32)
+                    )
+                    img = keras.utils.img_to_array(img)[np.newaxis]
+                    pred = np.argmax(model.predict(img, verbose=0))
+                    expected_preds.append(class_names[pred])
+                    expected_labels.append(os.path.basename(dirpath))
+
+            predictions, labels = predict_from_folder(
+                folder, model, (32, 32), class_names, batch_size=3
+            )
+            self.assertEqual(predictions, expected_preds)
+            self.assertEqual(labels, expected_labels)
+
+    def test_validate_distribute(self):
+        config = {"seed": 123, "data": {"directory": "/bla/data"}}
+        config["distribute"] = {
+            "strategy": "multi_worker_mirrored",
+            "communication": "ring",
+            "scale_learning_rate": True,
+        }
+        validate_config(config)
+
+        for distribute in (
+            {},
+            {"strategy": "mirrored"},
+            {"strategy": "default", "workers": 2},
+            {"strategy": "default", "communication": "grpc"},
+            {"strategy": "default", "scale_learning_rate": "yes"},
+            ["multi_worker_mirrored"],
+        ):
+            config["distribute"] = distribute
+            with self.assertRaises(ValueError):
+                validate_config(config)
+
+    def test_validate_pipeline(self):
+        config = {"seed": 123, "data": {"directory": "/bla/data"}}
+        config["data"]["pipeline"] = {
+            "cache": "/bla/cache",
+            "shuffle_buffer": 1024,
+            "num_parallel_calls": "autotune",
+            "deterministic": False,
+            "prefetch": 2,
+            "private_threadpool_size": 8,
+            "augment": True,
+        }
+        validate_config(config)
+
+        for pipeline in (
+            {"cache_dir": "/bla/cache"},
+            {"cache": 1},
+            {"prefetch": "auto"},
+            {"num_parallel_calls": 0},
+            {"shuffle_buffer": True},
+            {"deterministic": "no"},
+            {"augment": "yes"},
+            ["cache"],
+        ):
+            config["data"]["pipeline"] = pipeline
+            with self.assertRaises(ValueError):
+                validate_config(config)
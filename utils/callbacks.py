@@ -0,0 +1,202 @@
+import time
+import warnings
+
+import numpy as np
+import tensorflow as tf
+from tensorflow import keras
+
+
+class InputStallLogger(keras.callbacks.Callback):
+    """
+    Measures, for each epoch, how long training waited for the input
+    pipeline to produce the next batch.
+
+    Keras fetches batches inside the compiled train step, so the wait
+    can't be timed from the callback hooks alone. Instead, `wrap()` tags
+    each batch with the moment it leaves the pipeline, and the stall of
+    a step is the time between the step start and the arrival of its
+    batch. If the pipeline keeps up, batches are already waiting when
+    the step starts and the stall is close to zero.
+
+    The measure is approximate: batches and steps are paired by their
+    position in the epoch. It needs `steps_per_execution=1`, otherwise one
+    step start is logged for many batches, and it is only a rough figure
+    when batches are prefetched onto the devices, as distributed training
+    does, because they leave the pipeline ahead of their step.
+
+    The total, in seconds, is printed and added to the epoch logs as
+    `input_stall`, so `TensorBoard` and `ModelCheckpoint` callbacks placed
+    after this one can use it too.
+
+    Usage:
+        stall_logger = InputStallLogger()
+        model.fit(
+            stall_logger.wrap(train_ds),
+            callbacks=[stall_logger, ...],
+        )
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._step_starts = []
+        self._arrivals = []
+
+    def wrap(self, dataset):
+        """
+        Returns `dataset` with each batch tagged when it's consumed, must be
+        the dataset passed to `fit()`.
+        """
+
+        def record_arrival():
+            self._arrivals.append(time.perf_counter())
+            return True
+
+        def tag(*batch):
+            arrived = tf.numpy_function(record_arrival, [], tf.bool)
+            with tf.control_dependencies([arrived]):
+                return tf.nest.map_structure(tf.identity, batch)
+
+        return dataset.map(tag)
+
+    def on_train_begin(self, logs=None):
+        steps_per_execution = getattr(self.model, "_steps_per_execution", None)
+        if steps_per_execution is not None and steps_per_execution > 1:
+            raise ValueError(
+                "InputStallLogger pairs each batch with a train step, it "
+                "needs `steps_per_execution=1`"
+            )
+        # Also true for multi worker strategies, replicas of every worker
+        # are counted
+        if self.model.distribute_strategy.num_replicas_in_sync > 1:
+            warnings.warn(
+                "Batches are prefetched onto the devices by the distribution "
+                "strategy, the input stall measured is only approximate"
+            )
+
+    def on_epoch_begin(self, epoch, logs=None):
+        self._step_starts = []
+        self._arrivals = []
+
+    def on_train_batch_begin(self, batch, logs=None):
+        self._step_starts.append(time.perf_counter())
+
+    def on_epoch_end(self, epoch, logs=None):
+        stall = sum(
+            max(0.0, arrived - started)
+            for started, arrived in zip(self._step_starts, self._arrivals)
+        )
+        print(f"\nEpoch {epoch + 1}: input pipeline stall {stall:.2f}s")
+        if logs is not None:
+            logs["input_stall"] = stall
+
+
+class FullModelCheckpoint(keras.callbacks.ModelCheckpoint):
+    """
+    `keras.callbacks.ModelCheckpoint` saving `full_model` while `fit()` runs
+    on a smaller model sharing its layers, e.g. the head trained on cached
+    features, see `resnet_50.split_model()`. Checkpoints can be loaded with
+    `resnet_50.create_model(weights=path)` like any other.
+
+    Parameters
+    ----------
+    full_model : keras.Model
+        Model saved on each checkpoint.
+
+    *args, **kwargs
+        Same as `keras.callbacks.ModelCheckpoint`.
+    """
+
+    def __init__(self, full_model, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.full_model = full_model
+
+    def set_model(self, model):
+        super().set_model(self.full_model)
+
+
+class MedianStopping(keras.callbacks.Callback):
+    """
+    Stops training when the best `monitor` value so far is worse than the
+    median of the best values reached by previous runs at the same epoch,
+    the median stopping rule used by hyperparameter searches. Runs which
+    trained fewer epochs count with their best value overall.
+
+    Parameters
+    ----------
+    previous : list
+        One list per previous run, with its `monitor` value of each epoch,
+        e.g. `history.history["val_accuracy"]`. Runs appended while this
+        callback is in use are taken into account too.
+
+    monitor : str
+        Metric to compare, from the epoch logs.
+
+    mode : str
+        One of "max" or "min", whether higher or lower values are better.
+
+    grace_epochs : int
+        Epochs always trained before stopping.
+
+    min_runs : int
+        Number of previous runs needed to stop.
+
+    Attributes
+    ----------
+    best : float
+        Best `monitor` value of the current run, None before its first
+        epoch.
+
+    stopped_epoch : int
+        Epoch in which training was stopped, None if it wasn't.
+    """
+
+    def __init__(
+        self,
+        previous,
+        monitor="val_accuracy",
+        mode="max",
+        grace_epochs=1,
+        min_runs=3,
+    ):
+        super().__init__()
+        if mode not in ("max", "min"):
+            raise ValueError(f'`mode` must be "max" or "min", got {mode}')
+        self.previous = previous
+        self.monitor = monitor
+        self.mode = mode
+        self.grace_epochs = grace_epochs
+        self.min_runs = min_runs
+        self.stopped_epoch = None
+        self.best = None
+
+    def on_train_begin(self, logs=None):
+        self.stopped_epoch = None
+        self.best = None
+
+    def on_epoch_end(self, epoch, logs=None):
+        value = (logs or {}).get(self.monitor)
+        if value is None:
+            return
+        if self.best is None:
+            self.best = value
+        self.best = self._pick(self.best, value)
+        runs = [values for values in self.previous if values]
+        if epoch + 1 < self.grace_epochs or len(runs) < self.min_runs:
+            return
+
+        median = np.median(
+            [self._pick(*values[: epoch + 1]) for values in runs]
+        )
+        worse = self.best < median
+        if self.mode == "min":
+            worse = self.best > median
+        if worse:
+            print(
+                f"\nEpoch {epoch + 1}: best {self.monitor} {self.best:.4f} "
+                f"worse than the median {median:.4f}, stopping"
+            )
+            self.stopped_epoch = epoch
+            self.model.stop_training = True
+
+    def _pick(self, *values):
+        return max(values) if self.mode == "max" else min(values)
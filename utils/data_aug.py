@@ -58,3 +58,48 @@ def create_data_aug_layer(data_aug_layer):
     data_augmentation = keras.Sequential(layers=data_aug_layers)
 
     return data_augmentation
+
+
+def augment_dataset(
+    dataset, data_aug_layer, num_parallel_calls="autotune", deterministic=None
+):
+    """
+    Applies the data augmentation layers configured with `data_aug_layer`
+    as a parallel stage of a `tf.data` pipeline, instead of inside the
+    model. Batches are augmented on the CPU while the model runs the
+    previous step, and the trained model has no augmentation layers.
+
+    Parameters
+    ----------
+    dataset : tf.data.Dataset
+        Dataset yielding batches of (images, labels).
+
+    data_aug_layer : dict
+        Data augmentation settings coming from the experiment YAML config
+        file, see `create_data_aug_layer()`.
+
+    num_parallel_calls : int
+        Batches augmented in parallel, an integer or "autotune".
+
+    deterministic : bool
+        Whether batches must keep their order, see `tf.data.Dataset.map()`.
+
+    Returns
+    -------
+    dataset : tf.data.Dataset
+        Dataset yielding augmented batches of (images, labels).
+    """
+    data_augmentation = create_data_aug_layer(data_aug_layer)
+    if num_parallel_calls == "autotune":
+        num_parallel_calls = tf.data.AUTOTUNE
+
+    def augment(images, labels):
+        return data_augmentation(images, training=True), labels
+
+    dataset = dataset.map(
+        augment,
+        num_parallel_calls=num_parallel_calls,
+        deterministic=deterministic,
+    )
+
+    return dataset.prefetch(tf.data.AUTOTUNE)
@@ -0,0 +1,391 @@
+import os
+
+import numpy as np
+import pandas as pd
+import tensorflow as tf
+
+# Same image formats accepted by keras.utils.image_dataset_from_directory()
+IMAGE_FORMATS = (".bmp", ".gif", ".jpeg", ".jpg", ".png")
+
+
+def load_boxes(boxes_file):
+    """
+    Loads the CSV index with the vehicle box for each image, written by
+    `scripts/remove_background.py --index-only`.
+
+    Parameters
+    ----------
+    boxes_file : str
+        Full path to the CSV boxes index. It must have at least the columns
+        `img_name`, `x1`, `y1`, `x2` and `y2`.
+
+    Returns
+    -------
+    boxes : dict
+        Maps each image file name to its box as [x1, y1, x2, y2].
+    """
+    boxes_df = pd.read_csv(boxes_file)
+    # When an image was processed more than once, the last box is kept
+    boxes_df = boxes_df.drop_duplicates("img_name", keep="last")
+    # Images that failed to decode are in the index without a box
+    boxes_df = boxes_df.dropna(subset=["x1", "y1", "x2", "y2"])
+    coords = boxes_df[["x1", "y1", "x2", "y2"]].to_numpy(dtype=np.int32)
+
+    return dict(zip(boxes_df["img_name"], coords.tolist()))
+
+
+def index_directory(directory, class_names, shuffle=True, seed=None):
+    """
+    Lists the images inside each class subfolder of `directory`, in the
+    same order `keras.utils.image_dataset_from_directory()` does, so both
+    loaders make the same training/validation split for a given seed.
+
+    Parameters
+    ----------
+    directory : str
+        Full path to the dataset split, having one subfolder per class.
+
+    class_names : list
+        List of classes as string, sets the label index of each class.
+
+    shuffle : bool
+        Shuffle the file list, otherwise files are sorted by class and name.
+
+    seed : int
+        Random seed for shuffling.
+
+    Returns
+    -------
+    file_paths, labels : tuple
+        List of image paths and numpy.ndarray with their label index.
+    """
+    file_paths = []
+    labels = []
+    for label, class_name in enumerate(class_names):
+        class_dir = os.path.join(directory, class_name)
+        for root, _, files in sorted(os.walk(class_dir), key=lambda x: x[0]):
+            for fname in sorted(files):
+                if fname.lower().endswith(IMAGE_FORMATS):
+                    file_paths.append(os.path.join(root, fname))
+                    labels.append(label)
+    labels = np.array(labels, dtype=np.int32)
+
+    if shuffle:
+        if seed is None:
+            seed = np.random.randint(1e6)
+        rng = np.random.RandomState(seed)
+        rng.shuffle(file_paths)
+        rng = np.random.RandomState(seed)
+        rng.shuffle(labels)
+
+    return file_paths, labels
+
+
+def split_subset(file_paths, labels, validation_split=None, subset=None):
+    """
+    Keeps the `subset` ("training" or "validation") of the data, the last
+    `validation_split` fraction of the samples is used for validation.
+    """
+    if not validation_split:
+        return file_paths, labels
+
+    num_val_samples = int(validation_split * len(file_paths))
+    if subset == "training":
+        return file_paths[:-num_val_samples], labels[:-num_val_samples]
+    if subset == "validation":
+        return file_paths[-num_val_samples:], labels[-num_val_samples:]
+
+    raise ValueError(
+        '`subset` must be either "training" or "validation", '
+        f"received: {subset}"
+    )
+
+
+def encode_labels(labels, label_mode, num_classes):
+    """
+    Converts integer labels to the format given by `label_mode`, same
+    options as `keras.utils.image_dataset_from_directory()`.
+    """
+    if label_mode == "int":
+        return labels
+    if label_mode == "categorical":
+        return tf.one_hot(labels, num_classes)
+    if label_mode == "binary":
+        return tf.expand_dims(tf.cast(labels, tf.float32), axis=-1)
+
+    raise ValueError(
+        '`label_mode` must be one of "int", "categorical" or "binary", '
+        f"received: {label_mode}"
+    )
+
+
+def decode_image(path, box, image_size, interpolation="bilinear"):
+    """
+    Reads an image, crops the vehicle box and resizes it. JPEG files are
+    decoded with `tf.io.decode_and_crop_jpeg()`, so only the pixels inside
+    the box are decoded.
+
+    Parameters
+    ----------
+    path : tf.Tensor
+        Image file path.
+
+    box : tf.Tensor
+        Box as [x1, y1, x2, y2], or [-1, -1, -1, -1] to keep the full image.
+        Boxes having no width or no height also keep the full image.
+
+    image_size : tuple
+        Output size as (height, width).
+
+    interpolation : str
+        Interpolation method used for resizing.
+
+    Returns
+    -------
+    image : tf.Tensor
+        float32 image with shape (height, width, 3).
+    """
+    contents = tf.io.read_file(path)
+    x1, y1, x2, y2 = box[0], box[1], box[2], box[3]
+    # Empty boxes keep the full image, as `remove_background.crop_box()`
+    has_box = tf.logical_and(x2 > x1, y2 > y1)
+
+    def decode_jpeg():
+        crop_window = tf.stack([y1, x1, y2 - y1, x2 - x1])
+        return tf.cond(
+            has_box,
+            lambda: tf.io.decode_and_crop_jpeg(
+                contents, crop_window, channels=3
+            ),
+            lambda: tf.io.decode_jpeg(contents, channels=3),
+        )
+
+    def decode_other():
+        image = tf.io.decode_image(
+            contents, channels=3, expand_animations=False
+        )
+        return tf.cond(has_box, lambda: image[y1:y2, x1:x2], lambda: image)
+
+    image = tf.cond(tf.io.is_jpeg(contents), decode_jpeg, decode_other)
+    image = tf.image.resize(image, image_size, method=interpolation)
+    image.set_shape((image_size[0], image_size[1], 3))
+
+    return image
+
+
+def image_dataset_from_directory(
+    directory,
+    boxes=None,
+    label_mode="int",
+    class_names=None,
+    image_size=(256, 256),
+    batch_size=32,
+    shuffle=True,
+    seed=None,
+    validation_split=None,
+    subset=None,
+    interpolation="bilinear",
+    pipeline=None,
+    num_workers=1,
+    worker_index=0,
+):
+    """
+    Drop-in replacement of `keras.utils.image_dataset_from_directory()`
+    able to crop each image with the vehicle box found by the detector,
+    while decoding it. It allows training with the background removed
+    directly from `car_ims_v1`, without storing a second copy of the
+    dataset.
+
+    Parameters
+    ----------
+    directory : str
+        Full path to the dataset split, having one subfolder per class.
+
+    boxes : str
+        Full path to the CSV boxes index, see `load_boxes()`. Images not in
+        the index are used in full. If None, no crop is applied.
+
+    label_mode : str
+        One of "int", "categorical" or "binary".
+
+    class_names : list
+        List of classes as string, sets the label index of each class.
+        By default the sorted list of subfolders is used.
+
+    image_size : tuple
+        Size to resize images to, as (height, width).
+
+    batch_size : int
+        Size of the batches of data.
+
+    shuffle : bool
+        Whether to shuffle the data.
+
+    seed : int
+        Random seed for shuffling and for the validation split.
+
+    validation_split : float
+        Fraction of data to reserve for validation.
+
+    subset : str
+        One of "training" or "validation", only used with
+        `validation_split`.
+
+    interpolation : str
+        Interpolation method used for resizing.
+
+    pipeline : dict
+        Input pipeline settings, the `data.pipeline` section of the
+        experiment config, see `apply_pipeline()`.
+
+    num_workers, worker_index : int
+        With many training workers, each one only loads its part of the
+        subset, one image out of `num_workers` starting at
+        `worker_index`. Images are split after shuffling, with the same
+        seed every worker gets a different part.
+
+    Returns
+    -------
+    dataset : tf.data.Dataset
+        Dataset yielding batches of (images, labels). Its `samples_count`
+        is the number of images of the whole subset, for all the workers.
+    """
+    pipeline = pipeline or {}
+    if class_names is None:
+        class_names = sorted(
+            name
+            for name in os.listdir(directory)
+            if os.path.isdir(os.path.join(directory, name))
+        )
+    if seed is None:
+        seed = np.random.randint(1e6)
+
+    file_paths, labels = index_directory(
+        directory, class_names, shuffle, seed
+    )
+    file_paths, labels = split_subset(
+        file_paths, labels, validation_split, subset
+    )
+    if not file_paths:
+        raise ValueError(f"No images found in directory {directory}.")
+    samples_count = len(file_paths)
+    file_paths = file_paths[worker_index::num_workers]
+    labels = labels[worker_index::num_workers]
+
+    box_index = load_boxes(boxes) if boxes else {}
+    crop_boxes = np.array(
+        [
+            box_index.get(os.path.basename(path), [-1, -1, -1, -1])
+            for path in file_paths
+        ],
+        dtype=np.int32,
+    )
+
+    images_ds = tf.data.Dataset.from_tensor_slices((file_paths, crop_boxes))
+    images_ds = images_ds.map(
+        lambda path, box: decode_image(
+            path, box, image_size, interpolation
+        ),
+        num_parallel_calls=_autotune(
+            pipeline.get("num_parallel_calls", "autotune")
+        ),
+        deterministic=pipeline.get("deterministic"),
+    )
+    labels_ds = tf.data.Dataset.from_tensor_slices(
+        encode_labels(labels, label_mode, len(class_names))
+    )
+    dataset = tf.data.Dataset.zip((images_ds, labels_ds))
+    # Workers caching on the same disk don't share their cache files
+    cache_name = subset
+    if num_workers > 1:
+        cache_name = f"{subset or 'data'}_{worker_index}"
+    dataset = apply_pipeline(
+        dataset, pipeline, batch_size, shuffle, seed, name=cache_name
+    )
+
+    dataset.class_names = class_names
+    dataset.file_paths = file_paths
+    dataset.samples_count = samples_count
+
+    return dataset
+
+
+def apply_pipeline(
+    dataset, pipeline, batch_size, shuffle=True, seed=None, name=None
+):
+    """
+    Caches, shuffles, batches and prefetches a dataset of decoded samples
+    following the `data.pipeline` section of the experiment config.
+
+    Parameters
+    ----------
+    dataset : tf.data.Dataset
+        Dataset yielding one decoded (image, label) at a time.
+
+    pipeline : dict
+        Input pipeline settings, all of them are optional:
+            - cache: true keeps the decoded samples in memory after the
+              first epoch, a directory path stores them on disk instead.
+              Disk caches are not invalidated, remove the folder when the
+              dataset or the image size changes.
+            - shuffle_buffer: number of samples in the shuffle buffer,
+              `batch_size * 8` by default.
+            - num_parallel_calls: images decoded in parallel, an integer
+              or "autotune" (default).
+            - deterministic: false lets parallel stages return samples out
+              of order, so a slow image doesn't block the others.
+            - prefetch: number of batches prepared while the model runs,
+              an integer or "autotune" (default).
+            - private_threadpool_size: number of threads of a pool used
+              only by this dataset, 0 (default) uses the shared pool.
+            - augment: true runs `data_aug_layer` in the pipeline instead
+              of inside the model, applied by `scripts/train.py` with
+              `utils.data_aug.augment_dataset()`.
+
+    batch_size : int
+        Size of the batches of data.
+
+    shuffle : bool
+        Whether to shuffle the data.
+
+    seed : int
+        Random seed for shuffling.
+
+    name : str
+        Used to name the cache file inside the cache directory, so the
+        training and validation subsets don't share it.
+
+    Returns
+    -------
+    dataset : tf.data.Dataset
+        Dataset yielding batches of (images, labels).
+    """
+    cache = pipeline.get("cache", False)
+    if isinstance(cache, str):
+        os.makedirs(cache, exist_ok=True)
+        dataset = dataset.cache(os.path.join(cache, name or "data"))
+    elif cache:
+        dataset = dataset.cache()
+
+    if shuffle:
+        dataset = dataset.shuffle(
+            buffer_size=pipeline.get("shuffle_buffer", batch_size * 8),
+            seed=seed,
+        )
+    dataset = dataset.batch(batch_size)
+    dataset = dataset.prefetch(_autotune(pipeline.get("prefetch", "autotune")))
+
+    options = tf.data.Options()
+    if "deterministic" in pipeline:
+        options.deterministic = pipeline["deterministic"]
+    if pipeline.get("private_threadpool_size"):
+        options.threading.private_threadpool_size = pipeline[
+            "private_threadpool_size"
+        ]
+
+    return dataset.with_options(options)
+
+
+def _autotune(value):
+    return tf.data.AUTOTUNE if value == "autotune" else value
+
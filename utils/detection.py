@@ -1,41 +1,115 @@
-from detectron2 import model_zoo
-from detectron2.config import get_cfg
-from detectron2.engine.defaults import DefaultPredictor
+import functools
+
+import numpy as np
 
 # The chosen detector model is "COCO-Detection/faster_rcnn_R_101_FPN_3x.yaml"
 # because this particular model has a good balance between accuracy and speed.
 # You can check the following Colab notebook with examples on how to run
 # Detectron2 models
 # https://colab.research.google.com/drive/16jcaJoc6bCFAQ96jDe2HwtXj7BMD_-m5.
-# Assign the loaded detection model to global variable DET_MODEL
-
-#create a detectron2 config and a detectron2 DefaultPredictor to run inference on this images
-cfg = get_cfg()
-cfg.merge_from_file(
-    model_zoo.get_config_file("COCO-Detection/faster_rcnn_R_101_FPN_3x.yaml")
-)
-cfg.MODEL.ROI_HEADS.SCORE_THRESH_TEST = 0.5
-cfg.MODEL.WEIGHTS = model_zoo.get_checkpoint_url(
-    "COCO-Detection/faster_rcnn_R_101_FPN_3x.yaml"
-)
-try:
-    # It may fail if no GPU was found
-    DET_MODEL = DefaultPredictor(cfg)
-except:
-    # Load the model for CPU only
-    print(
-        f"Failed to load Detection model on GPU, "
-        "trying with CPU. Message: {exp}."
-    )
-    cfg.MODEL.DEVICE='cpu'
-    DET_MODEL = DefaultPredictor(cfg)
+DETECTOR_CONFIG = "COCO-Detection/faster_rcnn_R_101_FPN_3x.yaml"
+
+# COCO class ids for 'car' and 'truck'
+VEHICLE_CLASSES = (2, 7)
+
+# Detector set with `set_detector()`, used instead of the one built by
+# `get_detector()` when present
+_DETECTOR_OVERRIDE = None
+
+
+def get_detector(
+    config_file=DETECTOR_CONFIG, score_thresh=0.5, device=None, weights=None
+):
+    """
+    Builds the detectron2 DefaultPredictor used to find vehicles.
+    The detector is created the first time it's requested and cached for
+    the rest of the process, so importing this module is cheap and the
+    model weights are loaded only once per configuration.
+
+    Parameters
+    ----------
+    config_file : str
+        Detectron2 model zoo config file name.
+
+    score_thresh : float
+        Minimum score for a detection to be kept.
+
+    device : str
+        Device to run the model on, e.g. "cpu" or "cuda". By default uses
+        the GPU when one is available.
+
+    weights : str
+        Path or URL to the model weights. By default uses the model zoo
+        checkpoint matching `config_file`.
+
+    Returns
+    -------
+    detector : detectron2.engine.defaults.DefaultPredictor
+        Loaded detection model.
+    """
+    # Defaults are resolved before the cache lookup, so the same detector
+    # requested with or without them is only built once. detectron2 (and
+    # torch) are imported here to keep this module import fast for
+    # processes that never run the detector
+    if device is None:
+        import torch
+
+        device = "cuda" if torch.cuda.is_available() else "cpu"
+    if weights is None:
+        from detectron2 import model_zoo
+
+        weights = model_zoo.get_checkpoint_url(config_file)
+
+    return _build_detector(config_file, float(score_thresh), device, weights)
+
 
+@functools.lru_cache(maxsize=None)
+def _build_detector(config_file, score_thresh, device, weights):
+    from detectron2 import model_zoo
+    from detectron2.config import get_cfg
+    from detectron2.engine.defaults import DefaultPredictor
 
-def get_vehicle_coordinates(img):
+    cfg = get_cfg()
+    cfg.merge_from_file(model_zoo.get_config_file(config_file))
+    cfg.MODEL.ROI_HEADS.SCORE_THRESH_TEST = score_thresh
+    cfg.MODEL.WEIGHTS = weights
+    cfg.MODEL.DEVICE = device
+
+    return DefaultPredictor(cfg)
+
+
+def set_detector(detector):
+    """
+    Replaces the detector used by this module, e.g. to inject a lightweight
+    stand-in model in tests. Pass None to go back to `get_detector()`.
+
+    Parameters
+    ----------
+    detector : callable
+        Object following the `DefaultPredictor` interface, called with an
+        image and returning a dict with an "instances" key.
     """
-    This function will run an object detector (loaded in DET_MODEL model
-    variable) over the image, get the vehicle position in the picture
-    and return it.
+    global _DETECTOR_OVERRIDE
+    _DETECTOR_OVERRIDE = detector
+
+
+def _get_default_detector():
+    if _DETECTOR_OVERRIDE is not None:
+        return _DETECTOR_OVERRIDE
+    return get_detector()
+
+
+def __getattr__(name):
+    # Keep `detection.DET_MODEL` working, now loaded on first access
+    if name == "DET_MODEL":
+        return _get_default_detector()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def get_vehicle_coordinates(img, detector=None, cache=None):
+    """
+    This function will run an object detector (see `get_detector()`) over
+    the image, get the vehicle position in the picture and return it.
 
     Many things should be taken into account to make it work:
         1. Current model being used can detect up to 80 different objects,
@@ -54,44 +128,230 @@ def get_vehicle_coordinates(img):
     img : numpy.ndarray
         Image in RGB format.
 
+    detector : callable
+        Detection model to use, by default the one from `get_detector()`.
+
+    cache : utils.detection_cache.DetectionCache
+        Optional cache of detector outputs. When the image was already
+        seen, boxes are taken from it without running the detector.
+
     Returns
     -------
     box_coordinates : list
         List having bounding box coordinates as [left, top, right, bottom].
         Also known as [x1, y1, x2, y2].
     """
-    # TODO
-    box_coordinates = None
-
-    outputs = DET_MODEL(img)
-    classes = outputs["instances"].pred_classes.cpu().numpy()
-    boxes = outputs["instances"].pred_boxes.tensor.cpu().numpy()
-
-    if len(classes) != 0 and len(boxes) !=0:
-        index = -1
-        box_area_list = []
-        coordinates_list = []
-        for class_num in classes:
-            index += 1
-            if class_num == 2 or class_num == 7:
-                #[left, top, right, bottom]
-                x1 = int(boxes[index][0])
-                y1 = int(boxes[index][1])
-                x2 = int(boxes[index][2])
-                y2 = int(boxes[index][3])
-                box_area_list.append(abs(x2-x1)* abs(y2-y1))
-                coordinates_list.append((x1,y1,x2,y2))
-                #select de bigger car/truck
-                max_area_index = box_area_list.index(max(box_area_list))
-                box_coordinates = coordinates_list[max_area_index]
-            else:
-                h = img.shape[0]
-                w = img.shape[1]
-                box_coordinates = [0,0,w,h]
-    else:
-        h = img.shape[0]
-        w = img.shape[1]
-        #coordinates that cover the full image, i.e. [0, 0, width, height]
-        box_coordinates = [0,0,w,h]
-
-    return box_coordinates
+    classes, boxes, _ = detect([img], detector=detector, cache=cache)[0]
+    box_coordinates = select_largest_vehicle(classes, boxes, img.shape)
+
+    return box_coordinates.tolist()
+
+
+def get_vehicle_coordinates_batch(
+    images, batch_size=8, detector=None, cache=None, keys=None
+):
+    """
+    Batched version of `get_vehicle_coordinates()`. Images are grouped in
+    chunks of `batch_size` and each chunk goes through the detector in a
+    single forward pass, images don't need to have the same size.
+
+    We reproduce here the pre-processing done by `DefaultPredictor` for a
+    single image (color format conversion and resizing), so the detections
+    are the same as running the images one by one.
+
+    Parameters
+    ----------
+    images : list
+        List of numpy.ndarray images in RGB format.
+
+    batch_size : int
+        Maximum number of images sent to the detector in one forward pass.
+
+    detector : callable
+        Detection model to use, by default the one from `get_detector()`.
+
+    cache : utils.detection_cache.DetectionCache
+        Optional cache of detector outputs, see `detect()`.
+
+    keys : list
+        Optional cache keys, one per image, see `detect()`.
+
+    Returns
+    -------
+    box_coordinates : list
+        One [x1, y1, x2, y2] list per input image, in the same order.
+    """
+    detections = detect(images, batch_size, detector, cache, keys)
+    if not detections:
+        return []
+
+    classes, boxes = _stack_detections(detections)
+    shapes = np.array([img.shape[:2] for img in images])
+
+    return select_largest_vehicle(classes, boxes, shapes).tolist()
+
+
+def detect(images, batch_size=8, detector=None, cache=None, keys=None):
+    """
+    Runs the detector over a list of images in batches and returns its raw
+    outputs as numpy arrays.
+
+    When a `cache` is given, images already in it are not sent to the
+    detector, and new detections are added to it.
+
+    Parameters
+    ----------
+    images : list
+        List of numpy.ndarray images in RGB format.
+
+    batch_size : int
+        Maximum number of images sent to the detector in one forward pass.
+
+    detector : callable
+        Detection model to use, by default the one from `get_detector()`.
+
+    cache : utils.detection_cache.DetectionCache
+        Optional cache of detector outputs.
+
+    keys : list
+        Cache key for each image, e.g. the hash of the image file from
+        `utils.detection_cache.file_digest()`. By default the hash of the
+        decoded image is used.
+
+    Returns
+    -------
+    detections : list
+        One (classes, boxes, scores) tuple of numpy arrays per image.
+    """
+    detections = [None] * len(images)
+    missing = list(range(len(images)))
+    if cache is not None:
+        if keys is None:
+            from utils.detection_cache import array_digest
+
+            keys = [array_digest(img) for img in images]
+        missing = []
+        for i, key in enumerate(keys):
+            detections[i] = cache.get(key)
+            if detections[i] is None:
+                missing.append(i)
+
+    if missing and detector is None:
+        detector = _get_default_detector()
+
+    for start in range(0, len(missing), batch_size):
+        chunk = missing[start : start + batch_size]
+        outputs = _predict_batch(detector, [images[i] for i in chunk])
+        for i, output in zip(chunk, outputs):
+            detections[i] = _to_numpy(output)
+            if cache is not None:
+                cache.put(keys[i], *detections[i])
+
+    return detections
+
+
+def select_largest_vehicle(classes, boxes, shape):
+    """
+    Vectorized selection of the car/truck box with the largest area, see
+    `get_vehicle_coordinates()` for the rules applied. The result doesn't
+    depend on the order of the detections.
+
+    Works for a single image or for a batch of stacked detector outputs,
+    padding entries must use a class id that is not a vehicle, e.g. -1.
+
+    Parameters
+    ----------
+    classes : numpy.ndarray
+        Detected class ids with shape (N,), or (B, N) for a batch.
+
+    boxes : numpy.ndarray
+        Detected boxes as [x1, y1, x2, y2] with shape (N, 4), or (B, N, 4)
+        for a batch.
+
+    shape : tuple or numpy.ndarray
+        Image shape starting with (height, width), or an array of shape
+        (B, 2) for a batch. Used to cover the full image when no vehicle
+        is found.
+
+    Returns
+    -------
+    box_coordinates : numpy.ndarray
+        Integer box as [x1, y1, x2, y2] with shape (4,), or (B, 4) for a
+        batch.
+    """
+    classes = np.asarray(classes)
+    boxes = np.asarray(boxes).reshape(classes.shape + (4,))
+    shape = np.asarray(shape)[..., :2]
+
+    # Same truncation as int() on each coordinate
+    coords = np.trunc(boxes).astype(np.int64)
+    areas = np.abs(coords[..., 2] - coords[..., 0]) * np.abs(
+        coords[..., 3] - coords[..., 1]
+    )
+    is_vehicle = np.isin(classes, VEHICLE_CLASSES)
+    # Non vehicles get an area below any real box so argmax skips them
+    areas = np.where(is_vehicle, areas, -1)
+
+    full_image = np.zeros(shape.shape[:-1] + (4,), dtype=np.int64)
+    full_image[..., 2] = shape[..., 1]
+    full_image[..., 3] = shape[..., 0]
+    if classes.shape[-1] == 0:
+        return full_image
+
+    best = np.expand_dims(areas.argmax(axis=-1), axis=(-1, -2))
+    largest = np.take_along_axis(coords, best, axis=-2)[..., 0, :]
+
+    return np.where(is_vehicle.any(axis=-1)[..., None], largest, full_image)
+
+
+def _to_numpy(outputs):
+    """
+    Extracts class ids, boxes and scores from detectron2 outputs as numpy
+    arrays.
+    """
+    instances = outputs["instances"]
+    classes = instances.pred_classes.cpu().numpy()
+    boxes = instances.pred_boxes.tensor.cpu().numpy()
+    scores = instances.scores.cpu().numpy()
+    return classes, boxes, scores
+
+
+def _stack_detections(detections):
+    """
+    Stacks per image (classes, boxes, scores) detections into padded
+    classes and boxes arrays of shape (B, N) and (B, N, 4), padding with
+    class id -1.
+    """
+    size = max([len(classes) for classes, _, _ in detections] + [0])
+    stacked_classes = np.full((len(detections), size), -1, dtype=np.int64)
+    stacked_boxes = np.zeros((len(detections), size, 4), dtype=np.float32)
+    for i, (classes, boxes, _) in enumerate(detections):
+        stacked_classes[i, : len(classes)] = classes
+        stacked_boxes[i, : len(boxes)] = boxes
+
+    return stacked_classes, stacked_boxes
+
+
+def _predict_batch(detector, images):
+    """
+    Runs the detector over a list of images in a single forward pass.
+    Same steps as `DefaultPredictor.__call__()` but for many images.
+    Stand-in detectors without the underlying `model` are called once per
+    image.
+    """
+    if not hasattr(detector, "model"):
+        return [detector(img) for img in images]
+
+    import torch
+
+    inputs = []
+    for img in images:
+        if detector.input_format == "RGB":
+            img = img[:, :, ::-1]
+        height, width = img.shape[:2]
+        image = detector.aug.get_transform(img).apply_image(img)
+        image = torch.as_tensor(image.astype("float32").transpose(2, 0, 1))
+        inputs.append({"image": image, "height": height, "width": width})
+
+    with torch.no_grad():
+        return detector.model(inputs)
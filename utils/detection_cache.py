@@ -0,0 +1,212 @@
+import glob
+import hashlib
+import json
+import os
+import uuid
+
+import numpy as np
+
+from utils.detection import DETECTOR_CONFIG
+
+# Entries kept in memory before being written to a new part on disk
+FLUSH_EVERY = 1024
+
+
+def file_digest(path):
+    """
+    Hash of the file content, used as cache key for images on disk.
+
+    Parameters
+    ----------
+    path : str
+        Full path to the file.
+
+    Returns
+    -------
+    digest : str
+        SHA1 hex digest of the file content.
+    """
+    sha1 = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            sha1.update(chunk)
+    return sha1.hexdigest()
+
+
+def array_digest(img):
+    """
+    Hash of a decoded image, used as cache key for images in memory.
+
+    Parameters
+    ----------
+    img : numpy.ndarray
+        Image array.
+
+    Returns
+    -------
+    digest : str
+        SHA1 hex digest of the image shape, dtype and pixels.
+    """
+    img = np.ascontiguousarray(img)
+    sha1 = hashlib.sha1(f"{img.shape}{img.dtype}".encode())
+    sha1.update(img.data)
+    return sha1.hexdigest()
+
+
+class DetectionCache:
+    """
+    On-disk cache of raw detector outputs (classes, boxes and scores),
+    keyed by image content hash. It allows getting vehicle boxes again, e.g.
+    with a different crop policy, without running the detector.
+
+    Entries are stored under a subfolder named after the detector settings,
+    so changing the model or the score threshold never returns stale
+    detections. Each subfolder has one or more parts, named after the
+    instance that wrote them, every part is a folder with one `.npy` file
+    per column, memory-mapped when loaded:
+        - keys.npy: image keys, usually content hashes, shape (N,).
+        - offsets.npy: first row of each image detections, shape (N + 1,).
+        - classes.npy: class ids, shape (M,).
+        - boxes.npy: boxes as [x1, y1, x2, y2], shape (M, 4).
+        - scores.npy: detection scores, shape (M,).
+
+    Parameters
+    ----------
+    directory : str
+        Full path to the cache folder.
+
+    config_file : str
+        Detectron2 model zoo config file name used by the detector.
+
+    score_thresh : float
+        Detector score threshold.
+
+    weights : str
+        Detector weights, None for the model zoo checkpoint.
+    """
+
+    def __init__(
+        self,
+        directory,
+        config_file=DETECTOR_CONFIG,
+        score_thresh=0.5,
+        weights=None,
+    ):
+        settings = {
+            "config_file": config_file,
+            "score_thresh": score_thresh,
+            "weights": weights,
+        }
+        settings_digest = hashlib.sha1(
+            json.dumps(settings, sort_keys=True).encode()
+        ).hexdigest()[:16]
+        self.directory = os.path.join(directory, settings_digest)
+        os.makedirs(self.directory, exist_ok=True)
+        with open(os.path.join(self.directory, "settings.json"), "w") as f:
+            json.dump(settings, f)
+
+        self.hits = 0
+        self.misses = 0
+        self._parts = []
+        self._index = {}
+        self._pending = {}
+        # Parts of this instance are named after the process and a random
+        # id, so many instances can write to the same folder
+        self._writer = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self._flushes = 0
+        for part_dir in sorted(glob.glob(f"{self.directory}/part-*[0-9]")):
+            self._load_part(part_dir)
+
+    def _load_part(self, part_dir):
+        columns = {
+            name: np.load(f"{part_dir}/{name}.npy", mmap_mode="r")
+            for name in ("offsets", "classes", "boxes", "scores")
+        }
+        part = len(self._parts)
+        self._parts.append(columns)
+        keys = np.load(f"{part_dir}/keys.npy")
+        for row, key in enumerate(keys):
+            self._index[key.decode()] = (part, row)
+
+    def __len__(self):
+        return len(self._index) + len(self._pending)
+
+    def __contains__(self, key):
+        return key in self._index or key in self._pending
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.flush()
+
+    def get(self, key):
+        """
+        Returns the cached (classes, boxes, scores) arrays for `key`, or
+        None if the image was never seen.
+        """
+        if key in self._pending:
+            self.hits += 1
+            return self._pending[key]
+        if key not in self._index:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        part, row = self._index[key]
+        columns = self._parts[part]
+        start, end = columns["offsets"][row : row + 2]
+        return (
+            columns["classes"][start:end],
+            columns["boxes"][start:end],
+            columns["scores"][start:end],
+        )
+
+    def put(self, key, classes, boxes, scores):
+        """
+        Adds the detector outputs for `key`, they are written to disk on
+        the next `flush()`.
+        """
+        self._pending[key] = (
+            np.asarray(classes, dtype=np.int16),
+            np.asarray(boxes, dtype=np.float32).reshape(-1, 4),
+            np.asarray(scores, dtype=np.float32),
+        )
+        if len(self._pending) >= FLUSH_EVERY:
+            self.flush()
+
+    def flush(self):
+        """
+        Writes pending entries as a new part on disk.
+        """
+        if not self._pending:
+            return
+
+        keys = list(self._pending)
+        entries = [self._pending[key] for key in keys]
+        sizes = [len(classes) for classes, _, _ in entries]
+        columns = {
+            # Sized from the longest key, keys are never truncated
+            "keys": np.array([key.encode() for key in keys]),
+            "offsets": np.concatenate([[0], np.cumsum(sizes)]).astype(
+                np.int64
+            ),
+            "classes": np.concatenate([e[0] for e in entries]),
+            "boxes": np.concatenate([e[1] for e in entries]),
+            "scores": np.concatenate([e[2] for e in entries]),
+        }
+
+        # Write to a temporary folder first, so an interrupted flush never
+        # leaves a broken part behind
+        part_dir = os.path.join(
+            self.directory, f"part-{self._writer}-{self._flushes:05d}"
+        )
+        tmp_dir = f"{part_dir}.tmp"
+        os.makedirs(tmp_dir)
+        for name, values in columns.items():
+            np.save(f"{tmp_dir}/{name}.npy", values)
+        os.rename(tmp_dir, part_dir)
+
+        self._flushes += 1
+        self._pending = {}
+        self._load_part(part_dir)
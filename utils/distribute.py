@@ -0,0 +1,114 @@
+import tensorflow as tf
+
+# Collective communication implementations, `distribute.communication` in
+# the experiment config
+COMMUNICATIONS = {
+    "auto": tf.distribute.experimental.CommunicationImplementation.AUTO,
+    "ring": tf.distribute.experimental.CommunicationImplementation.RING,
+    "nccl": tf.distribute.experimental.CommunicationImplementation.NCCL,
+}
+
+
+def create_strategy(distribute=None):
+    """
+    Creates the distribution strategy set in the `distribute` section of
+    the experiment config:
+        - "default": the default single device strategy.
+        - "multi_worker_mirrored": `tf.distribute.MultiWorkerMirroredStrategy`,
+          synchronous data parallel training over the workers listed in
+          the `TF_CONFIG` environment variable, see
+          `scripts/launch_workers.py`. Without `TF_CONFIG` it trains as a
+          single worker.
+
+    Multi-worker strategies must be created before any other TensorFlow op
+    runs.
+
+    Parameters
+    ----------
+    distribute : dict
+        Distribution settings, None for the default strategy.
+
+    Returns
+    -------
+    strategy : tf.distribute.Strategy
+        Strategy to build and train the model with.
+    """
+    distribute = distribute or {}
+    if distribute.get("strategy", "default") == "default":
+        return tf.distribute.get_strategy()
+
+    return tf.distribute.MultiWorkerMirroredStrategy(
+        communication_options=tf.distribute.experimental.CommunicationOptions(
+            implementation=COMMUNICATIONS[
+                distribute.get("communication", "auto")
+            ]
+        )
+    )
+
+
+def is_multi_worker(strategy):
+    """
+    Whether `strategy` trains over many workers, see `create_strategy()`.
+    """
+    return isinstance(strategy, tf.distribute.MultiWorkerMirroredStrategy)
+
+
+def worker_shard(strategy):
+    """
+    Number of workers in the cluster of `strategy` and index of this one,
+    to load each worker's part of the data. Chief tasks come first.
+
+    Returns
+    -------
+    num_workers, worker_index : tuple
+        (1, 0) for single worker strategies.
+    """
+    resolver = getattr(strategy, "cluster_resolver", None)
+    jobs = resolver.cluster_spec().as_dict() if resolver else {}
+    if not jobs:
+        return 1, 0
+
+    chiefs = len(jobs.get("chief", []))
+    worker_index = resolver.task_id
+    if resolver.task_type == "worker":
+        worker_index += chiefs
+
+    return chiefs + len(jobs.get("worker", [])), worker_index
+
+
+def distribute_dataset(strategy, dataset, samples_count, global_batch_size):
+    """
+    Hands this worker's part of a dataset to `strategy`. Each worker reads
+    its own part, made by the loaders with `num_workers` and
+    `worker_index`, and batched with the per replica batch size.
+
+    Worker parts don't always have the same size, while all the workers
+    must run the same number of steps. The dataset is repeated and an
+    epoch is made of the number of global batches in the whole subset.
+
+    Parameters
+    ----------
+    strategy : tf.distribute.Strategy
+        Strategy the model is trained with.
+
+    dataset : tf.data.Dataset
+        This worker's batches of (images, labels).
+
+    samples_count : int
+        Number of samples of the whole subset, for all the workers.
+
+    global_batch_size : int
+        Samples per step over all the replicas.
+
+    Returns
+    -------
+    dataset, steps : tuple
+        Distributed dataset and the number of steps in an epoch, to use as
+        `steps_per_epoch` or `validation_steps`.
+    """
+    steps = max(1, samples_count // global_batch_size)
+    dataset = strategy.distribute_datasets_from_function(
+        lambda input_context: dataset.repeat()
+    )
+
+    return dataset, steps
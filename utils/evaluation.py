@@ -0,0 +1,398 @@
+import json
+import multiprocessing
+import os
+
+import numpy as np
+
+from utils.utils import image_batches, list_images
+
+# Files used to store an evaluation result on disk
+PROBABILITIES_FILE = "probabilities.npy"
+INDEX_FILE = "index.json"
+
+
+class EvaluationResult:
+    """
+    Model outputs over a test folder, keeping the full probability vector
+    of each image, so metrics like top-k accuracy, confusion matrices or
+    calibration curves can be computed without running the model again.
+
+    Parameters
+    ----------
+    probabilities : numpy.ndarray
+        Model output scores with shape (N, classes). It may be a
+        numpy.memmap.
+
+    file_paths : list
+        Path of each image, in the same order as `probabilities` rows.
+
+    labels : numpy.ndarray
+        True label index of each image, -1 if its folder is not in
+        `class_names`. Those images are left out of every metric.
+
+    class_names : list
+        List of classes as string, in the model output order.
+    """
+
+    def __init__(self, probabilities, file_paths, labels, class_names):
+        self.probabilities = probabilities
+        self.file_paths = list(file_paths)
+        self.labels = np.asarray(labels, dtype=np.int64)
+        self.class_names = list(class_names)
+
+    @classmethod
+    def from_folder(
+        cls,
+        folder,
+        model,
+        input_size,
+        class_names,
+        batch_size=32,
+        dtype="float32",
+        path=None,
+    ):
+        """
+        Runs the model over all the images in `folder`, same data
+        structure and loading as `utils.predict_from_folder()`.
+
+        Parameters
+        ----------
+        folder : str
+            Path to the folder you want to process.
+
+        model : keras.Model
+            Loaded keras model.
+
+        input_size : tuple
+            Keras model input size.
+
+        class_names : list
+            List of classes as string.
+
+        batch_size : int
+            Number of images sent to the model at once.
+
+        dtype : str
+            Type used to store probabilities, "float32" or "float16".
+
+        path : str
+            If given, probabilities are written to a memory-mapped file
+            inside this folder while the model runs, see `save()`.
+
+        Returns
+        -------
+        result : EvaluationResult
+            Model outputs for every image in `folder`.
+        """
+        file_paths, labels = _list_labeled_images(folder, class_names)
+        probabilities = _allocate(
+            (len(file_paths), len(class_names)), dtype, path
+        )
+        _predict_into(
+            probabilities, model, file_paths, input_size, batch_size
+        )
+
+        return cls._finish(
+            probabilities, file_paths, labels, class_names, path
+        )
+
+    @classmethod
+    def from_folder_sharded(
+        cls,
+        folder,
+        weights,
+        input_size,
+        class_names,
+        workers=2,
+        batch_size=32,
+        threads_per_worker=None,
+        dtype="float32",
+        path=None,
+    ):
+        """
+        Same as `from_folder()` but splitting the images between `workers`
+        processes, each one loading its own copy of the model with
+        `resnet_50.create_model(weights=weights)`.
+
+        Each worker gets a contiguous chunk of the file list and results
+        are merged back in the original order, so the output is the same
+        for any number of workers.
+
+        Parameters
+        ----------
+        folder : str
+            Path to the folder you want to process.
+
+        weights : str
+            Full path to the trained model weights.
+
+        input_size : tuple
+            Keras model input size.
+
+        class_names : list
+            List of classes as string.
+
+        workers : int
+            Number of worker processes.
+
+        batch_size : int
+            Number of images sent to the model at once.
+
+        threads_per_worker : int
+            TensorFlow intra-op threads used by each worker. By default
+            the CPU cores are split evenly between workers.
+
+        dtype : str
+            Type used to store probabilities, "float32" or "float16".
+
+        path : str
+            If given, probabilities are written to a memory-mapped file
+            inside this folder, see `save()`.
+
+        Returns
+        -------
+        result : EvaluationResult
+            Model outputs for every image in `folder`.
+        """
+        file_paths, labels = _list_labeled_images(folder, class_names)
+        probabilities = _allocate(
+            (len(file_paths), len(class_names)), dtype, path
+        )
+        if threads_per_worker is None:
+            threads_per_worker = max(1, (os.cpu_count() or 1) // workers)
+
+        bounds = np.linspace(0, len(file_paths), workers + 1).astype(int)
+        shards = [
+            (
+                file_paths[start:end],
+                weights,
+                tuple(input_size),
+                batch_size,
+                threads_per_worker,
+            )
+            for start, end in zip(bounds[:-1], bounds[1:])
+        ]
+        # Use fresh processes, TensorFlow doesn't support being forked
+        context = multiprocessing.get_context("spawn")
+        with context.Pool(workers) as pool:
+            shard_probs = pool.starmap(_evaluate_shard, shards)
+        for start, end, probs in zip(bounds[:-1], bounds[1:], shard_probs):
+            probabilities[start:end] = probs
+
+        return cls._finish(
+            probabilities, file_paths, labels, class_names, path
+        )
+
+    @classmethod
+    def _finish(cls, probabilities, file_paths, labels, class_names, path):
+        result = cls(probabilities, file_paths, labels, class_names)
+        if path:
+            probabilities.flush()
+            result._save_index(path)
+
+        return result
+
+    @classmethod
+    def load(cls, path, mmap_mode="r"):
+        """
+        Loads a result stored with `save()`, probabilities are
+        memory-mapped by default.
+        """
+        with open(os.path.join(path, INDEX_FILE), "r") as f:
+            index = json.load(f)
+        probabilities = np.load(
+            os.path.join(path, PROBABILITIES_FILE), mmap_mode=mmap_mode
+        )
+
+        return cls(
+            probabilities,
+            index["file_paths"],
+            index["labels"],
+            index["class_names"],
+        )
+
+    def save(self, path):
+        """
+        Stores the result inside the folder `path`, probabilities go to a
+        .npy file that `load()` can memory-map.
+        """
+        os.makedirs(path, exist_ok=True)
+        np.save(os.path.join(path, PROBABILITIES_FILE), self.probabilities)
+        self._save_index(path)
+
+    def _save_index(self, path):
+        index = {
+            "file_paths": self.file_paths,
+            "labels": self.labels.tolist(),
+            "class_names": self.class_names,
+        }
+        with open(os.path.join(path, INDEX_FILE), "w") as f:
+            json.dump(index, f)
+
+    def __len__(self):
+        return len(self.file_paths)
+
+    @property
+    def predictions(self):
+        """
+        Predicted label index of each image.
+        """
+        return np.argmax(self.probabilities, axis=1)
+
+    @property
+    def confidences(self):
+        """
+        Score of the predicted class for each image.
+        """
+        return np.max(self.probabilities, axis=1).astype(np.float32)
+
+    def predicted_class_names(self):
+        """
+        Predicted class name of each image, same output as
+        `utils.predict_from_folder()`.
+        """
+        return [self.class_names[i] for i in self.predictions]
+
+    def top_k_accuracy(self, k=5):
+        """
+        Fraction of images having the true label among the `k` classes
+        with the highest score.
+        """
+        k = min(k, len(self.class_names))
+        known = self.labels >= 0
+        probabilities = np.asarray(self.probabilities)[known]
+        top_k = np.argpartition(-probabilities, k - 1, axis=1)[:, :k]
+        hits = np.any(top_k == self.labels[known, None], axis=1)
+        return float(np.mean(hits))
+
+    def accuracy(self):
+        """
+        Top-1 accuracy.
+        """
+        known = self.labels >= 0
+        return float(np.mean(self.predictions[known] == self.labels[known]))
+
+    def confusion_matrix(self):
+        """
+        Confusion matrix with true labels as rows and predicted labels as
+        columns.
+
+        Returns
+        -------
+        matrix : numpy.ndarray
+            Matrix of counts with shape (classes, classes).
+        """
+        num_classes = len(self.class_names)
+        known = self.labels >= 0
+        pairs = self.labels[known] * num_classes + self.predictions[known]
+        counts = np.bincount(pairs, minlength=num_classes * num_classes)
+
+        return counts.reshape(num_classes, num_classes)
+
+    def per_class_metrics(self):
+        """
+        Precision, recall and f1-score for each class.
+
+        Returns
+        -------
+        metrics : dict
+            Dict with "precision", "recall", "f1" and "support" arrays,
+            each one with shape (classes,).
+        """
+        matrix = self.confusion_matrix()
+        true_positives = np.diag(matrix).astype(np.float64)
+        predicted = matrix.sum(axis=0)
+        support = matrix.sum(axis=1)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            precision = np.nan_to_num(true_positives / predicted)
+            recall = np.nan_to_num(true_positives / support)
+            f1 = np.nan_to_num(2 * precision * recall / (precision + recall))
+
+        return {
+            "precision": precision,
+            "recall": recall,
+            "f1": f1,
+            "support": support,
+        }
+
+    def calibration_curve(self, bins=10):
+        """
+        Accuracy and mean confidence of the predictions grouped by
+        confidence, used to draw reliability diagrams.
+
+        Returns
+        -------
+        accuracy, confidence, counts : tuple
+            Arrays with shape (bins,), empty bins have zero accuracy and
+            confidence.
+        """
+        known = self.labels >= 0
+        confidences = self.confidences[known]
+        correct = self.predictions[known] == self.labels[known]
+        bin_ids = np.minimum((confidences * bins).astype(np.int64), bins - 1)
+        counts = np.bincount(bin_ids, minlength=bins)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            accuracy = np.nan_to_num(
+                np.bincount(bin_ids, weights=correct, minlength=bins) / counts
+            )
+            confidence = np.nan_to_num(
+                np.bincount(bin_ids, weights=confidences, minlength=bins)
+                / counts
+            )
+
+        return accuracy, confidence, counts
+
+
+def _list_labeled_images(folder, class_names):
+    file_paths, label_names = list_images(folder)
+    class_indices = {name: i for i, name in enumerate(class_names)}
+    labels = [class_indices.get(name, -1) for name in label_names]
+
+    return file_paths, labels
+
+
+def _allocate(shape, dtype, path=None):
+    # Probabilities matrix, memory-mapped to disk when a path is given
+    if not path:
+        return np.empty(shape, dtype=dtype)
+
+    os.makedirs(path, exist_ok=True)
+    return np.lib.format.open_memmap(
+        os.path.join(path, PROBABILITIES_FILE),
+        mode="w+",
+        dtype=dtype,
+        shape=shape,
+    )
+
+
+def _predict_into(probabilities, model, file_paths, input_size, batch_size):
+    # Fills `probabilities` rows with the model outputs, batch by batch
+    if not file_paths:
+        return
+
+    start = 0
+    for images in image_batches(file_paths, input_size, batch_size):
+        batch_probs = model.predict_on_batch(images)
+        probabilities[start : start + len(batch_probs)] = batch_probs
+        start += len(batch_probs)
+
+
+def _evaluate_shard(file_paths, weights, input_size, batch_size, threads):
+    """
+    Runs in a worker process of `EvaluationResult.from_folder_sharded()`.
+    """
+    import tensorflow as tf
+
+    # Must be set before TensorFlow runs any operation
+    tf.config.threading.set_intra_op_parallelism_threads(threads)
+    tf.config.threading.set_inter_op_parallelism_threads(1)
+
+    from models import resnet_50
+
+    model = resnet_50.create_model(weights=weights)
+    probabilities = np.empty(
+        (len(file_paths), model.output_shape[-1]), dtype=np.float32
+    )
+    _predict_into(probabilities, model, file_paths, input_size, batch_size)
+
+    return probabilities
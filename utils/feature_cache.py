@@ -0,0 +1,203 @@
+import hashlib
+import json
+import os
+
+import numpy as np
+from tensorflow import keras
+
+# Files of each cached dataset, inside the settings subfolder
+FEATURES_FILE = "{name}-features.npy"
+LABELS_FILE = "{name}-labels.npy"
+
+
+class FeatureCache:
+    """
+    On-disk cache of the pooled features the frozen backbone returns for
+    each image of a dataset, along with their labels. With the backbone
+    frozen, features are the same on every epoch, so they can be computed
+    once and the head trained on them, see `resnet_50.split_model()`.
+
+    Features are stored under a subfolder named after `settings`, e.g.
+    the data and model configuration, so changing them never returns
+    stale features. Each dataset is stored as two `.npy` files,
+    memory-mapped when loaded: the features, with shape
+    (views, N, features), and the labels.
+
+    Parameters
+    ----------
+    directory : str
+        Full path to the cache folder.
+
+    settings : dict
+        Everything the features depend on, must be JSON serializable.
+    """
+
+    def __init__(self, directory, settings):
+        settings_digest = hashlib.sha1(
+            json.dumps(settings, sort_keys=True).encode()
+        ).hexdigest()[:16]
+        self.directory = os.path.join(directory, settings_digest)
+        os.makedirs(self.directory, exist_ok=True)
+        with open(os.path.join(self.directory, "settings.json"), "w") as f:
+            json.dump(settings, f)
+
+    def _paths(self, name):
+        return (
+            os.path.join(self.directory, FEATURES_FILE.format(name=name)),
+            os.path.join(self.directory, LABELS_FILE.format(name=name)),
+        )
+
+    def __contains__(self, name):
+        return all(os.path.isfile(path) for path in self._paths(name))
+
+    def load(self, name, mmap_mode="r"):
+        """
+        Returns the cached (features, labels) arrays of the dataset `name`,
+        features are memory-mapped by default.
+        """
+        features_path, labels_path = self._paths(name)
+        return (
+            np.load(features_path, mmap_mode=mmap_mode),
+            np.load(labels_path),
+        )
+
+    def compute(
+        self, name, backbone, dataset, dtype="float32", views=1, augment=None
+    ):
+        """
+        Runs `backbone` over `dataset` and stores the features and labels
+        of all its samples as `name`.
+
+        With `views` > 1, each batch goes through `augment` `views` times
+        and the backbone runs once per augmented view, so the head can be
+        trained with augmentation, see `AugmentedFeatureSequence`.
+
+        Parameters
+        ----------
+        name : str
+            Dataset name, e.g. "training".
+
+        backbone : keras.Model
+            Model returning the pooled features of a batch of images.
+
+        dataset : iterable
+            Yields batches of (images, labels), e.g. a `tf.data.Dataset`.
+            It is read only once, so a shuffled dataset keeps features and
+            labels paired.
+
+        dtype : str
+            Type used to store features, "float32" or "float16".
+
+        views : int
+            Number of augmented views of each image.
+
+        augment : callable
+            Function applying random augmentations to a batch of images,
+            e.g. `lambda x: aug_layer(x, training=True)`. Required with
+            `views` > 1.
+
+        Returns
+        -------
+        features, labels : tuple
+            Stored arrays, features are memory-mapped with shape
+            (views, N, features).
+        """
+        if views > 1 and augment is None:
+            raise ValueError("`augment` is required to compute many views")
+
+        # Each view is appended to its own raw file while the dataset is
+        # read, as the number of samples is only known at the end
+        features_path, labels_path = self._paths(name)
+        view_paths = [f"{features_path}.view{k}.tmp" for k in range(views)]
+        view_files = [open(path, "wb") for path in view_paths]
+        labels = []
+        try:
+            for images, batch_labels in dataset:
+                for view_file in view_files:
+                    inputs = images if augment is None else augment(images)
+                    batch_features = backbone.predict_on_batch(inputs)
+                    view_file.write(
+                        np.asarray(batch_features, dtype=dtype).tobytes()
+                    )
+                labels.append(np.asarray(batch_labels))
+        finally:
+            for view_file in view_files:
+                view_file.close()
+
+        labels = np.concatenate(labels)
+        num_features = backbone.output_shape[-1]
+        # Written to temporary files first, an interrupted run never
+        # leaves a partial dataset in the cache
+        features = np.lib.format.open_memmap(
+            f"{features_path}.tmp",
+            mode="w+",
+            dtype=dtype,
+            shape=(views, len(labels), num_features),
+        )
+        for k, path in enumerate(view_paths):
+            features[k] = np.memmap(
+                path, dtype=dtype, mode="r", shape=features.shape[1:]
+            )
+            os.remove(path)
+        features.flush()
+        del features
+        with open(f"{labels_path}.tmp", "wb") as f:
+            np.save(f, labels)
+        os.replace(f"{labels_path}.tmp", labels_path)
+        os.replace(f"{features_path}.tmp", features_path)
+
+        return self.load(name)
+
+    def get_or_compute(self, name, backbone, dataset, **kwargs):
+        """
+        Same as `compute()`, unless `name` is already cached.
+        """
+        if name in self:
+            return self.load(name)
+
+        return self.compute(name, backbone, dataset, **kwargs)
+
+
+class AugmentedFeatureSequence(keras.utils.Sequence):
+    """
+    Feeds cached features with many augmented views to
+    `keras.Model.fit()`. On each epoch one view of every image is picked at
+    random and the samples are shuffled, so the head sees a different
+    augmentation of each image without running the backbone.
+
+    Parameters
+    ----------
+    features : numpy.ndarray
+        Cached features with shape (views, N, features).
+
+    labels : numpy.ndarray
+        Label of each sample.
+
+    batch_size : int
+        Size of the batches of data.
+
+    seed : int
+        Random seed for view sampling and shuffling.
+    """
+
+    def __init__(self, features, labels, batch_size=32, seed=None):
+        super().__init__()
+        self.features = features
+        self.labels = labels
+        self.batch_size = batch_size
+        self.rng = np.random.RandomState(seed)
+        self.on_epoch_end()
+
+    def __len__(self):
+        return -(-len(self.labels) // self.batch_size)
+
+    def __getitem__(self, idx):
+        start = idx * self.batch_size
+        rows = np.sort(self.order[start : start + self.batch_size])
+
+        return self.features[self.views[rows], rows], self.labels[rows]
+
+    def on_epoch_end(self):
+        num_views, num_samples = self.features.shape[:2]
+        self.order = self.rng.permutation(num_samples)
+        self.views = self.rng.randint(num_views, size=num_samples)
@@ -0,0 +1,186 @@
+import io
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from PIL import Image
+
+from utils import detection
+
+# Stages timed by `DetectClassifyPipeline`, in the order they run
+STAGES = ("decode", "detect", "crop", "classify")
+
+
+def decode_image_uint8(image_bytes):
+    """
+    Decodes an encoded image (JPEG, PNG, ...) as a uint8 RGB array, same
+    pixels as `keras.utils.load_img()`.
+    """
+    img = Image.open(io.BytesIO(image_bytes)).convert("RGB")
+    return np.asarray(img)
+
+
+class DetectClassifyPipeline:
+    """
+    Classifies encoded images end to end, cropping the vehicle with the
+    detector first, in a single pass over each batch:
+        1. decode: each image is decoded once to a uint8 RGB array, used
+           by both models.
+        2. detect: the batch goes through the detector in one forward pass,
+           see `utils.detection.get_vehicle_coordinates_batch()`.
+        3. crop: each vehicle box is cropped from its image and resized
+           straight into a preallocated batch array.
+        4. classify: the batch array goes through the classifier in one
+           `predict_on_batch()` call.
+
+    Batches are pipelined: while the classifier runs on a batch in a
+    background thread, the next batch is decoded, detected and cropped.
+    Both models release the GIL while running, so the stages overlap. Two
+    batch arrays are used in turns, so the one being classified is never
+    overwritten.
+
+    The time spent in each stage is accumulated in `timings`, in seconds.
+    With the stages overlapping, their sum is larger than the wall time.
+
+    Parameters
+    ----------
+    model : object
+        Classifier having a `predict_on_batch()` method, a keras model or
+        any runtime from `utils.runtime`.
+
+    class_names : list
+        List of classes as string, in the model output order.
+
+    input_size : tuple
+        Classifier input size as (height, width).
+
+    batch_size : int
+        Number of images per batch, for both models.
+
+    crop : bool
+        Crop the vehicle before classifying. Otherwise the detect stage is
+        skipped and the full images are classified.
+
+    detector : callable
+        Detection model to use, by default the one from
+        `utils.detection.get_detector()`.
+
+    cache : utils.detection_cache.DetectionCache
+        Optional cache of detector outputs, see `utils.detection.detect()`.
+    """
+
+    def __init__(
+        self,
+        model,
+        class_names,
+        input_size,
+        batch_size=8,
+        crop=True,
+        detector=None,
+        cache=None,
+    ):
+        self.model = model
+        self.class_names = class_names
+        self.input_size = tuple(input_size)
+        self.batch_size = batch_size
+        self.crop = crop
+        self.detector = detector
+        self.cache = cache
+        self._batches = [
+            np.empty((batch_size, *self.input_size, 3), dtype=np.float32)
+            for _ in range(2)
+        ]
+        self._executor = ThreadPoolExecutor(max_workers=1)
+        self.reset_timings()
+
+    def reset_timings(self):
+        """
+        Sets the time of every stage and the images count back to zero.
+        """
+        self.timings = dict.fromkeys(STAGES, 0.0)
+        self.images_count = 0
+
+    def predict(self, images):
+        """
+        Classifies a list of images, encoded or already decoded with
+        `decode_image_uint8()`.
+
+        Returns
+        -------
+        results : list
+            One dict per image, in the same order, with the predicted
+            "class_name", its "score" and the vehicle "box" used as
+            [x1, y1, x2, y2].
+        """
+        results = []
+        pending = None
+        for i, start in enumerate(range(0, len(images), self.batch_size)):
+            chunk = images[start : start + self.batch_size]
+            decoded = self._timed("decode", self._decode, chunk)
+            boxes = self._timed("detect", self._detect, decoded)
+            batch = self._batches[i % 2][: len(chunk)]
+            self._timed("crop", self._crop_into, batch, decoded, boxes)
+            # Waits for the previous batch only now, its classification
+            # ran while this one was prepared
+            if pending is not None:
+                results.extend(pending.result())
+            pending = self._executor.submit(
+                self._timed, "classify", self._classify, batch, boxes
+            )
+        if pending is not None:
+            results.extend(pending.result())
+        self.images_count += len(images)
+
+        return results
+
+    def close(self):
+        """
+        Stops the classification thread.
+        """
+        self._executor.shutdown(wait=True)
+
+    def _timed(self, stage, fn, *args):
+        start = time.perf_counter()
+        try:
+            return fn(*args)
+        finally:
+            self.timings[stage] += time.perf_counter() - start
+
+    def _decode(self, images):
+        return [
+            img if isinstance(img, np.ndarray) else decode_image_uint8(img)
+            for img in images
+        ]
+
+    def _detect(self, images):
+        if not self.crop:
+            return [[0, 0, img.shape[1], img.shape[0]] for img in images]
+
+        return detection.get_vehicle_coordinates_batch(
+            images,
+            batch_size=len(images),
+            detector=self.detector,
+            cache=self.cache,
+        )
+
+    def _crop_into(self, batch, images, boxes):
+        # Same resizing as `utils.serving.resize_image()`
+        height, width = self.input_size
+        for i, (img, (x1, y1, x2, y2)) in enumerate(zip(images, boxes)):
+            if x2 > x1 and y2 > y1:
+                img = img[y1:y2, x1:x2]
+            batch[i] = np.asarray(
+                Image.fromarray(img).resize((width, height), Image.NEAREST)
+            )
+
+    def _classify(self, batch, boxes):
+        probs = np.asarray(self.model.predict_on_batch(batch))
+        best = np.argmax(probs, axis=-1)
+        return [
+            {
+                "class_name": self.class_names[i],
+                "score": float(p[i]),
+                "box": list(box),
+            }
+            for i, p, box in zip(best, probs, boxes)
+        ]
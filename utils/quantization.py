@@ -0,0 +1,83 @@
+import os
+
+import numpy as np
+import tensorflow as tf
+
+from utils.datasets import IMAGE_FORMATS
+from utils.utils import image_batches, walkdir
+
+
+def representative_dataset(directory, input_size, num_images=200, seed=None):
+    """
+    Picks `num_images` images of a training folder at random, to calibrate
+    the activation ranges of a quantized model. Images are loaded like in
+    `utils.predict_from_folder()`, so the ranges match what the model sees
+    at inference time.
+
+    Parameters
+    ----------
+    directory : str
+        Full path to the training images, having one subfolder per class.
+
+    input_size : tuple
+        Model input size as (height, width).
+
+    num_images : int
+        Number of calibration images.
+
+    seed : int
+        Random seed used to pick the images.
+
+    Returns
+    -------
+    generator : callable
+        Function yielding single images batches, as
+        `tf.lite.TFLiteConverter.representative_dataset` expects.
+    """
+    file_paths = sorted(
+        os.path.join(dirpath, filename)
+        for dirpath, filename in walkdir(directory)
+        if filename.lower().endswith(IMAGE_FORMATS)
+    )
+    rng = np.random.RandomState(seed)
+    num_images = min(num_images, len(file_paths))
+    file_paths = [
+        file_paths[i]
+        for i in rng.choice(len(file_paths), num_images, replace=False)
+    ]
+
+    def generator():
+        for images in image_batches(file_paths, input_size, batch_size=1):
+            yield [images]
+
+    return generator
+
+
+def quantize_int8(saved_model_path, representative_data, path):
+    """
+    Converts a SavedModel written by `scripts/export_model.py` to a TFLite
+    model with int8 weights and activations. The input is uint8, as the
+    exported models take RGB images with values in [0, 255], and the
+    output stays float32 so close scores don't collapse to the same value.
+    Use `utils.runtime.TFLiteRuntime` to run it.
+
+    Parameters
+    ----------
+    saved_model_path : str
+        SavedModel folder.
+
+    representative_data : callable
+        Calibration data, see `representative_dataset()`.
+
+    path : str
+        Full path to the `.tflite` file written.
+    """
+    converter = tf.lite.TFLiteConverter.from_saved_model(saved_model_path)
+    converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    converter.representative_dataset = representative_data
+    converter.target_spec.supported_ops = [
+        tf.lite.OpsSet.TFLITE_BUILTINS_INT8
+    ]
+    converter.inference_input_type = tf.uint8
+    with open(path, "wb") as f:
+        f.write(converter.convert())
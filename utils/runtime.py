@@ -0,0 +1,248 @@
+import os
+import time
+
+import numpy as np
+import tensorflow as tf
+
+# Input and output names of the exported inference models, see
+# `scripts/export_model.py`
+INPUT_NAME = "images"
+OUTPUT_NAME = "probabilities"
+
+
+class KerasRuntime:
+    """
+    Runs a Keras model for inference through a single `tf.function`,
+    optionally compiled with XLA. It can replace the model wherever only
+    `predict_on_batch()` is used, e.g. `utils.predict_from_folder()` or
+    `utils.serving.ClassificationService`.
+
+    The function is traced again for each new batch size, so keep batch
+    sizes fixed when using XLA.
+
+    Parameters
+    ----------
+    model : keras.Model
+        Loaded keras model.
+
+    jit_compile : bool
+        Compile the model with XLA.
+    """
+
+    def __init__(self, model, jit_compile=False):
+        self.model = model
+        self.jit_compile = jit_compile
+        self._predict = tf.function(
+            lambda images: tf.cast(model(images, training=False), tf.float32),
+            jit_compile=jit_compile,
+        )
+
+    def predict_on_batch(self, images):
+        """
+        Returns the float32 model outputs for a batch of images as a numpy
+        array.
+        """
+        images = tf.convert_to_tensor(images, dtype=tf.float32)
+        return np.asarray(self._predict(images))
+
+
+class SavedModelRuntime:
+    """
+    Runs the serving signature of a SavedModel written by
+    `scripts/export_model.py`, without Keras.
+
+    Parameters
+    ----------
+    path : str
+        SavedModel folder.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._saved_model = tf.saved_model.load(path)
+        self._predict = self._saved_model.signatures["serving_default"]
+
+    def predict_on_batch(self, images):
+        """
+        Returns the model outputs for a batch of images as a numpy array.
+        """
+        images = tf.convert_to_tensor(images, dtype=tf.float32)
+        return self._predict(**{INPUT_NAME: images})[OUTPUT_NAME].numpy()
+
+
+class TFLiteRuntime:
+    """
+    Runs a TFLite model with the TensorFlow Lite interpreter.
+
+    The interpreter input is resized whenever the batch size changes, so
+    keep batch sizes fixed for the best latency.
+
+    Parameters
+    ----------
+    path : str
+        Full path to the `.tflite` file.
+
+    num_threads : int
+        Number of threads used by the interpreter, by default the TFLite
+        default.
+    """
+
+    def __init__(self, path, num_threads=None):
+        self.path = path
+        self.interpreter = tf.lite.Interpreter(
+            model_path=path, num_threads=num_threads
+        )
+        self.interpreter.allocate_tensors()
+        self._input = self.interpreter.get_input_details()[0]
+        self._output = self.interpreter.get_output_details()[0]
+
+    def predict_on_batch(self, images):
+        """
+        Returns the float32 model outputs for a batch of images as a numpy
+        array. Quantized inputs and outputs are converted with the model
+        quantization parameters.
+        """
+        images = _quantize(np.asarray(images), self._input)
+        if tuple(self._input["shape"]) != images.shape:
+            self.interpreter.resize_tensor_input(
+                self._input["index"], images.shape
+            )
+            self.interpreter.allocate_tensors()
+            self._input = self.interpreter.get_input_details()[0]
+            self._output = self.interpreter.get_output_details()[0]
+        self.interpreter.set_tensor(self._input["index"], images)
+        self.interpreter.invoke()
+
+        return _dequantize(
+            self.interpreter.get_tensor(self._output["index"]), self._output
+        )
+
+
+class ONNXRuntime:
+    """
+    Runs an ONNX model with ONNX Runtime on CPU. `onnxruntime` is an
+    optional dependency, only needed for this runtime.
+
+    Parameters
+    ----------
+    path : str
+        Full path to the `.onnx` file.
+
+    num_threads : int
+        Number of threads used inside each operator, by default the ONNX
+        Runtime default.
+    """
+
+    def __init__(self, path, num_threads=None):
+        try:
+            import onnxruntime
+        except ImportError:
+            raise ImportError(
+                "ONNX models need onnxruntime, install it with "
+                "`pip install onnxruntime`"
+            ) from None
+
+        self.path = path
+        options = onnxruntime.SessionOptions()
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+        self.session = onnxruntime.InferenceSession(
+            path, options, providers=["CPUExecutionProvider"]
+        )
+        self._input_name = self.session.get_inputs()[0].name
+
+    def predict_on_batch(self, images):
+        """
+        Returns the model outputs for a batch of images as a numpy array.
+        """
+        images = np.asarray(images, dtype=np.float32)
+        return self.session.run(None, {self._input_name: images})[0]
+
+
+def measure_latency(runtime, images, steps=20):
+    """
+    Times `steps` calls of `runtime.predict_on_batch(images)`, after a warm
+    up call.
+
+    Returns
+    -------
+    latencies : numpy.ndarray
+        Seconds taken by each call.
+    """
+    runtime.predict_on_batch(images)
+    latencies = []
+    for _ in range(steps):
+        start = time.perf_counter()
+        runtime.predict_on_batch(images)
+        latencies.append(time.perf_counter() - start)
+
+    return np.array(latencies)
+
+
+def load_runtime(path, jit_compile=False, num_threads=None):
+    """
+    Loads a trained model with the runtime matching its format:
+        - `.tflite` file: `TFLiteRuntime`.
+        - `.onnx` file: `ONNXRuntime`.
+        - SavedModel folder written by `scripts/export_model.py`:
+          `SavedModelRuntime`.
+        - Anything else, e.g. a training checkpoint: `KerasRuntime` on
+          `resnet_50.create_model(weights=path)`.
+
+    All of them take batches of RGB images with values in [0, 255] and
+    return class probabilities, through `predict_on_batch()`.
+
+    Parameters
+    ----------
+    path : str
+        Full path to the model.
+
+    jit_compile : bool
+        Compile the model with XLA, only used for Keras models.
+
+    num_threads : int
+        Number of threads, only used for TFLite and ONNX models.
+
+    Returns
+    -------
+    runtime : object
+        Runtime having a `predict_on_batch()` method.
+    """
+    if path.endswith(".tflite"):
+        return TFLiteRuntime(path, num_threads=num_threads)
+    if path.endswith(".onnx"):
+        return ONNXRuntime(path, num_threads=num_threads)
+    if os.path.isfile(
+        os.path.join(path, "saved_model.pb")
+    ) and not os.path.isfile(os.path.join(path, "keras_metadata.pb")):
+        return SavedModelRuntime(path)
+
+    # Imported here, models depend on utils
+    from models import resnet_50
+
+    return KerasRuntime(
+        resnet_50.create_model(weights=path), jit_compile=jit_compile
+    )
+
+
+def _quantize(values, details):
+    # Converts float inputs to the type of a quantized TFLite tensor
+    dtype = details["dtype"]
+    scale, zero_point = details["quantization"]
+    if not np.issubdtype(dtype, np.integer) or not scale:
+        return values.astype(dtype)
+
+    limits = np.iinfo(dtype)
+    values = np.round(values / scale + zero_point)
+    return np.clip(values, limits.min, limits.max).astype(dtype)
+
+
+def _dequantize(values, details):
+    # Converts the outputs of a quantized TFLite tensor back to float32
+    scale, zero_point = details["quantization"]
+    if not np.issubdtype(values.dtype, np.integer) or not scale:
+        return values.astype(np.float32, copy=False)
+
+    return ((values.astype(np.float32) - zero_point) * scale).astype(
+        np.float32
+    )
@@ -0,0 +1,212 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from PIL import Image
+
+from utils.pipeline import DetectClassifyPipeline, decode_image_uint8
+
+
+class MicroBatcher:
+    """
+    Groups requests arriving concurrently into batches, so the model runs
+    once for many requests.
+
+    A batch is sent as soon as it has `max_batch_size` items or when the
+    oldest item has been waiting for `max_wait_ms`. Batches run one at a
+    time in a background thread, so the event loop keeps accepting new
+    requests while the model is busy.
+
+    Parameters
+    ----------
+    predict_fn : callable
+        Function receiving a list of items and returning a list with one
+        result per item, in the same order.
+
+    max_batch_size : int
+        Maximum number of items per batch.
+
+    max_wait_ms : float
+        Maximum time, in milliseconds, an item waits for the batch to be
+        filled.
+    """
+
+    def __init__(self, predict_fn, max_batch_size=32, max_wait_ms=5.0):
+        self.predict_fn = predict_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self._queue = None
+        self._worker = None
+        self._executor = ThreadPoolExecutor(max_workers=1)
+
+    async def predict(self, item):
+        """
+        Adds `item` to the next batch and waits for its result.
+        """
+        if self._worker is None:
+            self._queue = asyncio.Queue()
+            self._worker = asyncio.ensure_future(self._run())
+
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((item, future))
+        return await future
+
+    async def close(self):
+        """
+        Stops the background batching task.
+        """
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+        self._executor.shutdown(wait=True)
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(
+                        await asyncio.wait_for(self._queue.get(), timeout)
+                    )
+                except asyncio.TimeoutError:
+                    break
+
+            items = [item for item, _ in batch]
+            try:
+                results = await loop.run_in_executor(
+                    self._executor, self.predict_fn, items
+                )
+            except Exception as exp:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(exp)
+                continue
+
+            for (_, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+
+
+def resize_image(img_array, input_size):
+    """
+    Resizes a uint8 image array to `input_size` as (height, width) using
+    the same interpolation as `keras.utils.load_img()`.
+    """
+    img = Image.fromarray(img_array)
+    img = img.resize((input_size[1], input_size[0]), Image.NEAREST)
+    return np.asarray(img)
+
+
+def load_image(image_bytes, input_size):
+    """
+    Decodes an encoded image (JPEG, PNG, ...) and resizes it to
+    `input_size`, same pixels as
+    `keras.utils.load_img(path, target_size=input_size)`, kept as uint8.
+    """
+    return resize_image(decode_image_uint8(image_bytes), input_size)
+
+
+class ClassificationService:
+    """
+    Classifies encoded images with the finetuned model, optionally cropping
+    the vehicle with the detector first. Requests go through a
+    `MicroBatcher`, so concurrent requests share the model calls.
+
+    When cropping, each batch of requests runs through a
+    `utils.pipeline.DetectClassifyPipeline`, so images are decoded once
+    and detection of a part of the batch overlaps with classification of
+    the previous one.
+
+    Parameters
+    ----------
+    model : keras.Model
+        Loaded keras model.
+
+    class_names : list
+        List of classes as string, in the model output order.
+
+    input_size : tuple
+        Keras model input size as (height, width).
+
+    crop : bool
+        Crop the vehicle with `utils.detection` before classifying.
+
+    max_batch_size : int
+        Maximum number of images per model call.
+
+    max_wait_ms : float
+        Maximum time an image waits for its batch to be filled.
+    """
+
+    def __init__(
+        self,
+        model,
+        class_names,
+        input_size,
+        crop=False,
+        max_batch_size=32,
+        max_wait_ms=5.0,
+    ):
+        self.model = model
+        self.class_names = class_names
+        self.input_size = tuple(input_size)
+        self.pipeline = None
+        if crop:
+            # Smaller pipeline batches, so a full batch of requests still
+            # gets its stages overlapped
+            self.pipeline = DetectClassifyPipeline(
+                model,
+                class_names,
+                input_size,
+                batch_size=max(1, max_batch_size // 4),
+            )
+            self.classifier = MicroBatcher(
+                self.pipeline.predict, max_batch_size, max_wait_ms
+            )
+        else:
+            self.classifier = MicroBatcher(
+                self._classify_batch, max_batch_size, max_wait_ms
+            )
+
+    def _classify_batch(self, images):
+        # Images are kept as uint8 until batched, converted only once here
+        probs = self.model.predict_on_batch(np.array(images, np.float32))
+        probs = np.asarray(probs)
+        best = np.argmax(probs, axis=-1)
+        return [
+            {"class_name": self.class_names[i], "score": float(p[i])}
+            for i, p in zip(best, probs)
+        ]
+
+    async def classify(self, image_bytes):
+        """
+        Returns the predicted class name and its score for an encoded
+        image. When cropping, the vehicle box used is returned too.
+        """
+        loop = asyncio.get_running_loop()
+        if self.pipeline is not None:
+            # Decoded before batching, so an invalid image only fails its
+            # own request
+            img = await loop.run_in_executor(
+                None, decode_image_uint8, image_bytes
+            )
+            return await self.classifier.predict(img)
+
+        img = await loop.run_in_executor(
+            None, load_image, image_bytes, self.input_size
+        )
+        return await self.classifier.predict(img)
+
+    async def close(self):
+        await self.classifier.close()
+        if self.pipeline is not None:
+            self.pipeline.close()
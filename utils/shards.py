@@ -0,0 +1,415 @@
+import json
+import os
+
+import numpy as np
+import tensorflow as tf
+
+from utils.datasets import apply_pipeline, decode_image, encode_labels
+
+# Index written next to the shards by `export_shards()`
+SHARDS_INDEX = "shards.json"
+
+
+def serialize_example(image, label):
+    """
+    Encodes a resized uint8 image and its label index as a serialized
+    `tf.train.Example`. The image is stored as raw bytes, its shape is kept
+    once in the shards index.
+    """
+    feature = {
+        "image": tf.train.Feature(
+            bytes_list=tf.train.BytesList(value=[image.tobytes()])
+        ),
+        "label": tf.train.Feature(
+            int64_list=tf.train.Int64List(value=[int(label)])
+        ),
+    }
+    example = tf.train.Example(features=tf.train.Features(feature=feature))
+
+    return example.SerializeToString()
+
+
+def parse_example(serialized, image_size):
+    """
+    Decodes a record written by `serialize_example()` back into a uint8
+    image with shape (height, width, 3) and its label index.
+    """
+    features = tf.io.parse_single_example(
+        serialized,
+        {
+            "image": tf.io.FixedLenFeature([], tf.string),
+            "label": tf.io.FixedLenFeature([], tf.int64),
+        },
+    )
+    image = tf.io.decode_raw(features["image"], tf.uint8)
+    image = tf.reshape(image, (image_size[0], image_size[1], 3))
+
+    return image, tf.cast(features["label"], tf.int32)
+
+
+def decoded_images(
+    file_paths, image_size, boxes=None, interpolation="bilinear"
+):
+    """
+    Yields each image of `file_paths` decoded, cropped with its box and
+    resized as uint8 numpy arrays, same preprocessing as
+    `utils.datasets.image_dataset_from_directory()`. Images are decoded in
+    parallel and returned in order.
+
+    Parameters
+    ----------
+    file_paths : list
+        Image paths.
+
+    image_size : tuple
+        Output size as (height, width).
+
+    boxes : dict
+        Maps each image file name to its box, see
+        `utils.datasets.load_boxes()`. Images not in it are used in full.
+
+    interpolation : str
+        Interpolation method used for resizing.
+    """
+    boxes = boxes or {}
+    crop_boxes = np.array(
+        [
+            boxes.get(os.path.basename(path), [-1, -1, -1, -1])
+            for path in file_paths
+        ],
+        dtype=np.int32,
+    ).reshape(-1, 4)
+    dataset = tf.data.Dataset.from_tensor_slices((file_paths, crop_boxes))
+    dataset = dataset.map(
+        lambda path, box: tf.cast(
+            tf.round(decode_image(path, box, image_size, interpolation)),
+            tf.uint8,
+        ),
+        num_parallel_calls=tf.data.AUTOTUNE,
+    ).prefetch(tf.data.AUTOTUNE)
+
+    return dataset.as_numpy_iterator()
+
+
+class ShardWriter:
+    """
+    Writes images and labels one at a time to TFRecord files having at
+    most `shard_size` records each, named `{output_prefix}-00000.tfrecord`,
+    ... Use it when images don't come from a single iterable, otherwise
+    see `write_shards()`.
+
+    Parameters
+    ----------
+    output_prefix : str
+        Path prefix of the shard files.
+
+    shard_size : int
+        Maximum number of records per file.
+    """
+
+    def __init__(self, output_prefix, shard_size=1024):
+        self.output_prefix = output_prefix
+        self.shard_size = shard_size
+        self.shard_files = []
+        self.count = 0
+        self._writer = None
+
+    def write(self, image, label):
+        """
+        Appends a uint8 image and its label index, see
+        `serialize_example()`.
+        """
+        if self.count % self.shard_size == 0:
+            self.close()
+            shard_path = (
+                f"{self.output_prefix}-{len(self.shard_files):05d}.tfrecord"
+            )
+            self.shard_files.append(os.path.basename(shard_path))
+            self._writer = tf.io.TFRecordWriter(shard_path)
+        self._writer.write(serialize_example(image, label))
+        self.count += 1
+
+    def close(self):
+        """
+        Closes the shard being written.
+        """
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def write_shards(images, labels, output_prefix, shard_size=1024):
+    """
+    Writes images and labels to TFRecord files having at most `shard_size`
+    records each, named `{output_prefix}-00000.tfrecord`, ...
+
+    Parameters
+    ----------
+    images : iterable
+        uint8 images, all with the same shape.
+
+    labels : list
+        Label index of each image.
+
+    output_prefix : str
+        Path prefix of the shard files.
+
+    shard_size : int
+        Maximum number of records per file.
+
+    Returns
+    -------
+    shard_files : list
+        Names of the written files, relative to the prefix folder.
+    """
+    with ShardWriter(output_prefix, shard_size) as writer:
+        for image, label in zip(images, labels):
+            writer.write(image, label)
+
+    return writer.shard_files
+
+
+def export_shards(
+    output_folder,
+    splits,
+    class_names,
+    image_size,
+    boxes=None,
+    interpolation="bilinear",
+    shard_size=1024,
+    **index_fields,
+):
+    """
+    Decodes and resizes each split once and writes it as TFRecord shards,
+    along with an index used by `image_dataset_from_shards()`.
+
+    Parameters
+    ----------
+    output_folder : str
+        Folder where shards and index are written.
+
+    splits : dict
+        Maps each split name ("training", "validation", "test") to a tuple
+        with its list of image paths and their label index, in
+        `class_names` order.
+
+    class_names : list
+        List of classes as string.
+
+    image_size : tuple
+        Images are resized to this size as (height, width).
+
+    boxes : dict
+        Vehicle box of each image file name, see
+        `utils.datasets.load_boxes()`.
+
+    interpolation : str
+        Interpolation method used for resizing.
+
+    shard_size : int
+        Maximum number of records per file.
+
+    **index_fields
+        Extra settings stored in the index, like the seed and the
+        validation split used to make the splits.
+
+    Returns
+    -------
+    index : dict
+        Content written to the index file.
+    """
+    os.makedirs(output_folder, exist_ok=True)
+    index = {
+        "class_names": list(class_names),
+        "image_size": list(image_size),
+        **index_fields,
+        "splits": {},
+    }
+    for name, (file_paths, labels) in splits.items():
+        images = decoded_images(file_paths, image_size, boxes, interpolation)
+        shard_files = write_shards(
+            images, labels, os.path.join(output_folder, name), shard_size
+        )
+        index["splits"][name] = {
+            "files": shard_files,
+            "count": len(file_paths),
+        }
+
+    save_index(output_folder, index)
+
+    return index
+
+
+def save_index(shards, index):
+    """
+    Writes the shards `index` in the folder `shards`, see `export_shards()`
+    for its content.
+    """
+    with open(os.path.join(shards, SHARDS_INDEX), "w") as f:
+        json.dump(index, f, indent=2)
+
+
+def load_index(shards):
+    """
+    Loads the index written by `export_shards()` in the folder `shards`.
+    """
+    with open(os.path.join(shards, SHARDS_INDEX), "r") as f:
+        return json.load(f)
+
+
+def image_dataset_from_shards(
+    shards,
+    label_mode="int",
+    class_names=None,
+    image_size=None,
+    batch_size=32,
+    shuffle=True,
+    seed=None,
+    validation_split=None,
+    subset=None,
+    pipeline=None,
+    num_workers=1,
+    worker_index=0,
+):
+    """
+    Reads a split exported by `scripts/export_shards.py`, replacing
+    `utils.datasets.image_dataset_from_directory()` once images are
+    already cropped and resized. Shard files are read in parallel and
+    interleaved.
+
+    The split and image settings are fixed at export time, so
+    `class_names`, `image_size`, `seed` and `validation_split` are only
+    checked against the shards index.
+
+    Parameters
+    ----------
+    shards : str
+        Folder with the shards and their index.
+
+    label_mode : str
+        One of "int", "categorical" or "binary".
+
+    class_names : list
+        Expected list of classes, in the model output order.
+
+    image_size : tuple
+        Expected image size as (height, width).
+
+    batch_size : int
+        Size of the batches of data.
+
+    shuffle : bool
+        Whether to shuffle the data. Up to 8 shards are read at the same
+        time when shuffling, otherwise records are read in order.
+
+    seed : int
+        Random seed for shuffling, also checked against the export seed
+        when a validation split is used.
+
+    validation_split : float
+        Expected fraction of data reserved for validation.
+
+    subset : str
+        One of "training", "validation" or "test". By default "training".
+
+    pipeline : dict
+        Input pipeline settings, see `utils.datasets.apply_pipeline()`.
+
+    num_workers, worker_index : int
+        With many training workers, each one only reads its part of the
+        split, one shard file out of `num_workers` starting at
+        `worker_index`. The split needs at least one shard per worker.
+
+    Returns
+    -------
+    dataset : tf.data.Dataset
+        Dataset yielding batches of (images, labels), images are float32
+        as with the JPEG loaders. Its `samples_count` is the number of
+        records of the whole split, for all the workers.
+    """
+    pipeline = pipeline or {}
+    index = load_index(shards)
+    subset = subset or "training"
+    if class_names is None:
+        class_names = index["class_names"]
+
+    expected = {
+        "class_names": list(class_names),
+        "image_size": list(image_size or index["image_size"]),
+        "validation_split": validation_split or None,
+    }
+    if validation_split:
+        expected["seed"] = seed
+    for key, value in expected.items():
+        if index.get(key) != value:
+            raise ValueError(
+                f"Shards in {shards} were exported with {key}="
+                f"{index.get(key)}, experiment uses {value}"
+            )
+    if subset not in index["splits"]:
+        raise ValueError(
+            f"Split {subset} not found in {shards}, available splits: "
+            f"{sorted(index['splits'])}"
+        )
+
+    image_size = index["image_size"]
+    num_classes = len(class_names)
+    shard_paths = [
+        os.path.join(shards, fname)
+        for fname in index["splits"][subset]["files"]
+    ]
+    if len(shard_paths) < num_workers:
+        raise ValueError(
+            f"Split {subset} of {shards} has {len(shard_paths)} shards, "
+            f"less than the {num_workers} workers, export it again with a "
+            "smaller `shard_size`"
+        )
+    shard_paths = shard_paths[worker_index::num_workers]
+    num_parallel_calls = pipeline.get("num_parallel_calls", "autotune")
+    if num_parallel_calls == "autotune":
+        num_parallel_calls = tf.data.AUTOTUNE
+
+    # Without shuffling, shards are read one after the other so records
+    # keep the export order
+    cycle_length = 1
+    dataset = tf.data.Dataset.from_tensor_slices(shard_paths)
+    if shuffle:
+        dataset = dataset.shuffle(len(shard_paths), seed=seed)
+        cycle_length = min(len(shard_paths), 8)
+    dataset = dataset.interleave(
+        tf.data.TFRecordDataset,
+        cycle_length=cycle_length,
+        num_parallel_calls=num_parallel_calls,
+        deterministic=pipeline.get("deterministic"),
+    )
+    dataset = dataset.map(
+        lambda serialized: _to_sample(
+            serialized, image_size, label_mode, num_classes
+        ),
+        num_parallel_calls=num_parallel_calls,
+        deterministic=pipeline.get("deterministic"),
+    )
+    # Workers caching on the same disk don't share their cache files
+    cache_name = subset
+    if num_workers > 1:
+        cache_name = f"{subset}_{worker_index}"
+    dataset = apply_pipeline(
+        dataset, pipeline, batch_size, shuffle, seed, name=cache_name
+    )
+    dataset.class_names = list(class_names)
+    dataset.samples_count = index["splits"][subset]["count"]
+
+    return dataset
+
+
+def _to_sample(serialized, image_size, label_mode, num_classes):
+    image, label = parse_example(serialized, image_size)
+    label = encode_labels(label, label_mode, num_classes)
+
+    return tf.cast(image, tf.float32), label
@@ -0,0 +1,278 @@
+import json
+import os
+
+import numpy as np
+from tensorflow import keras
+
+from utils.datasets import index_directory, split_subset
+from utils.shards import decoded_images
+
+# Files of a tensor store folder
+IMAGES_FILE = "images.npy"
+LABELS_FILE = "labels.npy"
+INDEX_FILE = "index.json"
+
+
+class TensorStore:
+    """
+    Images of a dataset split already cropped and resized, kept in a single
+    uint8 array of shape (N, height, width, 3) on disk.
+
+    The array is memory-mapped read-only, so opening a store takes
+    milliseconds whatever its size, and processes reading the same store
+    on a host share the same physical memory through the page cache.
+
+    Images are stored sorted by class and file name, the order
+    `utils.datasets.index_directory()` uses before shuffling, so any
+    seed and validation split can be taken from the same store, see
+    `subset_indices()`.
+
+    Parameters
+    ----------
+    path : str
+        Folder of a store written by `build()`.
+
+    mmap_mode : str
+        Mode used to memory-map the images, see `numpy.load()`.
+    """
+
+    def __init__(self, path, mmap_mode="r"):
+        self.path = path
+        with open(os.path.join(path, INDEX_FILE), "r") as f:
+            index = json.load(f)
+        self.class_names = index["class_names"]
+        self.image_size = tuple(index["image_size"])
+        self.file_paths = index["file_paths"]
+        self.images = np.load(
+            os.path.join(path, IMAGES_FILE), mmap_mode=mmap_mode
+        )
+        self.labels = np.load(os.path.join(path, LABELS_FILE))
+
+    @classmethod
+    def build(
+        cls,
+        directory,
+        path,
+        class_names,
+        image_size,
+        boxes=None,
+        interpolation="bilinear",
+    ):
+        """
+        Decodes, crops and resizes every image of `directory` once, with
+        the same preprocessing as `utils.datasets`, and writes the store
+        in the folder `path`.
+
+        Parameters
+        ----------
+        directory : str
+            Full path to the dataset split, having one subfolder per class.
+
+        path : str
+            Folder where the store is written.
+
+        class_names : list
+            List of classes as string, sets the label index of each class.
+
+        image_size : tuple
+            Images are resized to this size as (height, width).
+
+        boxes : dict
+            Vehicle box of each image file name, see
+            `utils.datasets.load_boxes()`.
+
+        interpolation : str
+            Interpolation method used for resizing.
+
+        Returns
+        -------
+        store : TensorStore
+            The new store.
+        """
+        file_paths, labels = index_directory(
+            directory, class_names, shuffle=False
+        )
+        os.makedirs(path, exist_ok=True)
+        images = np.lib.format.open_memmap(
+            os.path.join(path, IMAGES_FILE),
+            mode="w+",
+            dtype=np.uint8,
+            shape=(len(file_paths), image_size[0], image_size[1], 3),
+        )
+        images_iter = decoded_images(
+            file_paths, image_size, boxes, interpolation
+        )
+        for i, image in enumerate(images_iter):
+            images[i] = image
+        images.flush()
+        del images
+
+        np.save(os.path.join(path, LABELS_FILE), labels)
+        index = {
+            "class_names": list(class_names),
+            "image_size": list(image_size),
+            "file_paths": file_paths,
+        }
+        # Written last, a store without index is incomplete
+        with open(os.path.join(path, INDEX_FILE), "w") as f:
+            json.dump(index, f)
+
+        return cls(path)
+
+    def __len__(self):
+        return len(self.labels)
+
+    def subset_indices(self, seed=None, validation_split=None, subset=None):
+        """
+        Rows of the store for a shuffled training or validation subset,
+        the same images `utils.datasets.image_dataset_from_directory()`
+        and Keras pick for the same seed and validation split.
+        """
+        if seed is None:
+            seed = np.random.randint(1e6)
+        indices = np.arange(len(self))
+        np.random.RandomState(seed).shuffle(indices)
+        indices, _ = split_subset(indices, indices, validation_split, subset)
+
+        return indices
+
+    def batches(self, batch_size=32):
+        """
+        Yields the images in store order as uint8 batches, each one a view
+        on the memory-mapped array, without copying.
+        """
+        for start in range(0, len(self), batch_size):
+            yield self.images[start : start + batch_size]
+
+
+class TensorStoreSequence(keras.utils.Sequence):
+    """
+    Feeds a subset of a `TensorStore` to `keras.Model.fit()`.
+
+    Batches are gathered from the memory-mapped images in row order, so
+    reads stay mostly sequential, and kept as uint8, the model input layer
+    converts them to float32. Unlike `TensorStore.batches()`, each batch is
+    a copy: the rows of a shuffled subset aren't contiguous, and batches of
+    contiguous rows would hold a single class, as the store is sorted by
+    class.
+
+    Parameters
+    ----------
+    store : TensorStore
+        Opened tensor store.
+
+    indices : numpy.ndarray
+        Rows of the store used, see `TensorStore.subset_indices()`.
+
+    label_mode : str
+        One of "int", "categorical" or "binary".
+
+    batch_size : int
+        Size of the batches of data.
+
+    shuffle : bool
+        Whether to shuffle the data again after each epoch.
+
+    seed : int
+        Random seed for shuffling.
+    """
+
+    def __init__(
+        self,
+        store,
+        indices,
+        label_mode="int",
+        batch_size=32,
+        shuffle=True,
+        seed=None,
+    ):
+        super().__init__()
+        self.store = store
+        self.indices = np.asarray(indices)
+        self.batch_size = batch_size
+        self.shuffle = shuffle
+        self.rng = np.random.RandomState(seed)
+        self.labels = _encode_labels(
+            store.labels, label_mode, len(store.class_names)
+        )
+        self.class_names = store.class_names
+        self.file_paths = [store.file_paths[i] for i in self.indices]
+
+    def __len__(self):
+        return -(-len(self.indices) // self.batch_size)
+
+    def __getitem__(self, idx):
+        start = idx * self.batch_size
+        batch = np.sort(self.indices[start : start + self.batch_size])
+
+        return self.store.images[batch], self.labels[batch]
+
+    def on_epoch_end(self):
+        if self.shuffle:
+            self.rng.shuffle(self.indices)
+
+
+def image_sequence_from_store(
+    tensor_store,
+    label_mode="int",
+    class_names=None,
+    image_size=None,
+    batch_size=32,
+    shuffle=True,
+    seed=None,
+    validation_split=None,
+    subset=None,
+):
+    """
+    Loads a subset of a tensor store, replacing
+    `utils.datasets.image_dataset_from_directory()` in `scripts/train.py`.
+    `class_names` and `image_size` are only checked against the store.
+
+    Returns
+    -------
+    sequence : TensorStoreSequence
+        Sequence yielding batches of (images, labels).
+    """
+    store = TensorStore(tensor_store)
+    expected = {
+        "class_names": (store.class_names, list(class_names or [])),
+        "image_size": (store.image_size, tuple(image_size or ())),
+    }
+    for key, (stored, value) in expected.items():
+        if value and stored != value:
+            raise ValueError(
+                f"Tensor store {tensor_store} has {key}={stored}, experiment "
+                f"uses {value}"
+            )
+    if seed is None:
+        seed = np.random.randint(1e6)
+
+    indices = store.subset_indices(seed, validation_split, subset)
+
+    return TensorStoreSequence(
+        store, indices, label_mode, batch_size, shuffle, seed
+    )
+
+
+def is_tensor_store(path):
+    """
+    Whether `path` is a folder written by `TensorStore.build()`.
+    """
+    return os.path.isfile(os.path.join(path, INDEX_FILE)) and os.path.isfile(
+        os.path.join(path, IMAGES_FILE)
+    )
+
+
+def _encode_labels(labels, label_mode, num_classes):
+    # numpy version of `utils.datasets.encode_labels()`
+    if label_mode == "int":
+        return labels
+    if label_mode == "categorical":
+        return np.eye(num_classes, dtype=np.float32)[labels]
+    if label_mode == "binary":
+        return labels.astype(np.float32)[:, np.newaxis]
+
+    raise ValueError(
+        '`label_mode` must be one of "int", "categorical" or "binary", '
+        f"received: {label_mode}"
+    )
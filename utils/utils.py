@@ -7,6 +7,26 @@ import numpy as np
 from keras.preprocessing.image import load_img
 from keras.preprocessing.image import img_to_array
 
+from utils.tensor_store import TensorStore, is_tensor_store
+
+# Settings accepted in the `data.pipeline` section of the experiment config,
+# see `utils.datasets.image_dataset_from_directory()`
+PIPELINE_KEYS = (
+    "augment",
+    "cache",
+    "shuffle_buffer",
+    "num_parallel_calls",
+    "deterministic",
+    "prefetch",
+    "private_threadpool_size",
+)
+
+# Settings accepted in the `distribute` section of the experiment config,
+# see `utils.distribute.create_strategy()`
+DISTRIBUTE_KEYS = ("strategy", "communication", "scale_learning_rate")
+STRATEGIES = ("default", "multi_worker_mirrored")
+COMMUNICATIONS = ("auto", "ring", "nccl")
+
 
 def validate_config(config):
     """
@@ -27,6 +47,99 @@ def validate_config(config):
     if "directory" not in config["data"]:
         raise ValueError("Missing experiment training data")
 
+    if "pipeline" in config["data"]:
+        validate_pipeline(config["data"]["pipeline"])
+
+    if "distribute" in config:
+        validate_distribute(config["distribute"])
+
+
+def validate_pipeline(pipeline):
+    """
+    Checks the `data.pipeline` section of the experiment configuration.
+
+    Parameters
+    ----------
+    pipeline : dict
+        Input pipeline settings as a Python dict.
+    """
+    if not isinstance(pipeline, dict):
+        raise ValueError("Experiment data pipeline must be a mapping")
+
+    unknown = set(pipeline) - set(PIPELINE_KEYS)
+    if unknown:
+        raise ValueError(
+            f"Unknown data pipeline settings: {sorted(unknown)}, "
+            f"expected any of {list(PIPELINE_KEYS)}"
+        )
+
+    def is_count(value, minimum):
+        # YAML booleans are ints in Python, don't accept them as counts
+        return (
+            isinstance(value, int)
+            and not isinstance(value, bool)
+            and value >= minimum
+        )
+
+    if "cache" in pipeline and not isinstance(pipeline["cache"], (bool, str)):
+        raise ValueError(
+            "Data pipeline `cache` must be true, false or a directory path"
+        )
+
+    for key, minimum in (("num_parallel_calls", 1), ("prefetch", 0)):
+        value = pipeline.get(key, "autotune")
+        if value != "autotune" and not is_count(value, minimum):
+            raise ValueError(
+                f'Data pipeline `{key}` must be "autotune" or an integer '
+                f">= {minimum}"
+            )
+
+    for key, minimum in (
+        ("shuffle_buffer", 1),
+        ("private_threadpool_size", 0),
+    ):
+        if key in pipeline and not is_count(pipeline[key], minimum):
+            raise ValueError(
+                f"Data pipeline `{key}` must be an integer >= {minimum}"
+            )
+
+    for key in ("deterministic", "augment"):
+        if key in pipeline and not isinstance(pipeline[key], bool):
+            raise ValueError(f"Data pipeline `{key}` must be a boolean")
+
+
+def validate_distribute(distribute):
+    """
+    Checks the `distribute` section of the experiment configuration.
+
+    Parameters
+    ----------
+    distribute : dict
+        Distribution strategy settings as a Python dict.
+    """
+    if not isinstance(distribute, dict):
+        raise ValueError("Experiment distribute settings must be a mapping")
+
+    unknown = set(distribute) - set(DISTRIBUTE_KEYS)
+    if unknown:
+        raise ValueError(
+            f"Unknown distribute settings: {sorted(unknown)}, expected any "
+            f"of {list(DISTRIBUTE_KEYS)}"
+        )
+
+    if distribute.get("strategy") not in STRATEGIES:
+        raise ValueError(
+            f"Distribute `strategy` must be one of {list(STRATEGIES)}"
+        )
+
+    if distribute.get("communication", "auto") not in COMMUNICATIONS:
+        raise ValueError(
+            f"Distribute `communication` must be one of {list(COMMUNICATIONS)}"
+        )
+
+    if not isinstance(distribute.get("scale_learning_rate", False), bool):
+        raise ValueError("Distribute `scale_learning_rate` must be a boolean")
+
 
 def load_config(config_file_path):
     """
@@ -101,24 +214,102 @@ def walkdir(folder):
             yield (dirpath, filename)
 
 
-def predict_from_folder(folder, model, input_size, class_names):
+def list_images(folder):
+    """
+    Lists the image files in `folder` along with their true label, taken
+    from the name of the folder containing each image.
+
+    Parameters
+    ----------
+    folder : str
+        Path to the folder you want to process.
+
+    Returns
+    -------
+    file_paths, labels : tuple
+        List of image paths and list of their labels, in `os.walk()` order.
+    """
+    file_paths = []
+    labels = []
+    for dirpath, filename in walkdir(folder):
+        file_paths.append(os.path.join(dirpath, filename))
+        labels.append(dirpath.split("/")[-1])
+
+    return file_paths, labels
+
+
+def _load_image(path, input_size):
+    # Same loading used for single images, so batched predictions match
+    img = load_img(path.decode(), target_size=input_size)
+    return img_to_array(img)
+
+
+def image_batches(file_paths, input_size, batch_size=32):
+    """
+    Creates a tf.data pipeline loading and resizing images in parallel,
+    grouped in batches and prefetched while the model runs.
+
+    Images are loaded with `keras.utils.load_img()`, so the pixels are the
+    same as loading them one by one.
+
+    Parameters
+    ----------
+    file_paths : list
+        List of image paths.
+
+    input_size : tuple
+        Size to resize images to, as (height, width).
+
+    batch_size : int
+        Number of images per batch.
+
+    Returns
+    -------
+    dataset : tf.data.Dataset
+        Dataset yielding float32 batches of shape
+        (batch_size, height, width, 3).
+    """
+    input_size = tuple(input_size)
+    dataset = tf.data.Dataset.from_tensor_slices(file_paths)
+    dataset = dataset.map(
+        lambda path: tf.ensure_shape(
+            tf.numpy_function(
+                _load_image, [path, input_size], tf.float32, stateful=False
+            ),
+            input_size + (3,),
+        ),
+        num_parallel_calls=tf.data.AUTOTUNE,
+    )
+
+    return dataset.batch(batch_size).prefetch(tf.data.AUTOTUNE)
+
+
+def predict_from_folder(folder, model, input_size, class_names, batch_size=32):
     """
     Walk through all the image files in a directory, loads them, applies
     the corresponding pre-processing and sends to the model to get
     predictions.
 
+    Images are loaded in parallel and sent to the model in batches, see
+    `image_batches()`.
+
     This function will also return the true label for each image, to do so,
     the folder must be structured in a way in which images for the same
     category are grouped into a folder with the corresponding class
     name. This is the same data structure as we used for training our model.
 
+    `folder` can also be a tensor store built with
+    `scripts/build_tensor_store.py`, then batches are read straight from
+    its memory-mapped images, already resized like in training.
+
     Parameters
     ----------
     folder : str
-        Path to the folder you want to process.
+        Path to the folder you want to process, or to a tensor store.
 
     model : keras.Model
-        Loaded keras model.
+        Loaded keras model, or any runtime from `utils.runtime`, e.g.
+        `load_runtime("experiments/exp_001/export/model.tflite")`.
 
     input_size : tuple
         Keras model input size, we must resize the image to math these
@@ -128,6 +319,9 @@ def predict_from_folder(folder, model, input_size, class_names):
         List of classes as string. It allow us to map model output IDs to the
         corresponding class name, e.g. 'Jeep Patriot SUV 2012'.
 
+    batch_size : int
+        Number of images sent to the model at once.
+
     Returns
     -------
     predictions, labels : tuple
@@ -136,33 +330,34 @@ def predict_from_folder(folder, model, input_size, class_names):
             - labels: is the list of the true labels, we will use them to
                       compare against model predictions.
     """
-    # Use keras.utils.load_img() to correctly load the image and
-    # keras.utils.img_to_array() to convert it to the format needed
-    # before sending it to our model.
-    # You can use os.walk() or walkdir() to iterate over the files in the
-    # folder.
-    # Don't forget you must not return the raw model prediction. Model
-    # prediction will be a vector assigning probability scores to each
-    # class. You must take the position of the element in the vector with
-    # the highest probability and use that to get the corresponding class
-    # name from `class_names` list.
-    # TODO
-    predictions = None
-    labels = None
+    if is_tensor_store(folder):
+        return _predict_from_store(
+            TensorStore(folder), model, input_size, class_names, batch_size
+        )
 
-    predictions=[]
-    labels=[]
-    for dirpath, _, files in os.walk(folder):
-        for filename in files:
-            fname=os.path.join(dirpath, filename)
-            img = tf.keras.utils.load_img(fname,target_size=input_size)
-            img_array = img_to_array(img)
-            img_array = tf.expand_dims(img_array,axis=0)
-            pred=model.predict(img_array)
-            pred=np.argmax(pred)
-            predictions.append(class_names[pred])
-            vector=dirpath.split('/')
-            vector=vector[-1]
-            labels.append(vector)
+    file_paths, labels = list_images(folder)
+    if not file_paths:
+        return [], labels
+
+    predictions = []
+    for images in image_batches(file_paths, input_size, batch_size):
+        pred = np.argmax(model.predict_on_batch(images), axis=-1)
+        predictions.extend(class_names[i] for i in pred)
+
+    return predictions, labels
+
+
+def _predict_from_store(store, model, input_size, class_names, batch_size):
+    if store.image_size != tuple(input_size):
+        raise ValueError(
+            f"Tensor store {store.path} has images of size "
+            f"{store.image_size}, model input size is {tuple(input_size)}"
+        )
+
+    predictions = []
+    for images in store.batches(batch_size):
+        pred = np.argmax(model.predict_on_batch(images), axis=-1)
+        predictions.extend(class_names[i] for i in pred)
+    labels = [store.class_names[i] for i in store.labels]
 
     return predictions, labels